@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Async HTTP API for image analysis, incident descriptions and summaries.
+
+Endpoints (all JSON):
+    GET  /health             pool size, queue depth and counters
+    POST /analyze            multipart images -> one incident (fields optional)
+    POST /analyze/batch      multipart images -> NDJSON, one line per image as it finishes
+    GET  /templates          available incident types
+    POST /templates/render   {"incident_type", "registration", "street", "date", "time"}
+    POST /summary            the bot's collected data -> the summary messages it would send
+
+Analysis is CPU-bound, so it runs in a pool of worker processes. Requests
+beyond the workers wait in a bounded queue; when that is full the server
+answers 429 with a Retry-After estimate instead of queueing without limit.
+
+Usage:
+    python api_server.py --port 8080 --workers 4 --queue-size 16
+
+    curl -F image=@photo.jpg http://localhost:8080/analyze
+    curl -F image=@a.jpg -F image=@b.jpg http://localhost:8080/analyze/batch
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from extract_from_image import ALL_FIELDS, LOCAL_FIELDS, analyze_incident
+from image_decode import DEFAULT_MEMORY_MB, set_memory_ceiling
+from incident_templates import get_template_registry
+from telegram_bot import build_summary_messages
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_QUEUE_SIZE = 16
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+class Saturated(Exception):
+    """No room in the queue for this request."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnalysisPool:
+    """Worker processes plus a bounded queue of waiting jobs."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, openai_api_key=None,
+                 worker_memory_mb=DEFAULT_MEMORY_MB):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.openai_api_key = openai_api_key
+        self.in_flight = 0
+        self.counts = {'completed': 0, 'failed': 0, 'rejected': 0}
+        self._average_seconds = 5.0  # until real timings arrive
+        # spawn: forking a process with a running event loop and threads is unsafe
+        self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=set_memory_ceiling, initargs=(worker_memory_mb,))
+
+    def reserve(self, jobs):
+        """Claim queue slots for `jobs` analyses or raise Saturated"""
+        if self.in_flight + jobs > self.capacity:
+            self.counts['rejected'] += 1
+            raise Saturated(self.retry_after())
+        self.in_flight += jobs
+
+    def release(self, jobs=1):
+        self.in_flight -= jobs
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        rounds = math.ceil(self.in_flight / self.workers)
+        return max(1, math.ceil(rounds * self._average_seconds))
+
+    async def analyze(self, image_paths, fields=None):
+        """Analyze one incident in a worker; the caller must have reserved a slot"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            result = await loop.run_in_executor(
+                self._executor, analyze_incident, image_paths, self.openai_api_key, fields)
+        except Exception:
+            self.counts['failed'] += 1
+            raise
+        self.counts['completed'] += 1
+        self._average_seconds = 0.8 * self._average_seconds + 0.2 * (time.monotonic() - started)
+        return result
+
+    def stats(self):
+        return dict(self.counts, workers=self.workers, capacity=self.capacity,
+                    in_flight=self.in_flight, queued=max(0, self.in_flight - self.workers),
+                    average_seconds=round(self._average_seconds, 2))
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+def json_error(status, message, **headers):
+    return web.json_response({'error': message}, status=status, headers=headers or None)
+
+
+def busy_response(error):
+    return json_error(429, str(error), **{'Retry-After': str(error.retry_after)})
+
+
+async def read_upload(request, work_dir):
+    """Save the uploaded images to work_dir; returns (paths, fields)"""
+    if not request.content_type.startswith('multipart/'):
+        raise web.HTTPBadRequest(text=json.dumps({'error': 'Send images as multipart/form-data'}),
+                                 content_type='application/json')
+    paths = []
+    fields = None
+    reader = await request.multipart()
+    async for part in reader:
+        if part.name == 'fields':
+            fields = [f.strip() for f in (await part.text()).split(',') if f.strip()]
+            continue
+        if not part.filename:
+            continue
+        name = os.path.basename(part.filename)
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        # Index prefix keeps uploads with the same filename apart (stripped in replies)
+        path = os.path.join(work_dir, f"{len(paths):03d}_{name}")
+        with open(path, 'wb') as f:
+            while chunk := await part.read_chunk():
+                f.write(chunk)
+        paths.append(path)
+
+    unknown = [f for f in fields or [] if f not in ALL_FIELDS + LOCAL_FIELDS]
+    if unknown:
+        raise web.HTTPBadRequest(
+            text=json.dumps({'error': f"Unknown fields: {', '.join(unknown)}",
+                             'fields': list(ALL_FIELDS + LOCAL_FIELDS)}),
+            content_type='application/json')
+    if not paths:
+        raise web.HTTPBadRequest(text=json.dumps({'error': 'No .jpg/.png images uploaded'}),
+                                 content_type='application/json')
+    return paths, fields
+
+
+async def health(request):
+    pool = request.app['pool']
+    return web.json_response({'status': 'ok', 'pool': pool.stats()})
+
+
+async def analyze(request):
+    """All uploaded images are analyzed together as one incident"""
+    pool = request.app['pool']
+    try:
+        pool.reserve(1)
+    except Saturated as e:
+        return busy_response(e)
+
+    work_dir = tempfile.mkdtemp(prefix='nextbase_api_')
+    try:
+        paths, fields = await read_upload(request, work_dir)
+        incident_data = await pool.analyze(paths, fields)
+        if incident_data is None:
+            return json_error(422, 'No readable images')
+        return web.json_response(incident_data, dumps=_dumps)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        return json_error(500, f"Analysis failed: {e}")
+    finally:
+        pool.release(1)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def analyze_batch(request):
+    """Each uploaded image is analyzed separately; results stream back as NDJSON"""
+    pool = request.app['pool']
+    work_dir = tempfile.mkdtemp(prefix='nextbase_api_')
+    try:
+        paths, fields = await read_upload(request, work_dir)
+        if len(paths) > pool.capacity:
+            return json_error(413, f"At most {pool.capacity} images per batch")
+        try:
+            pool.reserve(len(paths))
+        except Saturated as e:
+            return busy_response(e)
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+
+        async def run(index, path):
+            try:
+                result = {'index': index, 'ok': True, 'result': await pool.analyze([path], fields)}
+            except Exception as e:
+                result = {'index': index, 'ok': False, 'error': str(e)}
+            finally:
+                pool.release(1)
+            result['filename'] = os.path.basename(path)[4:]
+            return result
+
+        jobs = [asyncio.ensure_future(run(i, p)) for i, p in enumerate(paths)]
+        try:
+            for finished in asyncio.as_completed(jobs):
+                await response.write((_dumps(await finished) + '\n').encode())
+        finally:
+            # Client went away: let the queued work finish so slots are released
+            if not all(job.done() for job in jobs):
+                await asyncio.gather(*jobs, return_exceptions=True)
+        await response.write_eof()
+        return response
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def list_templates(request):
+    return web.json_response({'types': get_template_registry().types()})
+
+
+async def render_template(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return json_error(400, 'Body must be JSON')
+    templates = get_template_registry()
+    incident_type = body.get('incident_type')
+    if incident_type not in templates:
+        return json_error(404, f"Unknown incident type: {incident_type}")
+    description = templates.render(
+        incident_type,
+        reg=body.get('registration'),
+        street=body.get('street'),
+        date=body.get('date'),
+        time=body.get('time'),
+    )
+    return web.json_response({'incident_type': incident_type, 'description': description})
+
+
+async def summary(request):
+    """The same messages the bot sends at the end of a conversation"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return json_error(400, 'Body must be JSON')
+    if not isinstance(data, dict):
+        return json_error(400, 'Body must be a JSON object')
+    messages = build_summary_messages(data, data.pop('ledger_note', None))
+    return web.json_response({'messages': messages})
+
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+
+def create_app(workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, openai_api_key=None,
+               worker_memory_mb=DEFAULT_MEMORY_MB):
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app['pool'] = AnalysisPool(workers, queue_size, openai_api_key, worker_memory_mb)
+
+    async def stop_pool(app):
+        app['pool'].shutdown()
+
+    app.on_cleanup.append(stop_pool)
+    app.add_routes([
+        web.get('/health', health),
+        web.post('/analyze', analyze),
+        web.post('/analyze/batch', analyze_batch),
+        web.get('/templates', list_templates),
+        web.post('/templates/render', render_template),
+        web.post('/summary', summary),
+    ])
+    return app
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="HTTP API for dashcam analysis and incident text")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Analysis worker processes (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Analyses allowed to wait for a worker before 429s (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--worker-memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help=f"Decoded image memory per worker (default: {DEFAULT_MEMORY_MB})")
+    args = parser.parse_args()
+
+    openai_key = os.getenv('OPENAI_API_KEY')
+    if not openai_key:
+        print("⚠️  OPENAI_API_KEY not set: analysis uses local extraction only")
+    app = create_app(args.workers, args.queue_size, openai_key, args.worker_memory_mb)
+    print(f"API on http://{args.host}:{args.port} ({args.workers} worker(s), queue {args.queue_size})")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the extraction and form-data helpers.
+
+Runs each function many times against synthetic dashcam frames (see
+synthetic_frames.py) and fixed sample inputs, so results are reproducible
+offline, and saves them as JSON for comparing across commits:
+
+    python benchmark.py --json bench_main.json
+    git checkout my-branch
+    python benchmark.py --json bench_branch.json --compare bench_main.json
+
+Benchmarks whose dependencies are missing here (selenium for fill_form,
+the tesseract binary for OCR) are reported as skipped.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from synthetic_frames import write_dataset
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_RESPONSES = [
+    "DATE: 2026-02-15\nTIME: 14:30\nREGISTRATION: AB12 CDE\nCOLOUR: silver\n"
+    "INCIDENT_TYPE: corner\nDETAILS: Silver hatchback parked on the junction",
+    "DATE: NOT VISIBLE\nTIME: NOT VISIBLE\nREGISTRATION: NOT VISIBLE\nCOLOUR: NOT VISIBLE\n"
+    "INCIDENT_TYPE: pavement\nDETAILS: Van on the footway",
+    "15/02/2026 14:30:05 NEXTBASE 522GW\nAB1Z CDE 30MPH\nsome OCR noise |||",
+]
+
+
+class Skip(Exception):
+    """Raised by a benchmark's setup when it cannot run here."""
+
+
+def measure(func, repeat, warmup=3):
+    """Call func() `repeat` times (after `warmup` calls) and summarise the timings"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': timings[0] * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'p95_ms': timings[int(0.95 * (len(timings) - 1))] * 1000,
+    }
+
+
+def _fill_form():
+    try:
+        import fill_form
+    except ImportError as e:
+        raise Skip(f"fill_form needs {e.name}")
+    return fill_form
+
+
+def benchmarks(frames, form_data_path):
+    """(name, setup) pairs; setup returns the zero-argument function to time"""
+    import extract_from_image as extract
+
+    def parse():
+        return lambda: [extract.parse_extracted_data(text) for text in SAMPLE_RESPONSES]
+
+    def templates():
+        # A fresh registry reads, validates and compiles the file; the cached
+        # one behind load_incident_templates would only be copied
+        from incident_templates import TemplateRegistry
+        path = os.path.join(BASE_DIR, 'incident_templates.txt')
+        return lambda: TemplateRegistry(path)
+
+    def form_data():
+        fill_form = _fill_form()
+        return lambda: fill_form.load_form_data(form_data_path)
+
+    def per_frame(function, frame):
+        def setup():
+            return lambda: function(frame['path'])
+        return setup
+
+    def ocr(frame):
+        def setup():
+            if not shutil.which('tesseract'):
+                raise Skip("tesseract is not installed")
+            return lambda: extract.extract_with_ocr(frame['path'])
+        return setup
+
+    cases = [
+        ('parse_extracted_data', parse),
+        ('TemplateRegistry', templates),
+        ('load_form_data', form_data),
+    ]
+    for frame in frames:
+        label = f"{frame['width']}x{frame['height']}"
+        cases.append((f"extract_from_exif[{label}]", per_frame(extract.extract_from_exif, frame)))
+        cases.append((f"extract_from_filename[{label}]", per_frame(extract.extract_from_filename, frame)))
+        cases.append((f"extract_with_ocr[{label}]", ocr(frame)))
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat=50, only=None):
+    """Run every benchmark (or those whose name contains `only`) and return the results"""
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # One frame per resolution keeps a run short
+        frames = write_dataset(os.path.join(work_dir, 'frames'), per_resolution=1)
+        form_data_path = os.path.join(work_dir, 'form_data.txt')
+        shutil.copy(os.path.join(BASE_DIR, 'form_data.txt.example'), form_data_path)
+
+        for name, setup in benchmarks(frames, form_data_path):
+            if only and only not in name:
+                continue
+            # The functions print progress; keep it out of the report
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                try:
+                    func = setup()
+                    # Slow functions get fewer runs
+                    started = time.perf_counter()
+                    func()
+                    single = time.perf_counter() - started
+                    runs = max(5, min(repeat, int(2.0 / single) if single else repeat))
+                    result = measure(func, runs)
+                except Skip as e:
+                    result = {'skipped': str(e)}
+            results['benchmarks'][name] = result
+            print_line(name, result)
+
+    return results
+
+
+def print_line(name, result, baseline=None):
+    if 'skipped' in result:
+        print(f"  {name:<40} skipped: {result['skipped']}")
+        return
+    line = (f"  {name:<40}{result['median_ms']:10.3f} ms median"
+            f"{result['p95_ms']:10.3f} ms p95  (n={result['repeat']})")
+    if baseline and 'median_ms' in baseline:
+        ratio = result['median_ms'] / baseline['median_ms'] if baseline['median_ms'] else float('inf')
+        line += f"   {ratio:5.2f}x vs baseline"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for extraction and form helpers")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed runs per benchmark (default: 50)")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    print(f"Benchmarks ({args.repeat} runs each)")
+    results = run(args.repeat, args.only)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')})")
+        for name, result in results['benchmarks'].items():
+            print_line(name, result, baseline['benchmarks'].get(name))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Prometheus-format metrics for the Telegram bot.
+
+Metrics are kept in plain in-process structures; recording is a dict lookup
+and a few additions under a lock. The /metrics endpoint runs on its own
+thread, so scraping never runs on the bot's event loop.
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# A conversation with no answer for this long is counted as abandoned and dropped
+CONVERSATION_IDLE_SECONDS = 6 * 60 * 60
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels, or read from a callback at scrape time."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.callback = callback
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        return dict(self.values)
+
+    def samples(self, values):
+        """Formatted samples from a snapshot() (callbacks are called here)"""
+        if self.callback:
+            yield self.name, "", self.callback()
+            return
+        for label_values, value in values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, *label_values, value):
+        row = self.values.get(label_values)
+        if row is None:
+            row = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def snapshot(self):
+        return {label_values: list(row) for label_values, row in self.values.items()}
+
+    def samples(self, values):
+        for label_values, row in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labels, label_values, ("le", bound)), cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), row[-1]
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), cumulative
+
+
+class MetricsRegistry:
+    """Holds the bot's metrics and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        # chat id -> (state, time of last move)
+        self._conversation_state = {}
+
+        self.handler_latency = self.add(Histogram(
+            "nextbase_bot_handler_seconds", "Time spent in each conversation handler", ("handler",)))
+        self.handler_errors = self.add(Counter(
+            "nextbase_bot_handler_errors_total", "Handler calls that raised", ("handler",)))
+        self.photo_download = self.add(Histogram(
+            "nextbase_bot_photo_download_seconds", "Time to download one photo from Telegram"))
+        self.conversations_completed = self.add(Counter(
+            "nextbase_bot_conversations_completed_total", "Conversations that reached the summary"))
+        self.conversations_abandoned = self.add(Counter(
+            "nextbase_bot_conversations_abandoned_total", "Conversations cancelled with /cancel or left idle, by the state they were in",
+            ("state",)))
+        self.conversations_active = self.add(Gauge(
+            "nextbase_bot_conversations_active", "Conversations in progress, by current state", ("state",)))
+        self.event_loop_lag = self.add(Histogram(
+            "nextbase_bot_event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)))
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def observe(self, histogram, *label_values, value):
+        with self._lock:
+            histogram.observe(*label_values, value=value)
+
+    def inc(self, counter, *label_values, amount=1):
+        with self._lock:
+            counter.inc(*label_values, amount=amount)
+
+    def enter_state(self, key, state):
+        """Record that a conversation moved to `state` (None ends it)."""
+        now = time.monotonic()
+        with self._lock:
+            previous = self._conversation_state.pop(key, None)
+            if previous is not None:
+                self.conversations_active.dec(previous[0])
+            if state is not None:
+                self._conversation_state[key] = (state, now)
+                self.conversations_active.inc(state)
+            self._expire_conversations(now)
+
+    def current_state(self, key):
+        with self._lock:
+            entry = self._conversation_state.get(key)
+        return entry[0] if entry else None
+
+    def _expire_conversations(self, now):
+        """Drop conversations idle past CONVERSATION_IDLE_SECONDS; caller holds the lock."""
+        cutoff = now - CONVERSATION_IDLE_SECONDS
+        stale = [key for key, (_, seen) in self._conversation_state.items() if seen < cutoff]
+        for key in stale:
+            state, _ = self._conversation_state.pop(key)
+            self.conversations_active.dec(state)
+            self.conversations_abandoned.inc(state)
+
+    def render(self):
+        """Render all metrics in Prometheus text exposition format"""
+        # Copy under the lock, format outside it so handlers are not held up by a scrape
+        with self._lock:
+            self._expire_conversations(time.monotonic())
+            snapshot = [(metric, metric.snapshot()) for metric in self._metrics]
+        lines = []
+        for metric, values in snapshot:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples(values):
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def instrumented(handler_name, state_names):
+    """Decorate a conversation handler to time it and follow the conversation state.
+
+    `state_names` maps the handler's returned state to a label; the
+    ConversationHandler.END value (-1) ends the conversation.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(update, context):
+            key = update.effective_chat.id if update and update.effective_chat else None
+            started = time.perf_counter()
+            try:
+                result = await func(update, context)
+            except Exception:
+                metrics.inc(metrics.handler_errors, handler_name)
+                raise
+            finally:
+                metrics.observe(metrics.handler_latency, handler_name,
+                                value=time.perf_counter() - started)
+
+            if key is not None and result is not None:
+                if result == -1:
+                    metrics.enter_state(key, None)
+                else:
+                    metrics.enter_state(key, state_names.get(result, str(result)))
+            return result
+        return wrapper
+    return decorator
+
+
+def record_abandoned(update):
+    """Count a cancelled conversation against the state it was in.
+
+    A user who just stops answering is counted (and dropped from
+    nextbase_bot_conversations_active) once the conversation has been idle
+    for CONVERSATION_IDLE_SECONDS.
+    """
+    key = update.effective_chat.id if update and update.effective_chat else None
+    state = metrics.current_state(key)
+    if state is not None:
+        metrics.inc(metrics.conversations_abandoned, state)
+        metrics.enter_state(key, None)
+
+
+def record_completed():
+    """Count a conversation that reached the summary."""
+    metrics.inc(metrics.conversations_completed)
+
+
+async def monitor_event_loop_lag(interval=0.5):
+    """Measure how late the event loop wakes up from a fixed sleep, forever."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        metrics.observe(metrics.event_loop_lag, value=max(0.0, time.perf_counter() - expected))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Bulk photo analysis through the OpenAI Batch API.
+
+For a backlog of hundreds of photos, one synchronous Vision call per photo is
+slow and full price. This writes every analysis request to a JSONL batch
+file, submits it, polls until the batch finishes and streams the answers
+through parse_extracted_data into a results file (one JSON line per photo).
+
+Progress is kept in a state file next to the results. If the run is
+interrupted, running the same command again resumes polling the batches
+already submitted instead of paying for them twice, and photos that already
+have a result are skipped. Each request file (the photos, base64-encoded)
+is deleted once its batch's results are in the results file.
+
+Usage:
+    python bulk_analysis.py photos/*.jpg --out results.jsonl
+    python bulk_analysis.py photos/*.jpg --fake          # local fake API, no network
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from extract_from_image import (
+    ALL_FIELDS,
+    OPENAI_AVAILABLE,
+    VISION_MODEL,
+    build_vision_messages,
+    parse_extracted_data,
+)
+from incident_ledger import hash_image
+
+if OPENAI_AVAILABLE:
+    from openai import OpenAI
+
+# The Batch API limits input files to 200 MB; photos are base64 in the JSONL
+MAX_BATCH_BYTES = 150 * 1024 * 1024
+DEFAULT_POLL_INTERVAL = 30
+FINISHED_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+def load_results(results_path):
+    """custom_id -> result for every photo already analyzed"""
+    results = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result['custom_id']] = result
+    return results
+
+
+def load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {'batches': []}
+
+
+def save_state(state_path, state):
+    # Write-then-rename so an interruption never leaves half a state file
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def write_batch_files(image_paths, batch_dir, fields=None):
+    """Write request JSONL files (split to stay under MAX_BATCH_BYTES).
+
+    Returns [(path, {custom_id: image_path})].
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    batches = []
+    out = None
+    for image_path in image_paths:
+        custom_id = hash_image(image_path)
+        line = json.dumps({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {
+                'model': VISION_MODEL,
+                'messages': build_vision_messages([image_path], fields),
+                'max_tokens': 500,
+            },
+        }) + '\n'
+        if out is None or out.tell() + len(line) > MAX_BATCH_BYTES:
+            if out:
+                out.close()
+            path = os.path.join(batch_dir, f"batch_{int(time.time())}_{len(batches) + 1}.jsonl")
+            out = open(path, 'w')
+            batches.append((path, {}))
+        out.write(line)
+        batches[-1][1][custom_id] = image_path
+    if out:
+        out.close()
+    return batches
+
+
+def submit_batches(client, image_paths, state, state_path, batch_dir, fields=None):
+    """Upload and create a batch for each request file, recording each in the state file"""
+    for path, images in write_batch_files(image_paths, batch_dir, fields):
+        with open(path, 'rb') as f:
+            uploaded = client.files.create(file=f, purpose='batch')
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h',
+        )
+        state['batches'].append({'id': batch.id, 'input_file': path, 'images': images})
+        save_state(state_path, state)
+        print(f"✓ Submitted batch {batch.id} ({len(images)} photo(s))")
+
+
+def collect_batch(client, batch, results_path):
+    """Stream a finished batch's output into the results file; returns photos written"""
+    written = 0
+    with open(results_path, 'a') as out:
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get('response') or {}
+                result = {'custom_id': item['custom_id']}
+                if response.get('status_code') == 200:
+                    text = response['body']['choices'][0]['message']['content']
+                    result['text'] = text
+                    result['data'] = parse_extracted_data(text)
+                else:
+                    result['error'] = item.get('error') or response.get('body')
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+                written += 1
+    return written
+
+
+def run_bulk(client, image_paths, results_path, state_path, fields=None,
+             poll_interval=DEFAULT_POLL_INTERVAL, batch_dir=None):
+    """Submit whatever has not been analyzed yet and wait for every batch.
+
+    Returns custom_id -> result (with its 'image' path) for the photos in
+    image_paths only, even if the results file holds other photos too.
+    """
+    batch_dir = batch_dir or os.path.splitext(results_path)[0] + '_batches'
+    state = load_state(state_path)
+    by_hash = {hash_image(p): p for p in image_paths}
+    # Failed photos are tried again
+    done = {cid for cid, result in load_results(results_path).items() if 'error' not in result}
+    pending = {cid for entry in state['batches'] for cid in entry['images']}
+
+    todo = []
+    for custom_id, image_path in by_hash.items():
+        if custom_id not in done and custom_id not in pending:
+            todo.append(image_path)
+            pending.add(custom_id)
+
+    if state['batches']:
+        print(f"Resuming {len(state['batches'])} batch(es) already submitted")
+    if todo:
+        submit_batches(client, todo, state, state_path, batch_dir, fields)
+    elif not state['batches']:
+        print("Nothing to do: every photo already has a result")
+
+    while state['batches']:
+        for entry in list(state['batches']):
+            batch = client.batches.retrieve(entry['id'])
+            if batch.status not in FINISHED_STATUSES:
+                continue
+            written = collect_batch(client, batch, results_path)
+            print(f"✓ Batch {batch.id} {batch.status}: {written}/{len(entry['images'])} result(s)")
+            # The request file (base64 photos, up to MAX_BATCH_BYTES) is not needed once
+            # the results are in; resuming only needs the batch id
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry['input_file'])
+            state['batches'].remove(entry)
+            save_state(state_path, state)
+        if state['batches']:
+            time.sleep(poll_interval)
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    with contextlib.suppress(OSError):
+        os.rmdir(batch_dir)  # only if nothing else is left in it
+    # Only this run's photos, with file names attached for the caller
+    results = {}
+    for custom_id, result in load_results(results_path).items():
+        if custom_id in by_hash:
+            result['image'] = by_hash[custom_id]
+            results[custom_id] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many photos through the OpenAI Batch API")
+    parser.add_argument("images", nargs="+", help="Photos to analyze")
+    parser.add_argument("--out", default="bulk_results.jsonl",
+                        help="Results file, one JSON line per photo (default: bulk_results.jsonl)")
+    parser.add_argument("--state", help="State file for resuming (default: <out>.state.json)")
+    parser.add_argument("--fields", help=f"Comma-separated fields to ask for (default: all of {','.join(ALL_FIELDS)})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between status checks (default: 30)")
+    parser.add_argument("--base-url", help="API base URL (e.g. a local fake)")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run against an in-process fake batch API (no network, no key)")
+    args = parser.parse_args()
+
+    if not OPENAI_AVAILABLE:
+        print("Error: the openai package is required (pip install -r requirements.txt)")
+        sys.exit(1)
+
+    image_paths = [p for p in args.images if os.path.exists(p)]
+    for missing in set(args.images) - set(image_paths):
+        print(f"⚠️  Skipping missing file: {missing}")
+    fields = args.fields.split(',') if args.fields else None
+
+    fake = None
+    base_url = args.base_url
+    if args.fake:
+        from fake_batch_api import FakeBatchAPI
+        fake = FakeBatchAPI(delay=1.0)
+        base_url = fake.start()
+        args.poll_interval = min(args.poll_interval, 0.5)
+
+    load_dotenv()
+    api_key = os.getenv('OPENAI_API_KEY') or ('fake' if fake or base_url else None)
+    if not api_key:
+        print("Error: set OPENAI_API_KEY (or use --fake)")
+        sys.exit(1)
+
+    client = OpenAI(api_key=api_key, base_url=base_url)
+    try:
+        results = run_bulk(client, image_paths, args.out, args.state or args.out + '.state.json',
+                           fields=fields, poll_interval=args.poll_interval)
+    finally:
+        if fake:
+            fake.stop()
+
+    failed = sum(1 for r in results.values() if 'error' in r)
+    print(f"\n✓ {len(results) - failed} photo(s) analyzed, {failed} failed; results in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Loose parsing of incident details typed as one line, e.g. a photo caption:
+
+    corner AB12 XYZ silver Hunter House Road 15/02 14:30
+    pavement, ab12xyz, dark blue, on Hunter House Rd yesterday 2pm
+
+Each token is recognised by what it looks like rather than where it is, so
+the order does not matter and anything can be left out: the incident type
+by keyword (typos allowed), the registration by UK plate format (with or
+without its space), the colour from the usual colour words, and the date
+and time by their shapes. Of what is left, a name ending in a road word
+("... Road", "... Lane") or found in the road index is the street; anything
+else is ignored. Only fields that were found are returned, so the caller can
+ask for the rest.
+"""
+
+import difflib
+import re
+from datetime import datetime, timedelta
+
+from registration_index import UK_PLATE_FORMATS, correct_registration, is_valid_plate
+from road_index import is_known_street
+
+INCIDENT_TYPE_WORDS = {'corner': 'corner', 'pavement': 'pavement',
+                       'footway': 'pavement', 'footpath': 'pavement', 'kerb': 'pavement'}
+COLOUR_WORDS = ('white', 'silver', 'grey', 'gray', 'black', 'red', 'orange', 'yellow', 'green', 'blue',
+                'purple', 'brown', 'beige', 'gold', 'pink', 'maroon', 'bronze', 'turquoise', 'cream')
+COLOUR_MODIFIERS = {'dark', 'light', 'pale', 'metallic', 'navy'}
+# Words that make a preceding colour part of a street name ("Green Lane")
+STREET_SUFFIXES = {'road', 'rd', 'street', 'lane', 'ln', 'avenue', 'ave', 'close', 'drive', 'way', 'crescent',
+                   'grove', 'place', 'terrace', 'hill', 'view', 'walk', 'court', 'gardens', 'park', 'row',
+                   'square', 'mount', 'bank', 'vale', 'rise', 'green'}
+# A street name ends in one of these ("St Mary's Road", "Abbey Ln")
+STREET_ENDINGS = STREET_SUFFIXES | {'st', 'dr', 'cl', 'cres', 'gr', 'pl', 'ter', 'gdns', 'sq'}
+FILLER_WORDS = {'on', 'at', 'in', 'near', 'by', 'parking', 'parked', 'outside', 'opposite', 'of'}
+PLATE_LENGTHS = {len(layout) for _, layout in UK_PLATE_FORMATS}
+
+_TOKEN = re.compile(r'[^\s,;|]+')
+_DATE = re.compile(r'^(?:(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2}|\d{4}))?'
+                   r'|(\d{1,2})\.(\d{1,2})\.(\d{2}|\d{4}))$')
+_TIME = re.compile(r'^(\d{1,2})(?:[:.](\d{2}))?(am|pm)?$', re.IGNORECASE)
+_MERIDIEM = re.compile(r'^(am|pm)$', re.IGNORECASE)
+
+
+def _parse_date(token, today):
+    word = token.lower()
+    if word == 'today':
+        return today
+    if word == 'yesterday':
+        return today - timedelta(days=1)
+    match = _DATE.match(token)
+    if not match:
+        return None
+    groups = match.groups()
+    if groups[0]:
+        year, month, day = groups[0:3]
+    elif groups[3]:
+        day, month, year = groups[3:6]
+    else:
+        day, month, year = groups[6:9]
+    if year is None:
+        year = today.year
+    elif len(year) == 2:
+        year = 2000 + int(year)
+    try:
+        parsed = datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    if groups[4] and not groups[5] and parsed.date() > today.date():
+        parsed = parsed.replace(year=parsed.year - 1)  # "15/12" typed in January
+    return parsed
+
+
+def _parse_time(token, meridiem=None):
+    match = _TIME.match(token)
+    if not match:
+        return None
+    hour, minute, suffix = int(match.group(1)), int(match.group(2) or 0), match.group(3) or meridiem
+    # A bare number is only a time with am/pm ("2pm", "2 pm")
+    if match.group(2) is None and not suffix:
+        return None
+    if suffix:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if suffix.lower() == 'pm' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _display_plate(text):
+    registration, name = correct_registration(text)
+    # Written with the space where it is on the plate: AB12 CDE, A123 BCD, ABC 123D
+    split = {'current': 4, 'prefix': len(registration) - 3, 'suffix': 3}[name]
+    return f"{registration[:split]} {registration[split:]}"
+
+
+def _incident_type(word):
+    word = word.lower()
+    if len(word) < 4 or not word.isalpha():
+        return None
+    if word in INCIDENT_TYPE_WORDS:
+        return INCIDENT_TYPE_WORDS[word]
+    close = difflib.get_close_matches(word, INCIDENT_TYPE_WORDS, n=1, cutoff=0.8)
+    return INCIDENT_TYPE_WORDS[close[0]] if close else None
+
+
+def _colour(word):
+    word = word.lower()
+    if word in COLOUR_WORDS:
+        return 'grey' if word == 'gray' else word
+    if len(word) < 5 or not word.isalpha():
+        return None
+    close = difflib.get_close_matches(word, COLOUR_WORDS, n=1, cutoff=0.8)
+    return close[0] if close else None
+
+
+def _street(words, known_street):
+    """The street in a run of words between filler words, or None"""
+    if known_street(' '.join(words)):
+        return words
+    # Cut after the last road word: "Hunter House Road again" -> "Hunter House Road"
+    for end in range(len(words) - 1, 0, -1):
+        if _road_word(words[end]):
+            return words[:end + 1]
+    return None
+
+
+def _road_word(token):
+    return token.lower().rstrip('.') in STREET_ENDINGS
+
+
+def _colour_starts_street(tokens, i, known_street):
+    """Whether the colour at tokens[i] is the first word of a street name:
+    "Green Lane" is a street, but in "silver Park Road" the road word after
+    "Park" shows that "Park Road" is the street and silver the colour"""
+    if i + 1 >= len(tokens) or tokens[i + 1].lower().rstrip('.') not in STREET_SUFFIXES:
+        return False
+    end = i + 2
+    while end < len(tokens) and _road_word(tokens[end]):
+        end += 1
+    return end == i + 2 or known_street(' '.join(tokens[i:end]))
+
+
+def parse_caption(text, today=None, known_street=is_known_street):
+    """Incident details found in free text.
+
+    Returns a dict with any of: incident_type ('corner'/'pavement'),
+    registration, colour, date (DD/MM/YYYY), time (HH:MM) and street.
+    `known_street(name)` accepts street names without a road word.
+
+    >>> today = datetime(2026, 3, 1)
+    >>> parse_caption('corner ab12 cde silver Hunter House Road 15/02 14:30', today)['registration']
+    'AB12 CDE'
+    >>> parse_caption('A123 BCD pavement', today)['registration']
+    'A123 BCD'
+    >>> parse_caption('ABC 123D orange', today)
+    {'registration': 'ABC 123D', 'colour': 'orange'}
+    >>> parse_caption('blue range rover on Abbey Lane', today)
+    {'colour': 'blue', 'street': 'Abbey Lane'}
+    >>> parse_caption('parked on the pavement again', today)
+    {'incident_type': 'pavement'}
+    >>> parse_caption('corner AB12CDE silver Park Road 14:30', today)
+    {'incident_type': 'corner', 'registration': 'AB12 CDE', 'colour': 'silver', 'time': '14:30', 'street': 'Park Road'}
+    >>> parse_caption('black Bank Street', today)
+    {'colour': 'black', 'street': 'Bank Street'}
+    >>> parse_caption('white Hill Street', today)
+    {'colour': 'white', 'street': 'Hill Street'}
+    >>> parse_caption('red Green Lane', today)
+    {'colour': 'red', 'street': 'Green Lane'}
+    >>> parse_caption('Green Lane AB12CDE', today)
+    {'registration': 'AB12 CDE', 'street': 'Green Lane'}
+    """
+    today = today or datetime.now()
+    tokens = _TOKEN.findall(text or '')
+    used = [False] * len(tokens)
+    found = {}
+
+    def claim(field, value, *indexes):
+        found[field] = value
+        for index in indexes:
+            used[index] = True
+
+    for i, token in enumerate(tokens):
+        if used[i]:
+            continue
+        following = tokens[i + 1] if i + 1 < len(tokens) and not used[i + 1] else None
+
+        if 'registration' not in found:
+            # "AB12 XYZ" and "ABC 123D" are two tokens, "AB12XYZ" one
+            if following and len(token + following) in PLATE_LENGTHS and is_valid_plate(token + following):
+                claim('registration', _display_plate(token + following), i, i + 1)
+                continue
+            if len(token) in PLATE_LENGTHS and is_valid_plate(token):
+                claim('registration', _display_plate(token), i)
+                continue
+
+        if 'date' not in found:
+            parsed = _parse_date(token, today)
+            if parsed:
+                claim('date', parsed.strftime('%d/%m/%Y'), i)
+                continue
+
+        if 'time' not in found:
+            if following and _MERIDIEM.match(following) and _parse_time(token, following):
+                claim('time', _parse_time(token, following), i, i + 1)
+                continue
+            parsed = _parse_time(token)
+            if parsed:
+                claim('time', parsed, i)
+                continue
+
+        if 'incident_type' not in found:
+            incident_type = _incident_type(token)
+            if incident_type:
+                claim('incident_type', incident_type, i)
+                continue
+
+        if 'colour' not in found:
+            colour = _colour(token)
+            if colour and not _colour_starts_street(tokens, i, known_street):
+                if i > 0 and not used[i - 1] and tokens[i - 1].lower() in COLOUR_MODIFIERS:
+                    claim('colour', f"{tokens[i - 1].lower()} {colour}", i - 1, i)
+                else:
+                    claim('colour', colour, i)
+                continue
+
+    # Unclaimed words, split into runs at claimed tokens and filler words
+    runs, run = [], []
+    for token, is_used in zip(tokens, used):
+        if is_used or token.lower() in FILLER_WORDS:
+            runs.append(run)
+            run = []
+        else:
+            run.append(token)
+    runs.append(run)
+    for run in runs:
+        words = _street(run, known_street) if run else None
+        if words and any(c.isalpha() for c in ''.join(words)):
+            street = ' '.join(words)
+            found['street'] = street.title() if street.islower() else street
+            break
+    return found
+
+
+def describe_caption(found):
+    """One line per field found, for confirming back to the user"""
+    labels = (('incident_type', 'Type'), ('registration', 'Registration'), ('colour', 'Colour'),
+              ('street', 'Street'), ('date', 'Date'), ('time', 'Time'))
+    lines = []
+    for field, label in labels:
+        if field in found:
+            value = found[field]
+            if field == 'incident_type':
+                value = f"{value.capitalize()} parking"
+            lines.append(f"• {label}: {value}")
+    return '\n'.join(lines)
@@ -0,0 +1,188 @@
+"""
+Local vehicle colour estimation.
+
+Takes the bodywork around the number plate (or the centre of the frame when
+no plate was found), clusters its pixels with a small vectorized k-means in
+CIELAB, and names the largest cluster with the colour words the police form
+expects, together with a confidence score.
+
+The score is how close the cluster is to its colour word times its share
+of the region (see SHARE_EXPONENT), not counting clusters that are really road
+or sky (they also fill strips of the frame beside the region), so a clean
+frame of the right colour clears the cascade threshold.
+"""
+
+import numpy as np
+
+from image_decode import decoded
+
+# Reference colours (sRGB) for the words used on the form
+COLOUR_NAMES = {
+    'red': (170, 20, 25),
+    'orange': (225, 110, 20),
+    'yellow': (230, 200, 30),
+    'green': (30, 110, 50),
+    'blue': (25, 60, 150),
+    'purple': (90, 40, 120),
+    'brown': (100, 65, 40),
+    'beige': (200, 180, 140),
+    'gold': (180, 150, 80),
+}
+
+# Below this chroma a colour is treated as white/silver/grey/black
+ACHROMATIC_CHROMA = 12
+
+SAMPLE_PIXELS = 4000
+
+# A cluster is background if it holds this share of the pixels beside the region
+BACKGROUND_SHARE = 0.25
+# Strip pixels further than this (Delta E) from every cluster are ignored
+BACKGROUND_MAX_DISTANCE = 15
+# Confidence grows with share ** this: a clear majority clears the cascade threshold,
+# an even split between two colours does not
+SHARE_EXPONENT = 0.8
+
+
+def srgb_to_lab(rgb):
+    """Convert an (..., 3) array of 0-255 sRGB values to CIELAB (D65)"""
+    rgb = np.asarray(rgb, dtype=np.float32) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124, 0.2126, 0.0193],
+        [0.3576, 0.7152, 0.1192],
+        [0.1805, 0.0722, 0.9505],
+    ], dtype=np.float32)
+    xyz /= np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+
+_REFERENCE_NAMES = list(COLOUR_NAMES)
+_REFERENCE_LAB = srgb_to_lab(np.array([COLOUR_NAMES[n] for n in _REFERENCE_NAMES]))
+
+
+def kmeans(points, k=4, iterations=12, seed=0):
+    """Plain k-means; returns (centres, labels). Deterministic for a given seed."""
+    rng = np.random.default_rng(seed)
+    # k-means++ initialisation
+    centres = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distances = np.min(((points[:, None, :] - np.array(centres)[None]) ** 2).sum(-1), axis=1)
+        total = distances.sum()
+        if total == 0:
+            break
+        centres.append(points[rng.choice(len(points), p=distances / total)])
+    centres = np.array(centres)
+
+    for _ in range(iterations):
+        labels = np.argmin(((points[:, None, :] - centres[None]) ** 2).sum(-1), axis=1)
+        updated = np.array([
+            points[labels == i].mean(axis=0) if np.any(labels == i) else centres[i]
+            for i in range(len(centres))
+        ])
+        if np.allclose(updated, centres, atol=0.5):
+            break
+        centres = updated
+    return centres, labels
+
+
+def name_colour(lab):
+    """Map one Lab colour to a form colour word and a closeness score (0-1)"""
+    lightness, a, b = (float(v) for v in lab)
+    chroma = (a * a + b * b) ** 0.5
+
+    if chroma < ACHROMATIC_CHROMA:
+        if lightness >= 85:
+            name = 'white'
+        elif lightness >= 55:
+            name = 'silver'
+        elif lightness >= 30:
+            name = 'grey'
+        else:
+            name = 'black'
+        # Fully sure up to half the achromatic chroma, then falling off to 0.5 at the limit
+        return name, 1.0 - max(0.0, chroma - ACHROMATIC_CHROMA / 2) / ACHROMATIC_CHROMA
+
+    distances = np.sqrt(((_REFERENCE_LAB - np.array([lightness, a, b])) ** 2).sum(axis=1))
+    best = int(np.argmin(distances))
+    return _REFERENCE_NAMES[best], float(np.exp(-distances[best] / 40))
+
+
+def vehicle_region(image_size, plate_box=None):
+    """Where to sample bodywork: around/above the plate, or the centre of the frame"""
+    width, height = image_size
+    if plate_box:
+        left, top, right, bottom = plate_box
+        plate_w, plate_h = right - left, bottom - top
+        return (
+            max(0, left - plate_w), max(0, top - 3 * plate_h),
+            min(width, right + plate_w), min(height, bottom + plate_h),
+        )
+    return (int(width * 0.3), int(height * 0.3), int(width * 0.7), int(height * 0.7))
+
+
+def background_strips(rgb, region):
+    """Pixels beside the sampled region (same rows), where there is no vehicle"""
+    left, top, right, bottom = region
+    width = max(1, (right - left) // 4)
+    strips = [rgb[top:bottom, max(0, left - width):left], rgb[top:bottom, right:right + width]]
+    return np.concatenate([strip.reshape(-1, 3) for strip in strips])
+
+
+def background_clusters(centres, background_lab):
+    """Indexes of clusters that most of the background strip pixels fall into"""
+    if len(background_lab) == 0:
+        return set()
+    distances = np.sqrt(((background_lab[:, None, :] - centres[None]) ** 2).sum(-1))
+    nearest = np.argmin(distances, axis=1)
+    close = distances[np.arange(len(nearest)), nearest] <= BACKGROUND_MAX_DISTANCE
+    counts = np.bincount(nearest[close], minlength=len(centres))
+    return {i for i in range(len(centres)) if counts[i] >= BACKGROUND_SHARE * len(background_lab)}
+
+
+def estimate_vehicle_colour(image_path, plate_box=None, k=4):
+    """Estimate the vehicle's colour without a network call.
+
+    `plate_box` is (left, top, right, bottom) in original image pixels, as
+    returned by extract_from_image.localize_plates.
+    Returns (colour, confidence) where confidence is 0-1, or (None, 0.0) if
+    there was nothing to sample.
+    """
+    with decoded(image_path, 'RGB', (640, 640), reduce=False) as image:
+        size = image.size
+        if plate_box:
+            factor = image.width / image.info['original_size'][0]
+            plate_box = tuple(round(v * factor) for v in plate_box)
+        rgb = np.asarray(image, dtype=np.uint8)
+    left, top, right, bottom = vehicle_region(size, plate_box)
+    region = rgb[top:bottom, left:right]
+    background = background_strips(rgb, (left, top, right, bottom))
+
+    keep = np.ones(region.shape[:2], dtype=bool)
+    if plate_box:
+        # Leave out the plate itself
+        keep[max(0, plate_box[1] - top):max(0, plate_box[3] - top),
+             max(0, plate_box[0] - left):max(0, plate_box[2] - left)] = False
+    pixels = region[keep]
+    if len(pixels) == 0:
+        return None, 0.0
+
+    if len(pixels) > SAMPLE_PIXELS:
+        pixels = pixels[::len(pixels) // SAMPLE_PIXELS][:SAMPLE_PIXELS]
+
+    lab = srgb_to_lab(pixels)
+    centres, labels = kmeans(lab, k=k)
+    counts = np.bincount(labels, minlength=len(centres))
+    dominant = int(np.argmax(counts))
+    if len(background) > SAMPLE_PIXELS:
+        background = background[::len(background) // SAMPLE_PIXELS][:SAMPLE_PIXELS]
+    # The dominant cluster always counts (a grey car on a grey road is still the car)
+    ignored = background_clusters(centres, srgb_to_lab(background)) - {dominant}
+    share = counts[dominant] / sum(counts[i] for i in range(len(centres)) if i not in ignored)
+
+    colour, closeness = name_colour(centres[dominant])
+    return colour, round(float(share ** SHARE_EXPONENT * closeness), 2)
@@ -1,10 +1,18 @@
 import os
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageFilter, ImageStat
 from PIL.ExifTags import TAGS
 import pytesseract
 from datetime import datetime
 import re
 from dateutil import parser as date_parser
+from registration_index import correct_registration
+from colour_estimator import estimate_vehicle_colour
+from overlay_reader import read_overlay
+from image_decode import decoded
+from road_index import lookup_street
+from vision_resilience import CircuitOpenError, get_vision_guard
+from tracing import span, trace_from_argv, traced
 
 try:
     from openai import OpenAI
@@ -12,9 +20,42 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# EXIF tag holding the GPS IFD
+GPSINFO_TAG = 0x8825
 
+
+def _gps_coordinates(gps_info):
+    """Decimal (lat, lon) from an EXIF GPSInfo dict, or None"""
+    try:
+        def degrees(dms, ref):
+            d, m, sec = (float(v) for v in dms)
+            value = d + m / 60 + sec / 3600
+            return -value if ref in ('S', 'W') else value
+        lat = degrees(gps_info[2], gps_info.get(1, 'N'))
+        lon = degrees(gps_info[4], gps_info.get(3, 'E'))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    # Cameras without a fix often write zeros
+    if lat == 0 and lon == 0:
+        return None
+    return lat, lon
+
+
+@traced()
+def extract_gps(image_path):
+    """(lat, lon) from the photo's EXIF GPS tags, or None"""
+    try:
+        with Image.open(image_path) as image:
+            exif_data = image._getexif() or {}
+    except Exception:
+        return None
+    gps_info = exif_data.get(GPSINFO_TAG)
+    return _gps_coordinates(gps_info) if isinstance(gps_info, dict) else None
+
+
+@traced()
 def extract_from_exif(image_path):
-    """Extract date/time from image EXIF metadata"""
+    """Extract date/time (and GPS position, if present) from image EXIF metadata"""
     print(f"Extracting EXIF metadata from: {image_path}")
     
     try:
@@ -30,6 +71,11 @@ def extract_from_exif(image_path):
             tag = TAGS.get(tag_id, tag_id)
             exif[tag] = value
         
+        gps = _gps_coordinates(exif['GPSInfo']) if isinstance(exif.get('GPSInfo'), dict) else None
+        location = {'latitude': gps[0], 'longitude': gps[1]} if gps else {}
+        if gps:
+            print(f"  Found GPS position: {gps[0]:.6f}, {gps[1]:.6f}")
+        
         # Look for DateTime fields
         date_fields = ['DateTime', 'DateTimeOriginal', 'DateTimeDigitized']
         
@@ -46,7 +92,8 @@ def extract_from_exif(image_path):
                         'date': dt.strftime('%Y-%m-%d'),
                         'time': dt.strftime('%H:%M'),
                         'day_of_week': dt.strftime('%A'),
-                        'source': 'EXIF'
+                        'source': 'EXIF',
+                        **location,
                     }
                     
                     print(f"  ✓ Extracted from EXIF: {data['date']} {data['time']} ({data['day_of_week']})")
@@ -55,13 +102,14 @@ def extract_from_exif(image_path):
                     print(f"  Could not parse date: {e}")
         
         print("  No datetime found in EXIF")
-        return None
+        return dict(location, source='EXIF') if gps else None
         
     except Exception as e:
         print(f"  EXIF extraction error: {e}")
         return None
 
 
+@traced()
 def extract_from_filename(image_path):
     """Try to extract date/time from filename"""
     filename = os.path.basename(image_path)
@@ -90,81 +138,353 @@ def extract_from_filename(image_path):
     return None
 
 
+# Longest side given to whole-frame OCR
+OCR_MAX_SIDE = 2560
+
+
+@traced()
 def extract_with_ocr(image_path):
     """Extract text from image using OCR"""
     print(f"Analyzing image with OCR: {image_path}")
     
     try:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image)
-        return text
+        # Timestamps and plates stay legible well below full resolution
+        with decoded(image_path, 'L', (OCR_MAX_SIDE, OCR_MAX_SIDE)) as image:
+            return pytesseract.image_to_string(image)
     except Exception as e:
         print(f"OCR Error: {e}")
         return ""
 
 
-def extract_with_openai(image_path, api_key):
-    """Extract incident details from image using OpenAI Vision API"""
-    if not OPENAI_AVAILABLE:
-        print("OpenAI library not available, falling back to OCR")
-        return extract_with_ocr(image_path)
-    
-    print(f"Analyzing image with OpenAI Vision: {image_path}")
+# UK number plates are 520mm x 111mm
+PLATE_ASPECT_RATIO = 520 / 111
+# Plate heights (pixels, at PLATE_WORKING_WIDTH) to search for
+PLATE_HEIGHTS = (14, 19, 26, 36, 50)
+PLATE_WORKING_WIDTH = 960
+# Plate crop height (pixels) given to tesseract
+PLATE_OCR_HEIGHT = 60
+
+
+
+def _box_sums(integral, ys, xs, height, width):
+    """Sums and areas of boxes with top-left corners on the ys x xs grid (clipped to the image)"""
+    max_y, max_x = integral.shape[0] - 1, integral.shape[1] - 1
+    y0 = np.clip(ys, 0, max_y)[:, None]
+    y1 = np.clip(ys + height, 0, max_y)[:, None]
+    x0 = np.clip(xs, 0, max_x)[None, :]
+    x1 = np.clip(xs + width, 0, max_x)[None, :]
+    sums = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    return sums, (y1 - y0) * (x1 - x0)
+
+
+def _integral(mask):
+    integral = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=integral[1:, 1:])
+    return integral
+
+
+@traced()
+def localize_plates(image_path, max_candidates=5):
+    """Find likely number plate regions without OCR or network.
+    
+    Scores windows of plate aspect ratio, at several sizes, by how much of the
+    window is plate-coloured (yellow rear / white front plates) and how dense
+    the vertical edges from the characters are. Everything is computed with
+    integral images, so each scale is a handful of array operations.
+    
+    Returns up to max_candidates dicts, best first:
+      {'box': (left, top, right, bottom) in original pixels, 'score', 'colour'}
+    """
+    with decoded(image_path, 'RGB', (PLATE_WORKING_WIDTH, None)) as image:
+        original_size = image.info['original_size']
+        hsv = np.asarray(image.convert('HSV'), dtype=np.int16)
+        grey = np.asarray(image.convert('L'), dtype=np.int16)
+    
+    scale = original_size[0] / grey.shape[1]
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    masks = {
+        # PIL hue runs 0-255; yellow is ~60 degrees
+        'yellow': (hue >= 25) & (hue <= 50) & (saturation >= 90) & (value >= 110),
+        'white': (saturation <= 45) & (value >= 170),
+    }
     
-    try:
-        client = OpenAI(api_key=api_key)
+    # Character strokes give strong horizontal gradients (vertical edges)
+    edges = np.zeros(grey.shape, dtype=np.uint8)
+    edges[:, 1:] = np.abs(grey[:, 1:] - grey[:, :-1]) > 40
+    edge_integral = _integral(edges)
+    
+    mask_integrals = {colour: _integral(mask.astype(np.uint8)) for colour, mask in masks.items()}
+    
+    candidates = []
+    for height in PLATE_HEIGHTS:
+        width = round(height * PLATE_ASPECT_RATIO)
+        if height >= grey.shape[0] or width >= grey.shape[1]:
+            continue
+        step = max(3, height // 4)
+        ys = np.arange(0, grey.shape[0] - height + 1, step)
+        xs = np.arange(0, grey.shape[1] - width + 1, step)
+        # Surrounding ring: a real plate stands out from what is around it
+        pad_y, pad_x = max(2, height // 3), max(2, width // 8)
         
-        # Read image and encode to base64
-        import base64
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        edge_sums, area = _box_sums(edge_integral, ys, xs, height, width)
+        edge_density = edge_sums / area
         
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": """Analyze this dashcam/street image and extract the following information:
-1. Date (look for date stamp on the image)
-2. Time (look for time stamp on the image)
-3. Vehicle registration number (license plate)
-4. Vehicle colour (the main body color of the vehicle in the image)
-5. Incident type - determine if this is a:
+        for colour, integral in mask_integrals.items():
+            inside, _ = _box_sums(integral, ys, xs, height, width)
+            outer, outer_area = _box_sums(integral, ys - pad_y, xs - pad_x,
+                                          height + 2 * pad_y, width + 2 * pad_x)
+            colour_fraction = inside / area
+            ring_fraction = (outer - inside) / np.maximum(outer_area - area, 1)
+            # Mostly plate-coloured, with text edges spread across, unlike the ring around it
+            score = np.where(
+                (colour_fraction >= 0.35) & (edge_density >= 0.06),
+                colour_fraction * (1 - ring_fraction) * np.minimum(edge_density / 0.2, 1.0),
+                0.0,
+            )
+            # Keep only the best few windows per scale/colour
+            keep = min(score.size, max_candidates * 4)
+            best = np.argpartition(score.ravel(), -keep)[-keep:]
+            for flat_index in best:
+                if score.flat[flat_index] <= 0:
+                    continue
+                row, col = divmod(int(flat_index), score.shape[1])
+                candidates.append((float(score.flat[flat_index]), int(xs[col]), int(ys[row]),
+                                   width, height, colour))
+    
+    # Greedy non-maximum suppression
+    candidates.sort(reverse=True)
+    chosen = []
+    for score, x, y, width, height, colour in candidates:
+        overlaps = False
+        for _, cx, cy, cw, ch, _ in chosen:
+            ix = max(0, min(x + width, cx + cw) - max(x, cx))
+            iy = max(0, min(y + height, cy + ch) - max(y, cy))
+            if ix * iy > 0.3 * min(width * height, cw * ch):
+                overlaps = True
+                break
+        if not overlaps:
+            chosen.append((score, x, y, width, height, colour))
+            if len(chosen) == max_candidates:
+                break
+    
+    return [
+        {
+            'box': (round(x * scale), round(y * scale),
+                    round((x + width) * scale), round((y + height) * scale)),
+            'score': score,
+            'colour': colour,
+        }
+        for score, x, y, width, height, colour in chosen
+    ]
+
+
+def plate_crops(image_path, candidates, margin=0.15):
+    """Crop each candidate plate region (with a small margin), decoded only as
+    finely as the smallest plate needs for OCR"""
+    if not candidates:
+        return []
+    smallest = min(bottom - top for _, top, _, bottom in (c['box'] for c in candidates))
+    reduction = max(1.0, smallest / PLATE_OCR_HEIGHT)
+    crops = []
+    with Image.open(image_path) as image:
+        wanted = (round(image.width / reduction), round(image.height / reduction))
+    with decoded(image_path, 'RGB', wanted, reduce=False) as image:
+        scale = image.width / image.info['original_size'][0]
+        for candidate in candidates:
+            left, top, right, bottom = candidate['box']
+            pad_x = round((right - left) * margin)
+            pad_y = round((bottom - top) * margin)
+            crops.append(image.crop((
+                max(0, round((left - pad_x) * scale)), max(0, round((top - pad_y) * scale)),
+                min(image.width, round((right + pad_x) * scale)),
+                min(image.height, round((bottom + pad_y) * scale)),
+            )))
+    return crops
+
+
+@traced()
+def extract_registration_from_plates(image_path, max_candidates=5, candidates=None):
+    """OCR the best plate crops for the first valid UK registration.
+    
+    Returns (registration, confidence, box) where box is the candidate the
+    plate was read from, or (None, 0.0, None) if no crop reads as a plate.
+    """
+    if candidates is None:
+        candidates = localize_plates(image_path, max_candidates)
+    print(f"  Found {len(candidates)} plate candidate(s)")
+    
+    for candidate, crop in zip(candidates, plate_crops(image_path, candidates)):
+        # Upscale small crops so characters are large enough for tesseract
+        if crop.height < PLATE_OCR_HEIGHT:
+            factor = PLATE_OCR_HEIGHT / crop.height
+            crop = crop.resize((round(crop.width * factor), PLATE_OCR_HEIGHT), Image.LANCZOS)
+        try:
+            text = pytesseract.image_to_string(
+                crop.convert('L'),
+                config='--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+            )
+        except Exception as e:
+            print(f"  Plate OCR error on {candidate['colour']} region {candidate['box']}: {e}")
+            continue
+        
+        registration, plate_format = correct_registration(text)
+        if registration:
+            print(f"  ✓ Plate read from {candidate['colour']} region {candidate['box']}: {registration}")
+            # Reads that needed confusable characters fixing are less certain
+            confidence = 0.9 if registration == re.sub(r'[^A-Z0-9]', '', text.upper()) else 0.7
+            if plate_format != 'current':
+                confidence -= 0.1
+            return registration, confidence, candidate['box']
+    
+    return None, 0.0, None
+
+
+VISION_FIELD_PROMPTS = {
+    'date': ("Date (look for date stamp on the image)",
+             "DATE: [date in format YYYY-MM-DD or as shown]"),
+    'time': ("Time (look for time stamp on the image)",
+             "TIME: [time in format HH:MM]"),
+    'registration': ("Vehicle registration number (license plate)",
+                     "REGISTRATION: [vehicle registration number]"),
+    'colour': ("Vehicle colour (the main body color of the vehicle in the image)",
+               "COLOUR: [vehicle colour e.g. silver, blue, white, black, red]"),
+    'incident_type': ("""Incident type - determine if this is a:
    - "corner" incident: vehicle parked within 10m of a junction/corner, obscuring visibility at junction, or on dropped kerb near junction
-   - "pavement" incident: vehicle parked partly or wholly on pavement/footway, blocking pedestrian access
+   - "pavement" incident: vehicle parked partly or wholly on pavement/footway, blocking pedestrian access""",
+                      "INCIDENT_TYPE: [corner OR pavement]"),
+}
+
+ALL_FIELDS = tuple(VISION_FIELD_PROMPTS)
+
+# Filled only by local tiers (GPS + road index), never asked of Vision
+LOCAL_FIELDS = ('street',)
+
+
+VISION_MODEL = "gpt-4o"
+
+# Most photos sent in one Vision request
+MAX_VISION_IMAGES = 6
+
+# Fields that need small text read, so images are sent at high detail
+HIGH_DETAIL_FIELDS = {'registration', 'date', 'time'}
+
+# Low detail shows the model the image at this size; smaller images gain nothing from high
+LOW_DETAIL_SIZE = 512
+
+
+def build_vision_prompt(fields=None, image_count=1):
+    """Vision prompt asking only for `fields` (all fields by default)"""
+    fields = [f for f in ALL_FIELDS if fields is None or f in fields]
+    questions = "\n".join(
+        f"{n}. {VISION_FIELD_PROMPTS[f][0]}" for n, f in enumerate(fields, 1)
+    )
+    answers = "\n".join(VISION_FIELD_PROMPTS[f][1] for f in fields)
+    if image_count > 1:
+        subject = (f"These {image_count} dashcam/street images all show the same incident. "
+                   "Take each field from whichever image shows it most clearly, combine them "
+                   "into one answer and")
+    else:
+        subject = "Analyze this dashcam/street image and"
+    return f"""{subject} extract the following information:
+{questions}
 
 Please format your response as:
-DATE: [date in format YYYY-MM-DD or as shown]
-TIME: [time in format HH:MM]
-REGISTRATION: [vehicle registration number]
-COLOUR: [vehicle colour e.g. silver, blue, white, black, red]
-INCIDENT_TYPE: [corner OR pavement]
+{answers}
 DETAILS: [brief description of what you see]
 
 If any information is not visible or unclear, write "NOT VISIBLE" for that field."""
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=500
+
+
+def vision_image_part(image_path, wanted):
+    """Image content part for one photo: MIME type from the file itself, and high
+    detail only if `wanted` needs small text read and the photo is bigger than
+    what low detail shows"""
+    import base64
+    import mimetypes
+    
+    try:
+        with Image.open(image_path) as image:
+            mime = Image.MIME.get(image.format)
+            size = image.size
+    except Exception:
+        mime, size = None, None
+    mime = mime or mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+    small = size is not None and max(size) <= LOW_DETAIL_SIZE
+    detail = "high" if wanted & HIGH_DETAIL_FIELDS and not small else "low"
+    
+    with open(image_path, "rb") as image_file:
+        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:{mime};base64,{base64_image}",
+            "detail": detail
+        }
+    }
+
+
+def build_vision_messages(image_paths, fields=None):
+    """Chat messages asking about `fields` in all of `image_paths` (base64-embedded)"""
+    wanted = set(ALL_FIELDS if fields is None else fields)
+    content = [{"type": "text", "text": build_vision_prompt(fields, len(image_paths))}]
+    for image_path in image_paths:
+        content.append(vision_image_part(image_path, wanted))
+    return [{"role": "user", "content": content}]
+
+
+def _ocr_all(image_paths):
+    return "\n".join(extract_with_ocr(image_path) for image_path in image_paths)
+
+
+@traced()
+def extract_with_openai(image_paths, api_key, fields=None, fallback=True):
+    """Extract incident details from one or more images using OpenAI Vision API
+    
+    All images go in a single request and the answer combines them.
+    `fields` limits the question to those fields (see ALL_FIELDS). If the
+    request fails (or the circuit breaker is open) whole-frame OCR text is
+    returned instead, unless `fallback` is False, when the error is raised.
+    """
+    if isinstance(image_paths, str):
+        image_paths = [image_paths]
+    image_paths = list(image_paths)[:MAX_VISION_IMAGES]
+    
+    if not OPENAI_AVAILABLE:
+        if not fallback:
+            raise RuntimeError("OpenAI library not available")
+        print("OpenAI library not available, falling back to OCR")
+        return _ocr_all(image_paths)
+    
+    print(f"Analyzing {len(image_paths)} image(s) with OpenAI Vision: {', '.join(image_paths)}")
+    
+    try:
+        # Retries, timeouts and hedging are handled by the guard, not the client
+        client = OpenAI(api_key=api_key, max_retries=0)
+        messages = build_vision_messages(image_paths, fields)
+        response = get_vision_guard().call(
+            lambda timeout: client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=messages,
+                max_tokens=500,
+                timeout=timeout
+            )
         )
         
         return response.choices[0].message.content
+    except CircuitOpenError:
+        if not fallback:
+            raise
+        print("OpenAI unavailable (circuit breaker open), using local OCR...")
+        return _ocr_all(image_paths)
     except Exception as e:
+        if not fallback:
+            raise
         print(f"OpenAI API Error: {e}")
         print("Falling back to OCR...")
-        return extract_with_ocr(image_path)
+        return _ocr_all(image_paths)
 
 
+@traced()
 def parse_extracted_data(extracted_text):
     """Parse extracted text to find incident details"""
     data = {
@@ -221,6 +541,12 @@ def parse_extracted_data(extracted_text):
         r'\b([A-Z]{2}\d{2}\s?[A-Z]{3})\b',
         r'\b([A-Z]\d{1,3}\s?[A-Z]{3})\b',
     ]
+    # OCR often swaps 0/O, 1/I, 5/S and 8/B; these only accept plates that can
+    # be corrected to the current format
+    ocr_reg_patterns = [
+        r'REGISTRATION[:\s]+([A-Z0-9]{2}[0-9OISB]{2}\s?[A-Z0-9]{3})\b',
+        r'\b([A-Z0-9]{2}[0-9OISB]{2}\s?[A-Z0-9]{3})\b',
+    ]
     
     for pattern in reg_patterns:
         match = re.search(pattern, extracted_text, re.IGNORECASE)
@@ -228,6 +554,18 @@ def parse_extracted_data(extracted_text):
             data['registration'] = match.group(1).replace(' ', '')
             break
     
+    if not data['registration']:
+        for pattern in ocr_reg_patterns:
+            for match in re.finditer(pattern, extracted_text):
+                registration = match.group(1).replace(' ', '')
+                corrected, _ = correct_registration(registration, formats=('current',))
+                if corrected:
+                    print(f"  Corrected OCR registration {registration} -> {corrected}")
+                    data['registration'] = corrected
+                    break
+            if data['registration']:
+                break
+    
     # Look for colour patterns
     colour_patterns = [
         r'COLOU?R[:\s]+([a-zA-Z\s]+?)(?:\n|$|(?=\w+:))',
@@ -259,81 +597,287 @@ def parse_extracted_data(extracted_text):
     return data
 
 
-def analyze_dashcam_image(image_path, openai_api_key=None):
-    """Main function to analyze dashcam image and extract incident details"""
-    if not os.path.exists(image_path):
-        print(f"Error: Image file not found: {image_path}")
-        return None
+def image_sharpness(image_path, size=512):
+    """Score how sharp an image is (edge variance on a downscaled greyscale copy)"""
+    with decoded(image_path, 'L', (size, size), reduce=False) as grey:
+        grey.thumbnail((size, size))
+        edges = grey.filter(ImageFilter.FIND_EDGES)
+        return ImageStat.Stat(edges).var[0]
+
+
+@traced()
+def select_best_frame(image_paths):
+    """Pick the sharpest, then largest, of several photos of the same incident"""
+    best_path = None
+    best_score = None
     
-    incident_data = {}
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as image:
+                pixels = image.width * image.height
+            score = (image_sharpness(image_path), pixels)
+        except Exception as e:
+            print(f"  Could not score {image_path}: {e}")
+            continue
+        
+        if best_score is None or score > best_score:
+            best_path = image_path
+            best_score = score
     
+    return best_path or (image_paths[0] if image_paths else None)
+
+
+# Fields below this confidence are passed on to the next tier of the cascade
+CASCADE_MIN_CONFIDENCE = 0.6
+
+# Confidence given to values from each source
+TIER_CONFIDENCE = {
+    'EXIF': 0.95,
+    'filename': 0.8,
+    'OpenAI': 0.85,
+    'OCR': 0.5,
+    'GPS': 0.8,
+}
+
+
+def _match_street(lat, lon, accept):
+    """Street (and nearest junction on it) for a GPS position from the offline road index"""
+    with span('lookup_street'):
+        match = lookup_street(lat, lon)
+    if not match:
+        print("  No street matched for the GPS position (is roads.idx built? see road_index.py)")
+        return
+    print(f"  ✓ GPS street: {match['street']} ({match['distance_m']}m away)")
+    accept('street', match['street'], 'GPS', TIER_CONFIDENCE['GPS'])
+    if match['junction']:
+        print(f"    Junction with {match['junction']}: {match['junction_distance_m']}m")
+        accept('junction', match['junction'], 'GPS', TIER_CONFIDENCE['GPS'])
+        accept('junction_distance_m', match['junction_distance_m'], 'GPS', TIER_CONFIDENCE['GPS'])
+
+
+def _run_local_tiers(image_path, accept, missing):
+    """Tiers 1-3 for one photo: EXIF (and GPS street), filename, then overlay/plate/colour (no network)"""
     # Try EXIF metadata first
     print("\n" + "="*50)
-    print("Method 1: Trying EXIF metadata...")
+    print("Tier 1: Trying EXIF metadata...")
     print("="*50)
     exif_data = extract_from_exif(image_path)
+    if exif_data and 'latitude' in exif_data:
+        accept('latitude', exif_data['latitude'], 'EXIF', TIER_CONFIDENCE['EXIF'])
+        accept('longitude', exif_data['longitude'], 'EXIF', TIER_CONFIDENCE['EXIF'])
+        if 'street' in missing():
+            _match_street(exif_data['latitude'], exif_data['longitude'], accept)
     
     # Try filename extraction
-    if not exif_data:
+    if not (exif_data and exif_data.get('date')):
         print("\n" + "="*50)
-        print("Method 2: Trying filename timestamp...")
+        print("Tier 2: Trying filename timestamp...")
         print("="*50)
         exif_data = extract_from_filename(image_path)
     
     # If EXIF or filename provided date/time, use it
     if exif_data:
-        incident_data['date'] = exif_data['date']
-        incident_data['time'] = exif_data['time']
-        incident_data['day_of_week'] = exif_data['day_of_week']
+        score = TIER_CONFIDENCE[exif_data['source']]
+        accept('date', exif_data['date'], exif_data['source'], score)
+        accept('time', exif_data['time'], exif_data['source'], score)
         print(f"\n✓ Using {exif_data['source']} data for date/time")
     
-    # Always try OCR for registration number and other details
-    print("\n" + "="*50)
-    print("Method 3: Using OCR/AI for registration and other details...")
-    print("="*50)
+    # Timestamp overlay, plate OCR and colour estimation (no network)
+    if {'date', 'time', 'registration', 'colour'} & set(missing()):
+        print("\n" + "="*50)
+        print("Tier 3: Local overlay reader, plate OCR and colour estimation...")
+        print("="*50)
+        
+        if {'date', 'time'} & set(missing()):
+            with span('read_overlay'):
+                overlay = read_overlay(image_path)
+            if overlay:
+                print(f"  ✓ Overlay timestamp ({overlay['camera']}): {overlay['text']}")
+                accept('date', overlay['date'], 'overlay', overlay['confidence'])
+                accept('time', overlay['time'], 'overlay', overlay['confidence'])
+            else:
+                print("  No timestamp overlay read")
+        
+        needs_plate = {'registration', 'colour'} & set(missing())
+        plate_candidates = localize_plates(image_path) if needs_plate else []
+        # Sample colour around the plate that was read, else the best-scoring region
+        plate_box = plate_candidates[0]['box'] if plate_candidates else None
+        
+        if 'registration' in missing():
+            registration, score, read_box = extract_registration_from_plates(
+                image_path, candidates=plate_candidates
+            )
+            accept('registration', registration, 'local OCR', score)
+            plate_box = read_box or plate_box
+        
+        if 'colour' in missing():
+            with span('estimate_vehicle_colour'):
+                colour, score = estimate_vehicle_colour(image_path, plate_box)
+            print(f"  Local colour estimate: {colour} (confidence {score:.2f})")
+            accept('colour', colour, 'local colour', score)
+
+
+@traced()
+def analyze_incident(image_paths, openai_api_key=None, fields=None):
+    """Analyze all photos of one incident and return one combined result
+    
+    Runs a cascade, cheapest first: EXIF, filename, the local overlay reader,
+    plate OCR and colour estimation on each distinct photo, then a single
+    OpenAI Vision request carrying all of them (or whole-frame OCR without a
+    key) only for the fields still below CASCADE_MIN_CONFIDENCE. Near-duplicate
+    photos are only looked at once. `fields` limits which fields are needed
+    (default: all). The result includes 'sources' and 'confidence' dicts
+    saying which tier filled each field and how sure it is. Values that never
+    reached CASCADE_MIN_CONFIDENCE are left out of their field and listed in
+    'unconfirmed' ({field: {'value', 'source', 'confidence'}}) instead.
+    """
+    found = []
+    for image_path in image_paths:
+        if os.path.exists(image_path):
+            found.append(image_path)
+        else:
+            print(f"Error: Image file not found: {image_path}")
+    image_paths = found
+    if not image_paths:
+        return None
     
-    # Use OpenAI if API key provided, otherwise use OCR
-    if openai_api_key and OPENAI_AVAILABLE:
-        extracted_text = extract_with_openai(image_path, openai_api_key)
-    else:
-        extracted_text = extract_with_ocr(image_path)
+    if len(image_paths) > 1:
+        from photo_hash import group_near_duplicates
+        groups = group_near_duplicates(image_paths)
+        print(f"\n{len(image_paths)} photo(s) in {len(groups)} group(s) of near-duplicates")
+        image_paths = [select_best_frame(g) if len(g) > 1 else g[0] for g in groups]
     
-    # Parse the extracted data
-    ocr_data = parse_extracted_data(extracted_text)
+    wanted = [f for f in ALL_FIELDS + LOCAL_FIELDS if fields is None or f in fields]
+    incident_data = {'day_of_week': None}
+    sources = {}
+    confidence = {}
     
-    # Merge: prefer EXIF for date/time, OCR for registration
-    if not incident_data.get('date'):
-        incident_data['date'] = ocr_data.get('date')
-    if not incident_data.get('time'):
-        incident_data['time'] = ocr_data.get('time')
-    if not incident_data.get('day_of_week'):
-        incident_data['day_of_week'] = ocr_data.get('day_of_week')
+    def accept(field, value, source, score):
+        if value and score > confidence.get(field, 0.0):
+            incident_data[field] = value
+            sources[field] = source
+            confidence[field] = score
     
-    incident_data['registration'] = ocr_data.get('registration')
-    incident_data['colour'] = ocr_data.get('colour')
-    incident_data['incident_type'] = ocr_data.get('incident_type')
+    def missing():
+        return [f for f in wanted if confidence.get(f, 0.0) < CASCADE_MIN_CONFIDENCE]
+    
+    for image_path in image_paths:
+        if not missing():
+            break
+        if len(image_paths) > 1:
+            print(f"\n--- {image_path} ---")
+        with span('local_tiers', image=image_path):
+            _run_local_tiers(image_path, accept, missing)
+    
+    # Vision (or whole-frame OCR) only for whatever is still missing
+    remaining = [f for f in missing() if f not in LOCAL_FIELDS]
+    if remaining:
+        print("\n" + "="*50)
+        print(f"Tier 4: Using OCR/AI for: {', '.join(remaining)}")
+        print("="*50)
+        
+        # Use OpenAI if API key provided (one request for every photo), otherwise use OCR
+        extracted_text = None
+        if openai_api_key and OPENAI_AVAILABLE:
+            try:
+                extracted_text = extract_with_openai(image_paths, openai_api_key, remaining, fallback=False)
+                source = 'OpenAI'
+            except CircuitOpenError:
+                print("OpenAI unavailable (circuit breaker open), using local OCR...")
+            except Exception as e:
+                print(f"OpenAI API Error: {e}")
+                print("Falling back to OCR...")
+        if extracted_text is None:
+            extracted_text = _ocr_all(image_paths)
+            source = 'OCR'
+        
+        # Parse the extracted data
+        ocr_data = parse_extracted_data(extracted_text)
+        for field in remaining:
+            accept(field, ocr_data.get(field), source, TIER_CONFIDENCE[source])
+    
+    # Low-confidence guesses are offered separately, not filled in as answers
+    unconfirmed = {}
+    for field, score in list(confidence.items()):
+        if score < CASCADE_MIN_CONFIDENCE:
+            unconfirmed[field] = {'value': incident_data.pop(field), 'source': sources.pop(field),
+                                  'confidence': confidence.pop(field)}
+    
+    for field in ALL_FIELDS + LOCAL_FIELDS + ('latitude', 'longitude', 'junction', 'junction_distance_m'):
+        incident_data.setdefault(field, None)
+    if incident_data.get('date'):
+        incident_data['day_of_week'] = datetime.strptime(incident_data['date'], '%Y-%m-%d').strftime('%A')
+    incident_data['sources'] = sources
+    incident_data['confidence'] = confidence
+    incident_data['unconfirmed'] = unconfirmed
     
     print("\n" + "="*50)
     print("FINAL EXTRACTED DATA:")
     print("="*50)
-    print(f"  Date: {incident_data.get('date') or 'NOT FOUND'}")
-    print(f"  Time: {incident_data.get('time') or 'NOT FOUND'}")
-    print(f"  Day of week: {incident_data.get('day_of_week') or 'NOT FOUND'}")
-    print(f"  Registration: {incident_data.get('registration') or 'NOT FOUND'}")
-    print(f"  Colour: {incident_data.get('colour') or 'NOT FOUND'}")
-    print(f"  Incident type: {incident_data.get('incident_type') or 'NOT FOUND'}")
+    for field, label in [('date', 'Date'), ('time', 'Time'), ('registration', 'Registration'),
+                         ('colour', 'Colour'), ('incident_type', 'Incident type'), ('street', 'Street')]:
+        if field in sources:
+            print(f"  {label}: {incident_data[field]}  [{sources[field]}, {confidence[field]:.2f}]")
+        elif field in unconfirmed:
+            guess = unconfirmed[field]
+            print(f"  {label}: NOT CONFIRMED (guess {guess['value']}  [{guess['source']}, {guess['confidence']:.2f}])")
+        else:
+            print(f"  {label}: NOT FOUND")
+        if field == 'time':
+            print(f"  Day of week: {incident_data.get('day_of_week') or 'NOT FOUND'}")
     
     return incident_data
 
 
+def analyze_dashcam_image(image_path, openai_api_key=None, fields=None):
+    """Main function to analyze dashcam image and extract incident details
+    
+    Single-photo form of analyze_incident.
+    """
+    return analyze_incident([image_path], openai_api_key, fields)
+
+
+def analyze_dashcam_images(image_paths, openai_api_key=None, fields=None):
+    """Analyze several photos, running the analysis once per group of near-duplicates.
+    
+    Returns {image_path: incident_data}. Photos in the same group share the
+    result of the group's sharpest photo.
+    """
+    from photo_hash import group_near_duplicates
+    
+    groups = group_near_duplicates(image_paths)
+    print(f"\n{len(image_paths)} photo(s) in {len(groups)} group(s) of near-duplicates")
+    
+    results = {}
+    for group in groups:
+        representative = select_best_frame(group) if len(group) > 1 else group[0]
+        if len(group) > 1:
+            print(f"\nAnalyzing {representative} for {len(group)} near-identical photos")
+        incident_data = analyze_dashcam_image(representative, openai_api_key, fields)
+        for image_path in group:
+            results[image_path] = dict(incident_data) if incident_data else incident_data
+    
+    return results
+
+
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python extract_from_image.py <image_path> [openai_api_key]")
+        print("Usage: python extract_from_image.py [--incident] [--trace out.json] <image_path> [more_images...] [openai_api_key]")
+        print("  --incident  treat all photos as one incident and combine them into one result")
+        print("  --trace     write a Chrome trace of each stage's timing")
         sys.exit(1)
     
-    image_path = sys.argv[1]
-    api_key = sys.argv[2] if len(sys.argv) > 2 else None
+    args = sys.argv[1:]
+    trace_from_argv(args)
+    incident = '--incident' in args
+    if incident:
+        args.remove('--incident')
+    # A trailing argument that isn't a file is the API key
+    api_key = args.pop() if len(args) > 1 and not os.path.exists(args[-1]) else None
     
-    analyze_dashcam_image(image_path, api_key)
+    if len(args) == 1 or incident:
+        analyze_incident(args, api_key)
+    else:
+        analyze_dashcam_images(args, api_key)
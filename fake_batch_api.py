@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Files and Batch endpoints.
+
+Implements just enough of the REST API for bulk_analysis.py to upload a
+batch file, create a batch, poll it and download the output, without any
+network access or API key:
+
+    POST /v1/files                 (multipart upload, purpose=batch)
+    GET  /v1/files/{id}/content
+    POST /v1/batches
+    GET  /v1/batches/{id}
+    POST /v1/batches/{id}/cancel
+
+Batches complete `delay` seconds after they are created. Every request gets
+the same canned answer, with each asked-for field reported as NOT VISIBLE
+unless `reply` is given.
+
+Usage:
+    python fake_batch_api.py --port 8089 --delay 5
+    python bulk_analysis.py photos/*.jpg --base-url http://127.0.0.1:8089/v1
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER_LINE = re.compile(r'^([A-Z_]+): \[', re.MULTILINE)
+
+
+def default_reply(body):
+    """NOT VISIBLE for every field the prompt asks for"""
+    prompt = body['messages'][0]['content'][0]['text']
+    lines = [f"{field}: NOT VISIBLE" for field in ANSWER_LINE.findall(prompt)]
+    return "\n".join(lines) or "DETAILS: NOT VISIBLE"
+
+
+class FakeBatchAPI:
+    """In-memory files and batches behind a local HTTP server."""
+
+    def __init__(self, delay=1.0, reply=None):
+        self.delay = delay
+        self.reply = reply
+        self.files = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _new_id(self, prefix):
+        return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+    def add_file(self, content, filename, purpose):
+        file_id = self._new_id("file")
+        with self._lock:
+            self.files[file_id] = {
+                "id": file_id, "object": "file", "bytes": len(content),
+                "created_at": int(time.time()), "filename": filename,
+                "purpose": purpose, "status": "processed", "content": content,
+            }
+        return self.files[file_id]
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        if input_file_id not in self.files:
+            return None
+        batch_id = self._new_id("batch")
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": endpoint,
+            "input_file_id": input_file_id, "completion_window": completion_window,
+            "status": "in_progress", "output_file_id": None, "error_file_id": None,
+            "created_at": int(time.time()), "request_counts": None,
+            "_ready_at": time.monotonic() + self.delay,
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch and batch["status"] == "in_progress" and time.monotonic() >= batch["_ready_at"]:
+                self._complete(batch)
+        return batch
+
+    def _complete(self, batch):
+        """Answer every request in the batch's input file"""
+        lines = self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        output = []
+        for line in filter(None, lines):
+            request = json.loads(line)
+            text = self.reply if self.reply is not None else default_reply(request["body"])
+            output.append(json.dumps({
+                "id": self._new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": self._new_id("req"),
+                    "body": {
+                        "id": self._new_id("chatcmpl"),
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request["body"].get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }],
+                    },
+                },
+                "error": None,
+            }))
+        output_id = self._new_id("file")
+        content = ("\n".join(output) + "\n").encode("utf-8")
+        self.files[output_id] = {
+            "id": output_id, "object": "file", "bytes": len(content),
+            "created_at": int(time.time()), "filename": "batch_output.jsonl",
+            "purpose": "batch_output", "status": "processed", "content": content,
+        }
+        batch.update(status="completed", output_file_id=output_id,
+                     completed_at=int(time.time()),
+                     request_counts={"total": len(output), "completed": len(output), "failed": 0})
+
+    def start(self, port=0, host="127.0.0.1"):
+        """Serve in a background thread; returns the base URL for the OpenAI client"""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, payload=None, raw=None):
+                body = raw if raw is not None else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream" if raw is not None
+                                 else "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _public(self, record):
+                return {k: v for k, v in record.items() if k != "content" and not k.startswith("_")}
+
+            def _not_found(self):
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    batch = api.get_batch(parts[2])
+                    return self._send(200, self._public(batch)) if batch else self._not_found()
+                if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+                    record = api.files.get(parts[2])
+                    return self._send(200, raw=record["content"]) if record else self._not_found()
+                if parts[:2] == ["v1", "files"] and len(parts) == 3:
+                    record = api.files.get(parts[2])
+                    return self._send(200, self._public(record)) if record else self._not_found()
+                self._not_found()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                parts = self.path.strip("/").split("/")
+                if parts == ["v1", "files"]:
+                    form = BytesParser(policy=HTTP).parsebytes(
+                        b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+                    )
+                    fields = {}
+                    filename = "batch.jsonl"
+                    for part in form.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        fields[name] = part.get_payload(decode=True)
+                        if name == "file":
+                            filename = part.get_filename() or filename
+                    record = api.add_file(fields.get("file", b""), filename,
+                                          fields.get("purpose", b"batch").decode())
+                    return self._send(200, self._public(record))
+                if parts == ["v1", "batches"]:
+                    request = json.loads(body or b"{}")
+                    batch = api.create_batch(request.get("input_file_id"), request.get("endpoint"),
+                                             request.get("completion_window", "24h"))
+                    return self._send(200, self._public(batch)) if batch else self._not_found()
+                if parts[:2] == ["v1", "batches"] and len(parts) == 4 and parts[3] == "cancel":
+                    batch = api.get_batch(parts[2])
+                    if not batch:
+                        return self._not_found()
+                    if batch["status"] == "in_progress":
+                        batch["status"] = "cancelled"
+                    return self._send(200, self._public(batch))
+                self._not_found()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake of the OpenAI Files and Batch API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=5.0,
+                        help="Seconds before each batch completes (default: 5)")
+    parser.add_argument("--reply", help="Answer every request with this text")
+    args = parser.parse_args()
+
+    api = FakeBatchAPI(delay=args.delay, reply=args.reply)
+    url = api.start(args.port)
+    print(f"Fake batch API listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,13 @@ from selenium.webdriver.chrome.options import Options
 from datetime import datetime
 import time
 import os
-from extract_from_image import analyze_dashcam_image
+from extract_from_image import analyze_incident
+from incident_templates import get_template_registry
+from incident_ledger import IncidentLedger, describe_ledger_result
+from tracing import span, trace_from_argv, traced
 
 
+@traced()
 def setup_driver(headless=True):
     """Setup Chrome driver with options"""
     chrome_options = Options()
@@ -49,195 +53,219 @@ def load_form_data(file_path='form_data.txt'):
     return data
 
 
+@traced()
 def fill_form(driver, form_data, incident_data=None):
     """Fill the Nextbase form with provided data"""
     url = "https://secureform.nextbase.co.uk/?location=SouthYorkshire"
     
     print(f"Loading form: {url}")
-    driver.get(url)
-    
-    # Wait for page to load
-    time.sleep(3)
-    
-    # Handle the welcome modal - "I am willing to attend court if required to do so"
-    try:
-        print("Looking for welcome modal...")
-        modal = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.ID, "welcome-modal"))
-        )
-        print("  Modal found, clicking 'I am willing to attend court' button...")
-        close_button = driver.find_element(By.ID, "modal-close")
-        close_button.click()
-        time.sleep(1)
-        print("  ✓ Modal closed")
-    except Exception as e:
-        print(f"  No modal found or already closed: {e}")
-    
-    # Auto-fill today's date in YYYY-MM-DD format (for HTML5 date input)
-    if form_data.get('date_today') == '[AUTO]':
-        form_data['date_today'] = datetime.now().strftime('%Y-%m-%d')
-        print(f"  ✓ Set today's date to: {form_data['date_today']}")
-    
-    # Convert date_of_birth from dd/mm/yyyy to YYYY-MM-DD for HTML5 date input
-    if form_data.get('date_of_birth'):
-        dob = form_data.get('date_of_birth')
-        if '/' in dob:  # If in dd/mm/yyyy format, convert to YYYY-MM-DD
-            try:
-                dt = datetime.strptime(dob, '%d/%m/%Y')
-                form_data['date_of_birth'] = dt.strftime('%Y-%m-%d')
-                print(f"  ✓ Converted date_of_birth to: {form_data['date_of_birth']}")
-            except:
-                print(f"  ⚠️  Could not convert date_of_birth format: {dob}")
-    
-    # Merge incident data from image if available (for date/time extraction)
-    if incident_data:
-        if form_data.get('incident_date') == '[EXTRACT_FROM_IMAGE]':
-            # HTML5 date input expects YYYY-MM-DD format
-            form_data['incident_date'] = incident_data.get('date', '')
-            print(f"  ✓ Extracted incident date: {form_data['incident_date']}")
-        if form_data.get('incident_day') == '[EXTRACT_FROM_IMAGE]':
-            form_data['incident_day'] = incident_data.get('day_of_week', '')
-            print(f"  ✓ Extracted incident day: {form_data['incident_day']}")
-        if form_data.get('incident_time') == '[EXTRACT_FROM_IMAGE]':
-            form_data['incident_time'] = incident_data.get('time', '')
-            print(f"  ✓ Extracted incident time: {form_data['incident_time']}")
-        # Registration and colour already set from prompts/auto-detection above
-    
-    print("\nFilling form fields...")
-    
-    # Map form_data keys to field IDs
-    field_mapping = {
-        'signature': 'signature',
-        'date_today': 'frm-date-today',
-        'first_name': 'first-name',
-        'last_name': 'last-name',
-        'email': 'email',
-        'phone': 'phone',
-        'address1': 'address1',
-        'address2': 'address2',
-        'address_county': 'addresscounty',
-        'address_postcode': 'addresspc',
-        'occupation': 'occupation',
-        'date_of_birth': 'frm-date-of-birth',
-        'place_of_birth': 'place-of-birth',
-        'former_name': 'former-name',
-        'gender': 'gender',
-        'incident_location': 'incident-location',
-        'incident_location_exact': 'incident-location-exact',
-        'travelling_location': 'travelling-location',
-        'incident_date': 'frm-incident-date',
-        'incident_day': 'incident-day',
-        'incident_time': 'incident-time',
-        'incident_car_registration': 'incident-carreg',
-        'incident_car_colour': 'incident-carcolour',
-        'incident_car_make': 'incident-carmake',
-        'incident_car_model': 'incident-carmodel',
-    }
-    
-    # Fill each field
-    for data_key, field_id in field_mapping.items():
-        value = form_data.get(data_key, '')
+    with span('page_load', url=url):
+        driver.get(url)
         
-        if value and value not in ['[AUTO]', '[EXTRACT_FROM_IMAGE]']:
-            try:
-                field = driver.find_element(By.ID, field_id)
-                
-                # For date fields, use JavaScript to set the value directly
-                # to avoid issues with send_keys and date validation
-                if 'date' in data_key.lower() and field.get_attribute('type') == 'date':
-                    driver.execute_script("arguments[0].value = arguments[1];", field, value)
-                    # Trigger change event to update any listeners
-                    driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", field)
-                    print(f"  ✓ Filled {data_key}: {value}")
-                else:
-                    field.clear()
-                    field.send_keys(value)
-                    print(f"  ✓ Filled {data_key}: {value}")
-            except Exception as e:
-                print(f"  ✗ Could not fill {data_key}: {e}")
+        # Wait for page to load
+        time.sleep(3)
     
-    # Handle incident description textarea
-    if form_data.get('incident_description'):
+    with span('fill_fields'):
+        # Handle the welcome modal - "I am willing to attend court if required to do so"
         try:
-            desc_field = driver.find_element(By.ID, "incident-description")
-            desc_field.clear()
-            desc_field.send_keys(form_data['incident_description'])
-            print(f"  ✓ Filled incident description")
+            print("Looking for welcome modal...")
+            modal = WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.ID, "welcome-modal"))
+            )
+            print("  Modal found, clicking 'I am willing to attend court' button...")
+            close_button = driver.find_element(By.ID, "modal-close")
+            close_button.click()
+            time.sleep(1)
+            print("  ✓ Modal closed")
         except Exception as e:
-            print(f"  ✗ Could not fill incident description: {e}")
-    
-    # Always select "Email" for preferred contact method
-    try:
-        # Look for the preferred contact dropdown/select element
-        # Try different possible selectors
-        preferred_contact = None
-        try:
-            preferred_contact = Select(driver.find_element(By.ID, "preferredContact"))
-        except:
-            pass
+            print(f"  No modal found or already closed: {e}")
+        
+        # Auto-fill today's date in YYYY-MM-DD format (for HTML5 date input)
+        if form_data.get('date_today') == '[AUTO]':
+            form_data['date_today'] = datetime.now().strftime('%Y-%m-%d')
+            print(f"  ✓ Set today's date to: {form_data['date_today']}")
+        
+        # Convert date_of_birth from dd/mm/yyyy to YYYY-MM-DD for HTML5 date input
+        if form_data.get('date_of_birth'):
+            dob = form_data.get('date_of_birth')
+            if '/' in dob:  # If in dd/mm/yyyy format, convert to YYYY-MM-DD
+                try:
+                    dt = datetime.strptime(dob, '%d/%m/%Y')
+                    form_data['date_of_birth'] = dt.strftime('%Y-%m-%d')
+                    print(f"  ✓ Converted date_of_birth to: {form_data['date_of_birth']}")
+                except:
+                    print(f"  ⚠️  Could not convert date_of_birth format: {dob}")
         
-        if not preferred_contact:
+        # Merge incident data from image if available (for date/time extraction)
+        if incident_data:
+            unconfirmed = incident_data.get('unconfirmed', {})
+            
+            def extracted(field):
+                """Confirmed value, else the unconfirmed guess (with a warning), else ''"""
+                if incident_data.get(field):
+                    return incident_data[field]
+                guess = unconfirmed.get(field)
+                if guess:
+                    print(f"  ⚠️  Using unconfirmed {field} {guess['value']} "
+                          f"({guess['source']}, {guess['confidence']:.2f}) - check it before submitting")
+                    return guess['value']
+                return ''
+            
+            incident_date = extracted('date')
+            if form_data.get('incident_date') == '[EXTRACT_FROM_IMAGE]':
+                # HTML5 date input expects YYYY-MM-DD format
+                form_data['incident_date'] = incident_date
+                print(f"  ✓ Extracted incident date: {form_data['incident_date']}")
+            if form_data.get('incident_day') == '[EXTRACT_FROM_IMAGE]':
+                day = incident_data.get('day_of_week')
+                if not day and incident_date:
+                    try:
+                        day = datetime.strptime(incident_date, '%Y-%m-%d').strftime('%A')
+                    except ValueError:
+                        day = ''
+                form_data['incident_day'] = day or ''
+                print(f"  ✓ Extracted incident day: {form_data['incident_day']}")
+            if form_data.get('incident_time') == '[EXTRACT_FROM_IMAGE]':
+                form_data['incident_time'] = extracted('time')
+                print(f"  ✓ Extracted incident time: {form_data['incident_time']}")
+            # Registration and colour already set from prompts/auto-detection above
+        
+        print("\nFilling form fields...")
+        
+        # Map form_data keys to field IDs
+        field_mapping = {
+            'signature': 'signature',
+            'date_today': 'frm-date-today',
+            'first_name': 'first-name',
+            'last_name': 'last-name',
+            'email': 'email',
+            'phone': 'phone',
+            'address1': 'address1',
+            'address2': 'address2',
+            'address_county': 'addresscounty',
+            'address_postcode': 'addresspc',
+            'occupation': 'occupation',
+            'date_of_birth': 'frm-date-of-birth',
+            'place_of_birth': 'place-of-birth',
+            'former_name': 'former-name',
+            'gender': 'gender',
+            'incident_location': 'incident-location',
+            'incident_location_exact': 'incident-location-exact',
+            'travelling_location': 'travelling-location',
+            'incident_date': 'frm-incident-date',
+            'incident_day': 'incident-day',
+            'incident_time': 'incident-time',
+            'incident_car_registration': 'incident-carreg',
+            'incident_car_colour': 'incident-carcolour',
+            'incident_car_make': 'incident-carmake',
+            'incident_car_model': 'incident-carmodel',
+        }
+        
+        # Fill each field
+        for data_key, field_id in field_mapping.items():
+            value = form_data.get(data_key, '')
+            
+            if value and value not in ['[AUTO]', '[EXTRACT_FROM_IMAGE]']:
+                try:
+                    field = driver.find_element(By.ID, field_id)
+                    
+                    # For date fields, use JavaScript to set the value directly
+                    # to avoid issues with send_keys and date validation
+                    if 'date' in data_key.lower() and field.get_attribute('type') == 'date':
+                        driver.execute_script("arguments[0].value = arguments[1];", field, value)
+                        # Trigger change event to update any listeners
+                        driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", field)
+                        print(f"  ✓ Filled {data_key}: {value}")
+                    else:
+                        field.clear()
+                        field.send_keys(value)
+                        print(f"  ✓ Filled {data_key}: {value}")
+                except Exception as e:
+                    print(f"  ✗ Could not fill {data_key}: {e}")
+        
+        # Handle incident description textarea
+        if form_data.get('incident_description'):
             try:
-                preferred_contact = Select(driver.find_element(By.NAME, "preferredContact"))
-            except:
-                pass
+                desc_field = driver.find_element(By.ID, "incident-description")
+                desc_field.clear()
+                desc_field.send_keys(form_data['incident_description'])
+                print(f"  ✓ Filled incident description")
+            except Exception as e:
+                print(f"  ✗ Could not fill incident description: {e}")
         
-        if preferred_contact:
-            preferred_contact.select_by_visible_text("Email")
-            print(f"  ✓ Selected preferred contact: Email")
-    except Exception as e:
-        print(f"  ✗ Could not set preferred contact: {e}")
-    
-    # Always select "18 or over" for age
-    try:
-        age_dropdown = None
+        # Always select "Email" for preferred contact method
         try:
-            age_dropdown = Select(driver.find_element(By.ID, "age"))
-        except:
-            pass
-        
-        if not age_dropdown:
+            # Look for the preferred contact dropdown/select element
+            # Try different possible selectors
+            preferred_contact = None
             try:
-                age_dropdown = Select(driver.find_element(By.NAME, "age"))
+                preferred_contact = Select(driver.find_element(By.ID, "preferredContact"))
             except:
                 pass
+            
+            if not preferred_contact:
+                try:
+                    preferred_contact = Select(driver.find_element(By.NAME, "preferredContact"))
+                except:
+                    pass
+            
+            if preferred_contact:
+                preferred_contact.select_by_visible_text("Email")
+                print(f"  ✓ Selected preferred contact: Email")
+        except Exception as e:
+            print(f"  ✗ Could not set preferred contact: {e}")
         
-        if age_dropdown:
-            # Try to select by visible text first, fallback to index if that fails
+        # Always select "18 or over" for age
+        try:
+            age_dropdown = None
             try:
-                age_dropdown.select_by_visible_text("18 or over")
+                age_dropdown = Select(driver.find_element(By.ID, "age"))
             except:
-                age_dropdown.select_by_index(3)  # Try 4th option (index 3) if text match fails
-            print(f"  ✓ Selected age: 18 or over")
-    except Exception as e:
-        print(f"  ✗ Could not set age: {e}")
-    
-    # Always fill "Not applicable" for unavailable dates
-    try:
-        dates_field = driver.find_element(By.ID, "dates-unavailiable")
-        dates_field.clear()
-        dates_field.send_keys("Not applicable")
-        print(f"  ✓ Filled unavailable dates: Not applicable")
-    except Exception as e:
-        print(f"  ✗ Could not fill unavailable dates: {e}")
+                pass
+            
+            if not age_dropdown:
+                try:
+                    age_dropdown = Select(driver.find_element(By.NAME, "age"))
+                except:
+                    pass
+            
+            if age_dropdown:
+                # Try to select by visible text first, fallback to index if that fails
+                try:
+                    age_dropdown.select_by_visible_text("18 or over")
+                except:
+                    age_dropdown.select_by_index(3)  # Try 4th option (index 3) if text match fails
+                print(f"  ✓ Selected age: 18 or over")
+        except Exception as e:
+            print(f"  ✗ Could not set age: {e}")
+        
+        # Always fill "Not applicable" for unavailable dates
+        try:
+            dates_field = driver.find_element(By.ID, "dates-unavailiable")
+            dates_field.clear()
+            dates_field.send_keys("Not applicable")
+            print(f"  ✓ Filled unavailable dates: Not applicable")
+        except Exception as e:
+            print(f"  ✗ Could not fill unavailable dates: {e}")
     
     # Upload files if provided
-    upload_files = form_data.get('upload_files', '')
-    if upload_files:
-        file_paths = [f.strip() for f in upload_files.split(',') if f.strip()]
-        
-        for file_path in file_paths:
-            if os.path.exists(file_path):
-                try:
-                    # Find the file input element - it's usually hidden
-                    file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
-                    file_input.send_keys(os.path.abspath(file_path))
-                    print(f"  ✓ Uploaded file: {os.path.basename(file_path)}")
-                    time.sleep(2)  # Wait for upload to process
-                except Exception as e:
-                    print(f"  ✗ Could not upload {file_path}: {e}")
-            else:
-                print(f"  ✗ File not found: {file_path}")
+    with span('upload_files'):
+        upload_files = form_data.get('upload_files', '')
+        if upload_files:
+            file_paths = [f.strip() for f in upload_files.split(',') if f.strip()]
+            
+            for file_path in file_paths:
+                if os.path.exists(file_path):
+                    try:
+                        # Find the file input element - it's usually hidden
+                        file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
+                        file_input.send_keys(os.path.abspath(file_path))
+                        print(f"  ✓ Uploaded file: {os.path.basename(file_path)}")
+                        time.sleep(2)  # Wait for upload to process
+                    except Exception as e:
+                        print(f"  ✗ Could not upload {file_path}: {e}")
+                else:
+                    print(f"  ✗ File not found: {file_path}")
     
     print("\nForm filling complete!")
     print("\nNOTE: reCAPTCHA must be completed manually")
@@ -252,54 +280,18 @@ def fill_form(driver, form_data, incident_data=None):
 
 def load_incident_templates(file_path='incident_templates.txt'):
     """Load incident description templates from text file"""
-    templates = {}
-    current_key = None
-    current_value = []
-    
-    with open(file_path, 'r') as f:
-        for line in f:
-            # Skip comments and empty lines at the start
-            if not line.strip() or line.strip().startswith('#'):
-                if current_key:  # If we're in a multi-line value, preserve the blank line
-                    current_value.append('')
-                continue
-            
-            # Check if this is a new key=value line
-            if '=' in line and not current_key:
-                key, value = line.split('=', 1)
-                current_key = key.strip()
-                # Remove leading/trailing quotes and whitespace
-                value = value.strip().strip('"\'')
-                current_value = [value]
-            elif current_key:
-                # Continue multi-line value
-                value = line.strip().strip('"\'')
-                if value:  # Only add non-empty lines to avoid trailing spaces
-                    current_value.append(value)
-                else:
-                    current_value.append('')  # Preserve paragraph breaks
-                
-                # Check if this line ends the value (ends with closing quote)
-                if line.rstrip().endswith('"') or line.rstrip().endswith("'"):
-                    # Join all lines with newlines and save
-                    templates[current_key] = '\n'.join(current_value).strip('"\'')
-                    current_key = None
-                    current_value = []
-    
-    # Handle case where file doesn't end with closing quote
-    if current_key:
-        templates[current_key] = '\n'.join(current_value).strip('"\'')
-    
-    return templates
+    return dict(get_template_registry(file_path).templates)
 
 
 def main():
     import sys
     
     # Parse command line arguments
+    trace_from_argv(sys.argv)
     if len(sys.argv) < 5:
         print("Usage: python fill_form.py <street_name> <incident_type> <registration> <colour> <image_path> [additional_images...]")
         print("       python fill_form.py <street_name> auto auto auto <image_path> [additional_images...]")
+        print("       python fill_form.py auto <incident_type> <registration> <colour> <image_path>  # street from photo GPS")
         print("")
         print("Examples:")
         print("  python fill_form.py 'Hunter House Road' 'corner' 'AB12XYZ' 'silver' photo.jpg")
@@ -308,6 +300,8 @@ def main():
         print("")
         print("Available incident types: corner, pavement, or 'auto' to detect from image")
         print("Use 'auto' for incident_type, registration and/or colour to extract from the image using OpenAI Vision (requires API key in form_data.txt)")
+        print("Use 'auto' for the street to look up the photo's GPS position in the offline road index (see road_index.py)")
+        print("Add --trace out.json to record how long each stage takes (open in chrome://tracing)")
         sys.exit(1)
     
     street_name = sys.argv[1]
@@ -336,17 +330,28 @@ def main():
     # If incident_type is 'auto', we need to analyze the image first
     incident_data = None
     if incident_type == 'auto' or registration == 'auto' or colour.lower() == 'auto':
-        dashcam_image = image_paths[0] if image_paths else ''
+        dashcam_images = [p for p in image_paths if os.path.exists(p)]
         openai_key = form_data.get('openai_api_key', '')
         
         if not openai_key:
             print("\nError: Auto-detection requires OpenAI API key in form_data.txt")
             sys.exit(1)
         
-        if dashcam_image and os.path.exists(dashcam_image):
-            print(f"\nAnalyzing image for auto-detection: {dashcam_image}")
-            from extract_from_image import analyze_dashcam_image
-            incident_data = analyze_dashcam_image(dashcam_image, openai_key)
+        if dashcam_images:
+            print(f"\nAnalyzing {len(dashcam_images)} image(s) for auto-detection")
+            from extract_from_image import analyze_incident
+            # Only ask for what was set to 'auto' (plus date/time for the form)
+            fields = ['date', 'time']
+            if incident_type == 'auto':
+                fields.append('incident_type')
+            if registration == 'auto':
+                fields.append('registration')
+            if colour.lower() == 'auto':
+                fields.append('colour')
+            if street_name.lower() == 'auto':
+                fields.append('street')
+            incident_data = analyze_incident(dashcam_images, openai_key, fields)
+            unconfirmed = (incident_data or {}).get('unconfirmed', {})
             
             # Use extracted incident_type if set to auto
             if incident_type == 'auto':
@@ -375,7 +380,11 @@ def main():
                     print(f"✓ Auto-detected registration: {registration}")
                 else:
                     print("\n⚠️  Could not auto-detect registration from image")
-                    registration = input("Enter vehicle registration: ").strip().upper()
+                    guess = unconfirmed.get('registration', {}).get('value')
+                    if guess:
+                        registration = input(f"Enter vehicle registration [unconfirmed guess: {guess}]: ").strip().upper() or guess.upper()
+                    else:
+                        registration = input("Enter vehicle registration: ").strip().upper()
                     if registration:
                         print(f"✓ Registration set to: {registration}")
                     else:
@@ -389,27 +398,53 @@ def main():
                     print(f"✓ Auto-detected colour: {colour}")
                 else:
                     print("\n⚠️  Could not auto-detect colour from image")
-                    colour = input("Enter vehicle colour: ").strip().lower()
+                    guess = unconfirmed.get('colour', {}).get('value')
+                    if guess:
+                        colour = input(f"Enter vehicle colour [unconfirmed guess: {guess}]: ").strip().lower() or guess.lower()
+                    else:
+                        colour = input("Enter vehicle colour: ").strip().lower()
                     if colour:
                         print(f"✓ Colour set to: {colour}")
                     else:
                         print("Error: Colour is required")
                         sys.exit(1)
     
+    # Street from the photos' GPS position and the offline road index (no API key needed)
+    if street_name.lower() == 'auto':
+        dashcam_images = [p for p in image_paths if os.path.exists(p)]
+        if incident_data is None and dashcam_images:
+            print(f"\nAnalyzing {len(dashcam_images)} image(s) for date/time and street")
+            from extract_from_image import analyze_incident
+            incident_data = analyze_incident(
+                dashcam_images,
+                form_data.get('openai_api_key') or None,
+                fields=['date', 'time', 'street']
+            )
+        if incident_data and incident_data.get('street'):
+            street_name = incident_data['street']
+            print(f"✓ Street from photo GPS: {street_name}")
+            if incident_data.get('junction'):
+                print(f"  {incident_data['junction_distance_m']}m from the junction with {incident_data['junction']}")
+        else:
+            print("\n⚠️  Could not find the street from the photo's GPS position")
+            street_name = input("Enter street name: ").strip()
+            if not street_name:
+                print("Error: Street name is required")
+                sys.exit(1)
+    
     # Validate incident type
     print(f"\nLoading incident templates...")
-    templates = load_incident_templates('incident_templates.txt')
+    templates = get_template_registry()
     
     if incident_type not in templates:
         print(f"Error: Unknown incident type '{incident_type}'")
-        print(f"Available types: {', '.join(templates.keys())}")
+        print(f"Available types: {', '.join(templates.types())}")
         sys.exit(1)
     
     # Override with command line parameters
     form_data['incident_location'] = street_name
     form_data['incident_location_exact'] = street_name
     form_data['travelling_location'] = street_name  # Where you were travelling towards
-    form_data['incident_description'] = templates[incident_type]
     form_data['incident_car_registration'] = registration
     form_data['incident_car_colour'] = colour
     
@@ -500,9 +535,6 @@ def main():
     # Update form_data with verified/corrected values
     form_data['incident_car_registration'] = registration
     form_data['incident_car_colour'] = colour
-    # Reload templates in case incident_type was changed
-    templates = load_incident_templates('incident_templates.txt')
-    form_data['incident_description'] = templates[incident_type]
     
     print(f"\n✓ Final values to be filled:")
     print(f"  Incident type: {incident_type}")
@@ -511,17 +543,49 @@ def main():
     
     # If we haven't analyzed the image yet (because nothing was set to 'auto'), do it now
     if incident_data is None and image_paths:
-        dashcam_image = image_paths[0]
+        dashcam_images = [p for p in image_paths if os.path.exists(p)]
         openai_key = form_data.get('openai_api_key', '')
         
-        if dashcam_image and os.path.exists(dashcam_image):
-            print(f"\nAnalyzing dashcam image for date/time: {dashcam_image}")
-            from extract_from_image import analyze_dashcam_image
-            incident_data = analyze_dashcam_image(
-                dashcam_image,
-                openai_key if openai_key else None
+        if dashcam_images:
+            print(f"\nAnalyzing {len(dashcam_images)} dashcam image(s) for date/time")
+            from extract_from_image import analyze_incident
+            incident_data = analyze_incident(
+                dashcam_images,
+                openai_key if openai_key else None,
+                fields=['date', 'time']
             )
     
+    incident_data_values = incident_data or {}
+    
+    # Check for earlier reports of this incident or vehicle
+    ledger = IncidentLedger()
+    ledger_details = dict(
+        street=street_name,
+        incident_date=incident_data_values.get('date'),
+        incident_time=incident_data_values.get('time'),
+        incident_type=incident_type,
+        image_paths=image_paths,
+        source='cli',
+    )
+    ledger_result = ledger.record(registration, **ledger_details)
+    print(f"\n✓ Incident ledger: {describe_ledger_result(ledger_result)}")
+    if ledger_result['duplicate_of']:
+        confirm = input("⚠️  This incident looks like it was already reported. Continue anyway? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("Stopped - nothing was filled in")
+            sys.exit(0)
+        # Reporting it again is a new report, so it is recorded (and can be marked submitted)
+        ledger_result = ledger.record(registration, allow_duplicate=True, **ledger_details)
+    
+    # Render once the final incident type, registration and date/time are known
+    form_data['incident_description'] = templates.render(
+        incident_type,
+        reg=registration,
+        street=street_name,
+        date=incident_data_values.get('date'),
+        time=incident_data_values.get('time'),
+    )
+    
     # Setup browser
     driver = setup_driver(headless=False)  # Use headless=False to keep browser visible
     
@@ -533,6 +597,13 @@ def main():
         traceback.print_exc()
     finally:
         driver.quit()
+    
+    if ledger_result['id']:
+        confirm = input("\nDid you submit the form? (y/n): ").strip().lower()
+        if confirm == 'y':
+            ledger.mark_submitted(ledger_result['id'])
+            print("✓ Marked as submitted in the incident ledger")
+    ledger.close()
 
 
 if __name__ == "__main__":
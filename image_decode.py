@@ -0,0 +1,155 @@
+"""
+Memory-bounded image decoding.
+
+Every stage states the resolution it needs and gets a bitmap of about that
+size: JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale (draft mode), so a
+48MP photo never exists as a full-resolution bitmap unless a stage asks for
+one. The source image is closed as soon as it has been converted, and the
+stage's bitmap is closed when its `with` block ends.
+
+Decoded pixels count against a per-process ceiling
+(NEXTBASE_DECODE_MEMORY_MB, default 256). A JPEG that would not fit on its
+own is decoded at a smaller scale (formats without draft mode, e.g. PNG,
+are decoded whole and charged what they really use), and decodes running at the same time in one process
+(bot threads, hedged requests) wait until enough has been released, so
+memory stays flat however many large photos are in a batch.
+
+    with decoded(image_path, 'L', (1600, 1600)) as image:
+        ...
+"""
+
+import contextlib
+import math
+import os
+import threading
+
+from PIL import Image
+
+DEFAULT_MEMORY_MB = int(os.getenv('NEXTBASE_DECODE_MEMORY_MB', '256'))
+MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'RGB': 3, 'HSV': 3, 'YCbCr': 3, 'RGBA': 4, 'CMYK': 4, 'I': 4, 'F': 4}
+
+
+class DecodeBudget:
+    """Bytes of decoded pixels a process may hold at once."""
+
+    def __init__(self, megabytes=DEFAULT_MEMORY_MB):
+        self.ceiling = megabytes * 1024 * 1024
+        self.used = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        # One decode alone is always let through, even if it is over the ceiling
+        # (e.g. a PNG, which cannot be decoded at a smaller scale)
+        with self._condition:
+            while self.used and self.used + nbytes > self.ceiling:
+                self._condition.wait()
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+        return nbytes
+
+    def release(self, nbytes):
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+
+_budget = DecodeBudget()
+
+
+def set_memory_ceiling(megabytes):
+    """Change this process's ceiling (e.g. from a worker initializer)"""
+    _budget.ceiling = megabytes * 1024 * 1024
+
+
+def memory_stats():
+    return {'ceiling_mb': _budget.ceiling / 1024 / 1024, 'used_mb': _budget.used / 1024 / 1024,
+            'peak_mb': _budget.peak / 1024 / 1024}
+
+
+def _bytes(size, mode):
+    return size[0] * size[1] * MODE_BYTES.get(mode, 4)
+
+
+def _fit_budget(size, mode):
+    """`size`, made smaller (same aspect ratio) until its bitmap fits under the ceiling"""
+    over = _bytes(size, mode) / _budget.ceiling
+    if over <= 1:
+        return size
+    return _fit(size, (math.floor(size[0] / math.sqrt(over)), None))
+
+
+def _draft_size(size, request, source_mode, mode):
+    """Size to pass to Image.draft: `request`, lowered so the JPEG decoder picks a
+    scale (1/2, 1/4, 1/8) whose source bitmap plus its `mode` copy fit the ceiling.
+
+    draft never decodes below the size it is asked for, so asking for a size the
+    ceiling cannot hold would decode the whole frame.
+    """
+    per_pixel = MODE_BYTES.get(source_mode, 4) + MODE_BYTES.get(mode, 4)
+    scale = 1
+    while scale < 8 and (size[0] // scale) * (size[1] // scale) * per_pixel > _budget.ceiling:
+        scale *= 2
+    # Image.draft picks the largest scale with original // requested >= scale
+    largest = (max(1, size[0] // scale), max(1, size[1] // scale))
+    return min(request[0], largest[0]), min(request[1], largest[1])
+
+
+def _fit(size, max_size):
+    """Largest size with the same aspect ratio within max_size (None = unbounded side)"""
+    width, height = size
+    if not max_size:
+        return size
+    scale = 1.0
+    if max_size[0]:
+        scale = min(scale, max_size[0] / width)
+    if max_size[1]:
+        scale = min(scale, max_size[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+@contextlib.contextmanager
+def decoded(image_path, mode='RGB', max_size=None, reduce=True):
+    """Decode an image in `mode`, no larger than needed for max_size.
+
+    With reduce=False the JPEG decoder's scale is used as-is (never below
+    max_size), for callers that resize or crop themselves; the result is still
+    made smaller if it would not fit under the ceiling. JPEGs are decoded at a
+    scale whose bitmap fits the ceiling whatever is asked for; other formats
+    are decoded whole and charged their real size. The original size is in
+    image.info['original_size']. The image is closed on exit.
+    """
+    with Image.open(image_path) as source:
+        original_size = source.size
+        # Shrink further if even the target would not fit under the ceiling
+        requested = _fit(original_size, max_size)
+        target = _fit_budget(requested, mode)
+        over = target != requested
+        # Without reduce, ask the decoder for at least max_size (as Image.draft does)
+        if reduce or not max_size or over:
+            request = target
+        else:
+            request = tuple(limit or side for limit, side in zip(max_size, target))
+        source.draft(mode, _draft_size(original_size, request, source.mode, mode))
+        peak = _budget.acquire(_bytes(source.size, source.mode) + _bytes(source.size, mode))
+        try:
+            image = source.convert(mode)
+        except BaseException:
+            _budget.release(peak)
+            raise
+    # The source bitmap is gone now; keep only what the stage holds. Without
+    # reduce the decoder's size is kept, unless it is over the ceiling (formats
+    # draft mode cannot shrink, e.g. PNG, come back at full size)
+    limit = target if reduce or over else _fit_budget(image.size, mode)
+    if image.width > limit[0] or image.height > limit[1]:
+        smaller = image.resize(limit, Image.BILINEAR)
+        image.close()
+        image = smaller
+    held = min(peak, _bytes(image.size, mode))
+    _budget.release(peak - held)
+    image.info['original_size'] = original_size
+    try:
+        yield image
+    finally:
+        image.close()
+        _budget.release(held)
@@ -0,0 +1,254 @@
+"""
+Local ledger of prepared and submitted incidents.
+
+Every report produced by the CLI or the bot is recorded in a SQLite database,
+indexed by normalized registration, street, date and image hash, so a new
+incident can be checked against everything reported before:
+
+    ledger = IncidentLedger()
+    result = ledger.record('AB12 CDE', 'Hunter House Road', '2026-02-15', ...)
+    result['duplicate_of']   # earlier incident that matches, or None
+    result['report_number']  # 3 -> third report for this vehicle
+
+Lookups only touch indexes, and the per-vehicle count is kept in its own
+table, so checks stay fast with tens of thousands of rows.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from registration_index import RegistrationIndex
+
+DEFAULT_LEDGER_PATH = os.getenv(
+    'NEXTBASE_LEDGER_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'incidents.db'),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    registration TEXT NOT NULL,
+    registration_norm TEXT NOT NULL,
+    street TEXT,
+    street_norm TEXT,
+    incident_date TEXT,
+    incident_time TEXT,
+    incident_type TEXT,
+    status TEXT NOT NULL DEFAULT 'prepared',
+    source TEXT,
+    created_at TEXT NOT NULL,
+    submitted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_registration ON incidents (registration_norm);
+CREATE INDEX IF NOT EXISTS idx_incidents_reg_street_date
+    ON incidents (registration_norm, street_norm, incident_date);
+
+CREATE TABLE IF NOT EXISTS incident_images (
+    incident_id INTEGER NOT NULL REFERENCES incidents (id),
+    image_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_incident_images_hash ON incident_images (image_hash);
+
+CREATE TABLE IF NOT EXISTS vehicles (
+    registration_norm TEXT PRIMARY KEY,
+    report_count INTEGER NOT NULL DEFAULT 0,
+    first_reported TEXT,
+    last_reported TEXT
+);
+"""
+
+
+def normalize_registration(registration):
+    """Upper-case and strip everything except letters and digits"""
+    return re.sub(r'[^A-Z0-9]', '', (registration or '').upper())
+
+
+def normalize_street(street):
+    """Lower-case, collapse whitespace and drop punctuation"""
+    street = re.sub(r'[^a-z0-9 ]', '', (street or '').lower())
+    return ' '.join(street.split())
+
+
+def normalize_date(date_str):
+    """Return YYYY-MM-DD for DD/MM/YYYY or YYYY-MM-DD input (otherwise unchanged)"""
+    if not date_str:
+        return date_str
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(date_str.strip(), fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    return date_str.strip()
+
+
+def hash_image(image_path):
+    """SHA-256 of an image file's contents"""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IncidentLedger:
+    """SQLite-backed record of every incident report."""
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        self._registration_index = None
+
+    def close(self):
+        self._conn.close()
+
+    def find_duplicate(self, registration, street=None, incident_date=None, image_hashes=()):
+        """Return the earlier incident matching this one (same photo, or same
+        vehicle, street and date), or None"""
+        with self._lock:
+            return self._find_duplicate(registration, street, incident_date, image_hashes)
+
+    def _find_duplicate(self, registration, street, incident_date, image_hashes):
+        # Caller holds self._lock
+        reg_norm = normalize_registration(registration)
+        for image_hash in image_hashes:
+            row = self._conn.execute(
+                'SELECT incidents.* FROM incident_images '
+                'JOIN incidents ON incidents.id = incident_images.incident_id '
+                'WHERE incident_images.image_hash = ? LIMIT 1',
+                (image_hash,),
+            ).fetchone()
+            if row:
+                return dict(row)
+
+        if reg_norm and street and incident_date:
+            row = self._conn.execute(
+                'SELECT * FROM incidents WHERE registration_norm = ? AND street_norm = ? '
+                'AND incident_date = ? LIMIT 1',
+                (reg_norm, normalize_street(street), normalize_date(incident_date)),
+            ).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    def similar_registrations(self, registration):
+        """Previously reported registrations that may be OCR misreads of this one"""
+        with self._lock:
+            if self._registration_index is None:
+                rows = self._conn.execute('SELECT registration_norm FROM vehicles').fetchall()
+                self._registration_index = RegistrationIndex(row[0] for row in rows)
+            matches = self._registration_index.lookup(registration)
+        reg_norm = normalize_registration(registration)
+        return [match for _, match in matches if match != reg_norm]
+
+    def report_count(self, registration):
+        """How many incidents have been recorded for this vehicle"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT report_count FROM vehicles WHERE registration_norm = ?',
+                (normalize_registration(registration),),
+            ).fetchone()
+        return row['report_count'] if row else 0
+
+    def record(self, registration, street=None, incident_date=None, incident_time=None,
+               incident_type=None, image_paths=(), source=None, status='prepared',
+               allow_duplicate=False):
+        """Check a new incident against the ledger and record it.
+
+        Returns a dict with:
+          id             - row id of the new incident (None if it was a duplicate)
+          duplicate_of   - the matching earlier incident, or None
+          report_number  - this vehicle's report count including this one
+          similar        - other reported registrations this may be a misread of
+        Duplicates are not recorded again unless `allow_duplicate` (the user
+        chose to report it anyway). The check and the insert run in one
+        transaction, so two processes recording the same incident at once
+        cannot both insert it.
+        """
+        image_hashes = []
+        for image_path in image_paths:
+            try:
+                image_hashes.append(hash_image(image_path))
+            except OSError as e:
+                print(f"  ⚠️  Could not hash {image_path}: {e}")
+
+        similar = self.similar_registrations(registration)
+        reg_norm = normalize_registration(registration)
+        now = datetime.now().isoformat(timespec='seconds')
+        incident_id = None
+
+        with self._lock:
+            # IMMEDIATE takes the write lock now, so the duplicate check holds until commit
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                duplicate = self._find_duplicate(registration, street, incident_date, image_hashes)
+                if not duplicate or allow_duplicate:
+                    cursor = self._conn.execute(
+                        'INSERT INTO incidents (registration, registration_norm, street, street_norm, '
+                        'incident_date, incident_time, incident_type, status, source, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (registration, reg_norm, street, normalize_street(street),
+                         normalize_date(incident_date), incident_time, incident_type,
+                         status, source, now),
+                    )
+                    incident_id = cursor.lastrowid
+                    self._conn.executemany(
+                        'INSERT INTO incident_images (incident_id, image_hash) VALUES (?, ?)',
+                        [(incident_id, image_hash) for image_hash in image_hashes],
+                    )
+                    self._conn.execute(
+                        'INSERT INTO vehicles (registration_norm, report_count, first_reported, last_reported) '
+                        'VALUES (?, 1, ?, ?) ON CONFLICT(registration_norm) DO UPDATE SET '
+                        'report_count = report_count + 1, last_reported = excluded.last_reported',
+                        (reg_norm, now, now),
+                    )
+                row = self._conn.execute(
+                    'SELECT report_count FROM vehicles WHERE registration_norm = ?', (reg_norm,)
+                ).fetchone()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            if incident_id is not None and self._registration_index is not None:
+                self._registration_index.add(reg_norm)
+
+        return {
+            'id': incident_id,
+            'duplicate_of': duplicate,
+            'report_number': row[0] if row else 0,
+            'similar': similar,
+        }
+
+    def mark_submitted(self, incident_id):
+        """Mark an incident as submitted to the police"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE incidents SET status = 'submitted', submitted_at = ? WHERE id = ?",
+                (now, incident_id),
+            )
+
+
+def describe_ledger_result(result):
+    """One-line human summary of IncidentLedger.record()"""
+    duplicate = result['duplicate_of']
+    if duplicate:
+        return (f"Already reported: {duplicate['registration']} on {duplicate['street'] or '?'} "
+                f"({duplicate['incident_date'] or 'unknown date'}, {duplicate['status']})")
+    number = result['report_number']
+    if number <= 1:
+        summary = "First report for this vehicle"
+    else:
+        suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+        summary = f"{number}{suffix} report for this vehicle"
+    if result.get('similar'):
+        summary += f" (similar registrations reported before: {', '.join(result['similar'])})"
+    return summary
@@ -0,0 +1,157 @@
+"""
+Shared incident description template registry.
+
+Templates are read from incident_templates.txt once per process, validated,
+and split into literal text and placeholders up front so rendering is just a
+join. The file is re-read automatically when its modification time changes.
+
+Template file format:
+
+    # comment
+    corner="First paragraph...
+
+    Second paragraph, which may be wrapped
+    over several lines."
+
+Lines inside a paragraph are joined with spaces; blank lines separate
+paragraphs. Templates may use the placeholders {reg}, {street}, {date} and
+{time}. Use {{ and }} for literal braces.
+"""
+
+import os
+import re
+import threading
+import time
+from string import Formatter
+
+DEFAULT_TEMPLATES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'incident_templates.txt'
+)
+
+PLACEHOLDERS = ('reg', 'street', 'date', 'time')
+REQUIRED_TYPES = ('corner', 'pavement')
+
+# How often (seconds) to check the file's mtime for changes
+RELOAD_CHECK_INTERVAL = 1.0
+
+_KEY_LINE = re.compile(r'^([A-Za-z_][\w-]*)=(.*)$')
+
+
+def parse_templates(text):
+    """Parse the template file format into {type: description text}"""
+    raw = {}
+    current_key = None
+
+    for line in text.splitlines():
+        match = _KEY_LINE.match(line)
+        if match:
+            current_key = match.group(1).strip()
+            raw[current_key] = [match.group(2)]
+        elif current_key:
+            raw[current_key].append(line)
+        # Anything before the first key (comments, blank lines) is ignored
+
+    templates = {}
+    for key, lines in raw.items():
+        body = '\n'.join(lines).strip()
+        if len(body) >= 2 and body[0] == body[-1] and body[0] in '"\'':
+            body = body[1:-1]
+
+        paragraphs = re.split(r'\n\s*\n', body)
+        paragraphs = [' '.join(part.strip() for part in p.splitlines() if part.strip())
+                      for p in paragraphs]
+        templates[key] = '\n\n'.join(p for p in paragraphs if p)
+
+    return templates
+
+
+def compile_template(name, text):
+    """Split a template into (literal, placeholder) parts, validating placeholders"""
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(text):
+        if field is not None:
+            if field not in PLACEHOLDERS or spec or conversion:
+                raise ValueError(
+                    f"Template '{name}' uses unsupported placeholder {{{field}}}; "
+                    f"allowed: {', '.join(PLACEHOLDERS)}"
+                )
+        parts.append((literal, field))
+    return tuple(parts)
+
+
+class TemplateRegistry:
+    """Validated, precompiled incident templates backed by a file."""
+
+    def __init__(self, file_path=DEFAULT_TEMPLATES_PATH):
+        self.file_path = file_path
+        self.templates = {}
+        self._compiled = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)load the file; on a validation error the previous templates are kept"""
+        mtime = os.stat(self.file_path).st_mtime
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            templates = parse_templates(f.read())
+
+        missing = [t for t in REQUIRED_TYPES if not templates.get(t)]
+        if missing:
+            raise ValueError(f"{self.file_path} is missing templates: {', '.join(missing)}")
+        compiled = {name: compile_template(name, text) for name, text in templates.items()}
+
+        self.templates = templates
+        self._compiled = compiled
+        self._mtime = mtime
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._last_check = now
+            try:
+                if os.stat(self.file_path).st_mtime != self._mtime:
+                    print(f"Reloading incident templates from {self.file_path}")
+                    self.load()
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️  Keeping previous incident templates: {e}")
+
+    def types(self):
+        """Available incident types"""
+        self._maybe_reload()
+        return list(self._compiled)
+
+    def __contains__(self, incident_type):
+        self._maybe_reload()
+        return incident_type in self._compiled
+
+    def render(self, incident_type, **values):
+        """Render a template; placeholders without a value are left as-is"""
+        self._maybe_reload()
+        parts = self._compiled[incident_type]
+        out = []
+        for literal, field in parts:
+            out.append(literal)
+            if field is not None:
+                value = values.get(field)
+                out.append(str(value) if value else '{' + field + '}')
+        return ''.join(out)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_template_registry(file_path=DEFAULT_TEMPLATES_PATH):
+    """Return the process-wide registry for a template file"""
+    key = os.path.abspath(file_path)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = _registries[key] = TemplateRegistry(key)
+    return registry
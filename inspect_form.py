@@ -1,3 +1,25 @@
+#!/usr/bin/env python3
+"""
+Snapshot the Nextbase form's structure and report when it changes.
+
+The whole schema (forms, and every input, textarea, select and button with
+its id, name, type, label, required flag, value and options) is read in a
+single execute_script call and written as a versioned JSON snapshot. Each
+run is compared with the accepted baseline (baseline.json, the first
+snapshot until another is accepted); any added, removed or changed field is
+listed and the exit code is 1, so a scheduled run catches a form change
+before fill_form.py fails on it. The baseline stays as it is until the
+change is acknowledged with --accept, so every run keeps reporting it.
+
+Usage:
+    python inspect_form.py                            # snapshot + diff against the baseline
+    python inspect_form.py --out-dir form_snapshots --page-source
+    python inspect_form.py --accept                   # make the latest snapshot the baseline
+    python inspect_form.py --diff old.json new.json   # compare two saved snapshots
+
+Exit codes: 0 unchanged (or first snapshot), 1 form changed, 2 could not load the form.
+"""
+
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -5,8 +27,52 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-import time
+from datetime import datetime
+import argparse
+import glob
+import json
 import os
+import sys
+
+FORM_URL = "https://secureform.nextbase.co.uk/?location=SouthYorkshire"
+SCHEMA_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'form_snapshots')
+BASELINE_NAME = 'baseline.json'
+COMPARED_ATTRIBUTES = ('tag', 'type', 'name', 'id', 'label', 'placeholder', 'required', 'value', 'options', 'text')
+
+# Runs in the page; returns the whole schema in one round trip
+COLLECT_SCHEMA_JS = """
+const clean = s => (s || '').replace(/\\s+/g, ' ').trim() || null;
+const forms = Array.from(document.forms).map(f => ({
+    id: f.id || null, name: f.getAttribute('name'), action: f.getAttribute('action'),
+    method: (f.getAttribute('method') || 'get').toLowerCase()
+}));
+const fields = Array.from(document.querySelectorAll('input, textarea, select, button')).map(el => {
+    const tag = el.tagName.toLowerCase();
+    const field = {
+        tag: tag,
+        type: tag === 'input' || tag === 'button' ? (el.getAttribute('type') || el.type || null) : tag,
+        id: el.id || null,
+        name: el.getAttribute('name'),
+        label: el.labels && el.labels.length ? clean(el.labels[0].innerText) : clean(el.getAttribute('aria-label')),
+        placeholder: el.getAttribute('placeholder'),
+        required: el.required === true || el.getAttribute('aria-required') === 'true',
+        form: el.form ? Array.from(document.forms).indexOf(el.form) : null,
+    };
+    if (tag === 'select') {
+        field.options = Array.from(el.options).map(o => ({value: o.value, text: clean(o.text)}));
+    }
+    if ((tag === 'input' && (el.type === 'radio' || el.type === 'checkbox')) || tag === 'button') {
+        field.value = el.getAttribute('value');
+    }
+    if (tag === 'button') {
+        field.text = clean(el.innerText);
+    }
+    return field;
+});
+return {forms: forms, fields: fields};
+"""
+
 
 def setup_driver(headless=False):
     """Setup Chrome driver with options"""
@@ -15,86 +81,221 @@ def setup_driver(headless=False):
         chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    
+
     print("Installing ChromeDriver...")
     driver_path = ChromeDriverManager().install()
     print(f"ChromeDriver installed at: {driver_path}")
-    
+
     # Fix path - webdriver_manager sometimes returns wrong file
     driver_dir = os.path.dirname(driver_path)
     actual_driver = os.path.join(driver_dir, 'chromedriver')
-    
+
     if os.path.exists(actual_driver):
         driver_path = actual_driver
         # Ensure it's executable
         os.chmod(driver_path, 0o755)
-    
+
     print(f"Using ChromeDriver: {driver_path}")
     service = Service(driver_path)
     driver = webdriver.Chrome(service=service, options=chrome_options)
     return driver
 
-def inspect_form(url):
-    """Inspect the form to identify all fields"""
+def field_key(field, index):
+    """Stable identity of a field across snapshots"""
+    if field.get('id'):
+        return f"{field['tag']}#{field['id']}"
+    if field.get('name'):
+        # Radio buttons and checkboxes share a name; tell them apart by value
+        suffix = f"={field['value']}" if field.get('value') is not None and field['tag'] == 'input' else ''
+        return f"{field['tag']}[name={field['name']}{suffix}]"
+    if field.get('text'):
+        return f"{field['tag']}[text={field['text']}]"
+    return f"{field['tag']}[{index}]"
+
+def keyed_fields(schema):
+    keyed = {}
+    for i, field in enumerate(schema['fields']):
+        key = field_key(field, i)
+        # Duplicate keys (e.g. two unnamed "Next" buttons) are numbered in page order
+        n = 2
+        unique = key
+        while unique in keyed:
+            unique = f"{key}#{n}"
+            n += 1
+        keyed[unique] = field
+    return keyed
+
+def diff_schemas(old, new):
+    """(added, removed, changed) between two snapshots; changed is [(key, attribute, old, new)]"""
+    old_fields = keyed_fields(old)
+    new_fields = keyed_fields(new)
+    added = [key for key in new_fields if key not in old_fields]
+    removed = [key for key in old_fields if key not in new_fields]
+    changed = []
+    for key, field in new_fields.items():
+        if key not in old_fields:
+            continue
+        for attribute in COMPARED_ATTRIBUTES:
+            before, after = old_fields[key].get(attribute), field.get(attribute)
+            if before != after:
+                changed.append((key, attribute, before, after))
+    if old.get('forms') != new.get('forms'):
+        changed.append(('forms', 'forms', old.get('forms'), new.get('forms')))
+    return added, removed, changed
+
+def print_schema(schema):
+    fields = schema['fields']
+    print(f"\nFound {len(schema['forms'])} form(s), {len(fields)} field(s)\n")
+    for tag in ('input', 'textarea', 'select', 'button'):
+        matching = [f for f in fields if f['tag'] == tag]
+        print(f"{tag.capitalize()} fields found: {len(matching)}")
+        for i, f in enumerate(matching):
+            details = f"Type: {f['type']}, Name: {f['name']}, ID: {f['id']}"
+            if f.get('label'):
+                details += f", Label: {f['label']}"
+            if f.get('placeholder'):
+                details += f", Placeholder: {f['placeholder']}"
+            if f.get('options') is not None:
+                details += f", Options: {len(f['options'])}"
+            if f.get('text'):
+                details += f", Text: {f['text']}"
+            if f.get('required'):
+                details += " (required)"
+            print(f"  [{i}] {details}")
+        print()
+
+def print_diff(added, removed, changed):
+    for key in added:
+        print(f"  + {key}")
+    for key in removed:
+        print(f"  - {key}")
+    for key, attribute, before, after in changed:
+        if attribute == 'options':
+            old_texts = [o['text'] for o in before or []]
+            new_texts = [o['text'] for o in after or []]
+            gained = [t for t in new_texts if t not in old_texts]
+            lost = [t for t in old_texts if t not in new_texts]
+            print(f"  ~ {key} options: +{gained} -{lost}" if gained or lost else f"  ~ {key} options reordered or values changed")
+            continue
+        if attribute == 'forms':
+            print(f"  ~ forms: {before} -> {after}")
+            continue
+        print(f"  ~ {key} {attribute}: {before!r} -> {after!r}")
+
+def latest_snapshot(out_dir):
+    snapshots = sorted(glob.glob(os.path.join(out_dir, 'form_schema_*.json')))
+    return snapshots[-1] if snapshots else None
+
+def load_snapshot(path):
+    with open(path, encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('schema_version') != SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version {snapshot.get('schema_version')}, expected {SCHEMA_VERSION}")
+    return snapshot
+
+def save_baseline(out_dir, snapshot_path):
+    """Accept a snapshot as the schema later runs are compared with"""
+    baseline_path = os.path.join(out_dir, BASELINE_NAME)
+    snapshot = load_snapshot(snapshot_path)
+    snapshot['accepted_from'] = os.path.basename(snapshot_path)
+    with open(baseline_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(baseline_path + '.tmp', baseline_path)
+    print(f"Baseline set to {os.path.basename(snapshot_path)}")
+
+def inspect_form(url, out_dir=DEFAULT_SNAPSHOT_DIR, save_page_source=False):
+    """Snapshot the form schema and compare it with the accepted baseline.
+
+    Returns (snapshot path, drifted). Raises if the form could not be read.
+    """
     driver = setup_driver(headless=True)
-    
+
     try:
         print(f"Loading {url}...")
         driver.get(url)
-        
-        # Wait for page to load
-        time.sleep(3)
-        
-        # Find all forms
-        forms = driver.find_elements(By.TAG_NAME, "form")
-        print(f"\nFound {len(forms)} form(s)\n")
-        
-        # Find all input fields
-        inputs = driver.find_elements(By.TAG_NAME, "input")
-        print(f"Input fields found: {len(inputs)}")
-        for i, inp in enumerate(inputs):
-            field_type = inp.get_attribute("type")
-            field_name = inp.get_attribute("name")
-            field_id = inp.get_attribute("id")
-            field_placeholder = inp.get_attribute("placeholder")
-            print(f"  [{i}] Type: {field_type}, Name: {field_name}, ID: {field_id}, Placeholder: {field_placeholder}")
-        
-        # Find all textareas
-        textareas = driver.find_elements(By.TAG_NAME, "textarea")
-        print(f"\nTextarea fields found: {len(textareas)}")
-        for i, ta in enumerate(textareas):
-            field_name = ta.get_attribute("name")
-            field_id = ta.get_attribute("id")
-            print(f"  [{i}] Name: {field_name}, ID: {field_id}")
-        
-        # Find all select dropdowns
-        selects = driver.find_elements(By.TAG_NAME, "select")
-        print(f"\nSelect dropdowns found: {len(selects)}")
-        for i, sel in enumerate(selects):
-            field_name = sel.get_attribute("name")
-            field_id = sel.get_attribute("id")
-            print(f"  [{i}] Name: {field_name}, ID: {field_id}")
-        
-        # Find all buttons
-        buttons = driver.find_elements(By.TAG_NAME, "button")
-        print(f"\nButtons found: {len(buttons)}")
-        for i, btn in enumerate(buttons):
-            btn_type = btn.get_attribute("type")
-            btn_text = btn.text
-            print(f"  [{i}] Type: {btn_type}, Text: {btn_text}")
-        
-        # Save page source for inspection
-        with open("/home/james/dev/nextbase-auto/page_source.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
-        print("\nPage source saved to page_source.html")
-        
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "form")))
+
+        schema = driver.execute_script(COLLECT_SCHEMA_JS)
+        page_source = driver.page_source if save_page_source else None
+    finally:
+        driver.quit()
+
+    print_schema(schema)
+
+    os.makedirs(out_dir, exist_ok=True)
+    baseline_path = os.path.join(out_dir, BASELINE_NAME)
+    if not os.path.exists(baseline_path) and latest_snapshot(out_dir):
+        # Snapshots from before baselines existed: the newest one was the accepted state
+        save_baseline(out_dir, latest_snapshot(out_dir))
+    captured_at = datetime.now()
+    snapshot = {
+        'schema_version': SCHEMA_VERSION,
+        'url': url,
+        'captured_at': captured_at.isoformat(timespec='seconds'),
+        'forms': schema['forms'],
+        'fields': schema['fields'],
+    }
+    snapshot_path = os.path.join(out_dir, f"form_schema_{captured_at:%Y%m%d_%H%M%S}.json")
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2)
+    print(f"Schema saved to {snapshot_path}")
+
+    if page_source is not None:
+        page_source_path = os.path.join(out_dir, 'page_source.html')
+        with open(page_source_path, "w", encoding="utf-8") as f:
+            f.write(page_source)
+        print(f"Page source saved to {page_source_path}")
+
+    if not os.path.exists(baseline_path):
+        print("\nFirst snapshot - nothing to compare with")
+        save_baseline(out_dir, snapshot_path)
+        return snapshot_path, False
+    baseline = load_snapshot(baseline_path)
+    accepted_from = baseline.get('accepted_from', BASELINE_NAME)
+    added, removed, changed = diff_schemas(baseline, snapshot)
+    if not (added or removed or changed):
+        print(f"\n✓ Form unchanged since {accepted_from}")
+        return snapshot_path, False
+    print(f"\n⚠️  Form changed since {accepted_from}:")
+    print_diff(added, removed, changed)
+    print("Once fill_form.py handles the change, run with --accept to make this snapshot the baseline")
+    return snapshot_path, True
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot the Nextbase form schema and report changes")
+    parser.add_argument("--url", default=FORM_URL, help="Form URL")
+    parser.add_argument("--out-dir", default=DEFAULT_SNAPSHOT_DIR,
+                        help="Where snapshots are kept (default: form_snapshots/)")
+    parser.add_argument("--page-source", action="store_true", help="Also save page_source.html for debugging")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved snapshots and exit")
+    parser.add_argument("--accept", action="store_true",
+                        help="Acknowledge a form change: make the latest snapshot the baseline and exit")
+    args = parser.parse_args()
+
+    if args.diff:
+        added, removed, changed = diff_schemas(load_snapshot(args.diff[0]), load_snapshot(args.diff[1]))
+        if not (added or removed or changed):
+            print("✓ No differences")
+            sys.exit(0)
+        print_diff(added, removed, changed)
+        sys.exit(1)
+
+    if args.accept:
+        latest = latest_snapshot(args.out_dir)
+        if latest is None:
+            print(f"No snapshots in {args.out_dir} to accept")
+            sys.exit(2)
+        save_baseline(args.out_dir, latest)
+        sys.exit(0)
+
+    try:
+        _, drifted = inspect_form(args.url, args.out_dir, args.page_source)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        driver.quit()
+        sys.exit(2)
+    sys.exit(1 if drifted else 0)
 
 if __name__ == "__main__":
-    url = "https://secureform.nextbase.co.uk/?location=SouthYorkshire"
-    inspect_form(url)
+    main()
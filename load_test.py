@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the Telegram bot.
+
+Runs N virtual users through the whole conversation (/start, photo, all
+questions, summary) against the real Application, with the Telegram HTTP API
+replaced by an in-process fake. Nothing touches the network.
+
+Usage:
+    python load_test.py --users 1,10,100
+    python load_test.py --users 50 --api-latency 0.05 --download-latency 0.2 --json results.json
+    python load_test.py --users 1,100 --no-pacing --p95-tolerance 0.25
+
+Overall p95 latency at each user count is compared with the smallest count;
+the exit code is 1 if it grew by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+from telegram import Update
+from telegram.request import BaseRequest
+
+import telegram_bot
+from message_scheduler import MessageScheduler
+
+FAKE_TOKEN = "123456:LOADTEST"
+FIRST_USER_ID = 900000
+# p95 differences below this are noise on a local run
+P95_NOISE_SECONDS = 0.010
+
+# (handler that receives the message, message to send, replies the bot sends back)
+CONVERSATION = [
+    ("start", "/start", 1),
+    ("photo_received", None, 2),
+    ("incident_type_received", "Corner parking", 1),
+    ("registration_received", "AB12 CDE", 1),
+    ("color_received", "Silver", 1),
+    ("incident_date_received", "15/02/2026", 1),
+    ("incident_time_received", "14:30", 1),
+    ("location_received", "Hunter House Road", 1),
+    ("first_name_received", "Load", 1),
+    ("last_name_received", "Test", 1),
+    ("email_received", "load.test@example.com", 1),
+    ("phone_received", "07123456789", 1),
+    ("address1_received", "1 Test Street", 1),
+    ("address2_received", "skip", 1),
+    ("county_received", "South Yorkshire", 1),
+    ("postcode_received", "S1 1AA", 1),
+    ("occupation_received", "Tester", 1),
+    ("dob_received", "01/01/1980", 1),
+    ("pob_received", "Sheffield", 1),
+    ("gender_received", "Other", 5),
+]
+
+
+def make_test_photo(width=1280, height=720):
+    """JPEG bytes served for every photo download"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 120, 130)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class FakeTelegramAPI(BaseRequest):
+    """Answers Bot API calls in-process and hands the bot's replies to virtual users."""
+
+    def __init__(self, api_latency=0.0, download_latency=0.0):
+        self.api_latency = api_latency
+        self.download_latency = download_latency
+        self.photo_bytes = make_test_photo()
+        self.inboxes = {}
+        self.calls = {}
+        self._message_id = 0
+
+    def inbox(self, chat_id):
+        queue = self.inboxes.get(chat_id)
+        if queue is None:
+            queue = self.inboxes[chat_id] = asyncio.Queue()
+        return queue
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        if "/file/bot" in url:
+            self.calls["download"] = self.calls.get("download", 0) + 1
+            if self.download_latency:
+                await asyncio.sleep(self.download_latency)
+            return 200, self.photo_bytes
+
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Load", "username": "load_test_bot"}
+        elif endpoint == "sendMessage":
+            chat_id = int(params["chat_id"])
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+            self.inbox(chat_id).put_nowait(result["text"])
+        elif endpoint == "getFile":
+            result = {
+                "file_id": params["file_id"],
+                "file_unique_id": params["file_id"],
+                "file_size": len(self.photo_bytes),
+                "file_path": f"photos/{params['file_id']}.jpg",
+            }
+        else:
+            result = True
+
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+
+class VirtualUser:
+    """Builds the synthetic updates one user sends."""
+
+    _update_id = 0
+
+    def __init__(self, index):
+        self.user_id = FIRST_USER_ID + index
+        self.message_id = 0
+
+    def update(self, bot, text=None):
+        VirtualUser._update_id += 1
+        self.message_id += 1
+        message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": self.user_id, "type": "private"},
+            "from": {"id": self.user_id, "is_bot": False, "first_name": f"User{self.user_id}"},
+        }
+        if text is None:
+            file_id = f"photo-{self.user_id}-{self.message_id}"
+            message["photo"] = [
+                {"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 720}
+            ]
+        else:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return Update.de_json({"update_id": VirtualUser._update_id, "message": message}, bot)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run_user(application, api, user, latencies, hold=None):
+    """Play one full conversation, recording how long each step takes to be answered"""
+    inbox = api.inbox(user.user_id)
+    for step, (handler, text, replies) in enumerate(CONVERSATION):
+        if hold and step == hold["step"]:
+            hold["arrived"] += 1
+            if hold["arrived"] == hold["users"]:
+                hold["all_arrived"].set()
+            await hold["release"].wait()
+
+        started = time.perf_counter()
+        await application.update_queue.put(user.update(application.bot, text))
+        for _ in range(replies):
+            await inbox.get()
+        latencies.setdefault(handler, []).append(time.perf_counter() - started)
+
+
+async def run_load(users, api_latency=0.0, download_latency=0.0, pacing=True, measure_memory=False):
+    """Run `users` concurrent conversations and return the measurements"""
+    api = FakeTelegramAPI(api_latency, download_latency)
+    # In-memory ledger keeps synthetic reports out of the real one
+    application = telegram_bot.build_application(FAKE_TOKEN, request=api, ledger_path=":memory:")
+    if not pacing:
+        application.bot_data["message_scheduler"] = MessageScheduler(
+            application.bot, chat_rate=1e6, chat_burst=1000, global_rate=1e6, global_burst=1000
+        )
+
+    virtual_users = [VirtualUser(i) for i in range(users)]
+    latencies = {}
+    hold = None
+    memory_per_conversation = None
+
+    await application.initialize()
+    await application.start()
+    try:
+        if measure_memory:
+            # Park every user just before the summary, when user_data is fullest
+            hold = {"step": len(CONVERSATION) - 1, "users": users, "arrived": 0,
+                    "all_arrived": asyncio.Event(), "release": asyncio.Event()}
+            gc.collect()
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(run_user(application, api, u, latencies, hold))
+                 for u in virtual_users]
+
+        if hold:
+            await hold["all_arrived"].wait()
+            gc.collect()
+            memory_per_conversation = (tracemalloc.get_traced_memory()[0] - baseline) / users
+            tracemalloc.stop()
+            hold["release"].set()
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    finally:
+        await application.stop()
+        await application.shutdown()
+        for u in virtual_users:
+            try:
+                os.remove(f"/tmp/nextbase_bot_{u.user_id}.jpg")
+            except OSError:
+                pass
+
+    updates = users * len(CONVERSATION)
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "users": users,
+        "elapsed_seconds": elapsed,
+        "updates_per_second": updates / elapsed,
+        "conversations_per_second": users / elapsed,
+        "latency": {
+            "all": summarize(all_latencies),
+            **{handler: summarize(values) for handler, values in latencies.items()},
+        },
+        "memory_per_conversation_bytes": memory_per_conversation,
+        "scheduler": application.bot_data["message_scheduler"].stats(),
+        "api_calls": api.calls,
+    }
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def print_report(result):
+    ms = lambda seconds: f"{seconds * 1000:8.1f}"
+    print(f"\n=== {result['users']} virtual user(s) ===")
+    print(f"  Elapsed:        {result['elapsed_seconds']:.2f}s")
+    print(f"  Throughput:     {result['updates_per_second']:.1f} updates/s, "
+          f"{result['conversations_per_second']:.2f} conversations/s")
+    if result["memory_per_conversation_bytes"] is not None:
+        print(f"  Memory/active conversation: {result['memory_per_conversation_bytes'] / 1024:.1f} KiB")
+    print(f"  Flood-control retries: {result['scheduler']['retries']}")
+    print(f"\n  {'handler':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for handler, stats in result["latency"].items():
+        print(f"  {handler:<26}{ms(stats['p50'])} {ms(stats['p95'])} {ms(stats['p99'])} {ms(stats['max'])}")
+
+
+def p95_regressions(results, tolerance, noise=P95_NOISE_SECONDS):
+    """(users, p95, allowed) for every run whose p95 grew past the smallest user count's"""
+    ordered = sorted(results, key=lambda r: r["users"])
+    base = ordered[0]["latency"]["all"]["p95"] if ordered else 0.0
+    allowed = base * (1 + tolerance) + noise
+    return [(r["users"], r["latency"]["all"]["p95"], allowed)
+            for r in ordered[1:] if r["latency"]["all"]["p95"] > allowed]
+
+
+def print_p95_summary(results):
+    print("\n=== p95 latency by number of users ===")
+    base = min(results, key=lambda r: r["users"])["latency"]["all"]["p95"]
+    for r in sorted(results, key=lambda r: r["users"]):
+        p95 = r["latency"]["all"]["p95"]
+        growth = f"{p95 / base:6.1f}x" if base else "     -"
+        print(f"  {r['users']:>6} user(s) {p95 * 1000:9.1f} ms  {growth}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Telegram bot")
+    parser.add_argument("--users", default="1,10,100",
+                        help="Comma-separated numbers of simultaneous users (default: 1,10,100)")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="Simulated Bot API round trip in seconds")
+    parser.add_argument("--download-latency", type=float, default=0.0,
+                        help="Simulated photo download time in seconds")
+    parser.add_argument("--no-pacing", action="store_true",
+                        help="Disable outgoing message rate limits (measure handlers only)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the memory-per-conversation measurement")
+    parser.add_argument("--p95-tolerance", type=float, default=0.5,
+                        help="Allowed p95 growth over the smallest user count, as a fraction (default: 0.5)")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    for users in [int(n) for n in args.users.split(",") if n.strip()]:
+        result = asyncio.run(run_load(users, args.api_latency, args.download_latency,
+                                      pacing=not args.no_pacing))
+        if not args.no_memory:
+            # Separate pass: tracemalloc slows everything down and would skew latency
+            memory = asyncio.run(run_load(users, pacing=False, measure_memory=True))
+            result["memory_per_conversation_bytes"] = memory["memory_per_conversation_bytes"]
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if not results:
+        return
+    print_p95_summary(results)
+    regressions = p95_regressions(results, args.p95_tolerance)
+    for users, p95, allowed in regressions:
+        print(f"✗ p95 at {users} users is {p95 * 1000:.1f} ms, over the {allowed * 1000:.1f} ms allowed")
+    if regressions:
+        sys.exit(1)
+    print(f"✓ p95 within {args.p95_tolerance:.0%} of the {min(r['users'] for r in results)}-user run")
+
+
+if __name__ == "__main__":
+    main()
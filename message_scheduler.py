@@ -0,0 +1,212 @@
+"""
+Outbound message scheduler for the Telegram bot.
+
+Paces messages with a token bucket per chat and one global bucket, so bursts
+such as the multi-message summary go out as fast as Telegram allows without
+triggering flood control. When Telegram does answer with "retry after", the
+chat is paused for the requested time and the message is sent again; if a
+second chat is told to wait while the first still is, the limit is taken to
+be the global one and every chat is paused.
+
+Buckets of chats that have gone quiet are dropped by a periodic sweep, so a
+long-running bot keeps state only for recently active chats.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly one message per second per chat (with short bursts)
+# and about 30 messages per second across all chats.
+CHAT_RATE = float(os.getenv("BOT_CHAT_MESSAGES_PER_SECOND", "1"))
+CHAT_BURST = int(os.getenv("BOT_CHAT_MESSAGE_BURST", "3"))
+GLOBAL_RATE = float(os.getenv("BOT_GLOBAL_MESSAGES_PER_SECOND", "30"))
+GLOBAL_BURST = int(os.getenv("BOT_GLOBAL_MESSAGE_BURST", "30"))
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_RETRIES = 3
+
+# How often idle chats' buckets and locks are dropped
+SWEEP_INTERVAL = 60.0
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def block(self, seconds):
+        """Hold back every token until `seconds` from now (flood control)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        # Tokens only start coming back once the block ends
+        self.updated = self.blocked_until
+
+    def blocked(self, now):
+        return now < self.blocked_until
+
+    def idle(self, now):
+        """Unused and refilled to capacity, so a new bucket would behave the same."""
+        return (not self._lock.locked() and now >= self.blocked_until
+                and self.tokens + (now - self.updated) * self.rate >= self.capacity)
+
+    async def acquire(self):
+        """Wait until a token is available and take it. Waiters are served FIFO."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def coalesce_messages(texts, separator="\n\n", limit=MAX_MESSAGE_LENGTH):
+    """Join adjacent messages as long as each result fits in one Telegram message"""
+    chunks = []
+    for text in texts:
+        if chunks and len(chunks[-1]) + len(separator) + len(text) <= limit:
+            chunks[-1] = chunks[-1] + separator + text
+        else:
+            chunks.append(text)
+    return chunks
+
+
+def retry_after_seconds(error):
+    """Seconds to wait from a RetryAfter error (int or timedelta, depending on version)"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, "total_seconds"):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class MessageScheduler:
+    """Send messages through per-chat and global token buckets."""
+
+    def __init__(self, bot, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._chat_buckets = {}
+        self._chat_locks = {}
+        self._last_sweep = time.monotonic()
+
+        # Metrics
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _sweep(self, now):
+        """Drop buckets and locks of chats with nothing in flight and a full bucket"""
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            lock = self._chat_locks.get(chat_id)
+            if bucket.idle(now) and not (lock and lock.locked()):
+                del self._chat_buckets[chat_id]
+                self._chat_locks.pop(chat_id, None)
+        for chat_id, lock in list(self._chat_locks.items()):
+            if chat_id not in self._chat_buckets and not lock.locked():
+                del self._chat_locks[chat_id]
+        self._last_sweep = now
+
+    def _chat_bucket(self, chat_id):
+        now = time.monotonic()
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._sweep(now)
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _record_wait(self, waited):
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+        self._recent_waits.append(waited)
+
+    async def send(self, chat_id, texts, coalesce=False, reply_markup=None, **kwargs):
+        """Send `texts` to a chat in order; `reply_markup` goes on the first message.
+
+        Returns the list of sent Message objects.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if coalesce:
+            texts = coalesce_messages(texts)
+
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        sent_messages = []
+        async with lock:
+            for index, text in enumerate(texts):
+                markup = reply_markup if index == 0 else None
+                sent_messages.append(await self._send_one(chat_id, text, markup, kwargs))
+        return sent_messages
+
+    async def _send_one(self, chat_id, text, reply_markup, kwargs):
+        bucket = self._chat_bucket(chat_id)
+        queued_at = time.monotonic()
+
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            if attempt == 0:
+                self._record_wait(time.monotonic() - queued_at)
+
+            try:
+                message = await self.bot.send_message(
+                    chat_id=chat_id, text=text, reply_markup=reply_markup, **kwargs
+                )
+                self.sent += 1
+                return message
+            except RetryAfter as e:
+                wait = retry_after_seconds(e)
+                self.retries += 1
+                now = time.monotonic()
+                # Another chat is still waiting out its own flood control: the global limit was hit
+                if any(other.blocked(now) for other_id, other in self._chat_buckets.items()
+                       if other_id != chat_id):
+                    logger.warning(f"Global flood control, pausing all chats for {wait}s")
+                    self.global_bucket.block(wait)
+                else:
+                    logger.warning(f"Flood control for chat {chat_id}, retrying in {wait}s")
+                bucket.block(wait)
+                if attempt == MAX_RETRIES:
+                    self.failed += 1
+                    raise
+
+    def stats(self):
+        """Snapshot of queue wait and delivery metrics"""
+        waits = sorted(self._recent_waits)
+        p95 = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+            "queue_wait_seconds_total": self.queue_wait_total,
+            "queue_wait_seconds_max": self.queue_wait_max,
+            "queue_wait_seconds_p95": p95,
+            "active_chats": len(self._chat_buckets),
+        }
@@ -0,0 +1,140 @@
+"""
+Perceptual hashing for grouping near-identical photos.
+
+Burst shots of the same parked car differ by a few pixels, so running each
+through image analysis wastes a Vision call per photo. A 64-bit perceptual
+hash (dHash or pHash, computed on a small greyscale copy) is close in
+Hamming distance for near-duplicates, and a BK-tree finds every hash within
+a distance without comparing against all of them.
+
+Usage:
+    python photo_hash.py photo1.jpg photo2.jpg ...   # print near-duplicate groups
+"""
+
+import numpy as np
+from PIL import Image
+
+from image_decode import decoded
+
+# Hashes at most this many bits apart (out of 64) are treated as the same scene
+DEFAULT_THRESHOLD = 10
+
+
+def _load_grey(image_path, size):
+    """Decode straight to a small greyscale array (JPEG draft mode skips most of the work)"""
+    with decoded(image_path, 'L', (size[0] * 4, size[1] * 4), reduce=False) as image:
+        grey = image.resize(size, Image.LANCZOS)
+        return np.asarray(grey, dtype=np.float32)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def dhash(image_path, hash_size=8):
+    """Difference hash: is each pixel brighter than its right-hand neighbour"""
+    pixels = _load_grey(image_path, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image_path, hash_size=8):
+    """DCT hash: low-frequency coefficients above or below their median"""
+    pixels = _load_grey(image_path, (32, 32))
+    dct = _DCT_32 @ pixels @ _DCT_32.T
+    low = dct[:hash_size, :hash_size].ravel()[1:]  # drop the DC term
+    bits = np.concatenate([[False], low > np.median(low)])
+    return _bits_to_int(bits)
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for near-neighbour lookups."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, hash_value, item):
+        node = [hash_value, item, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(hash_value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, hash_value, max_distance):
+        """All (distance, item) pairs within max_distance of hash_value"""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node_hash, item, children = stack.pop()
+            distance = hamming(hash_value, node_hash)
+            if distance <= max_distance:
+                results.append((distance, item))
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+        return results
+
+
+def group_near_duplicates(image_paths, threshold=DEFAULT_THRESHOLD, hash_function=phash):
+    """Split photos into groups of near-duplicates, keeping the input order.
+
+    Each photo joins the group of the closest earlier photo within `threshold`
+    bits; photos that cannot be hashed get a group of their own.
+    """
+    tree = BKTree()
+    groups = []
+
+    for image_path in image_paths:
+        try:
+            hash_value = hash_function(image_path)
+        except Exception as e:
+            print(f"  Could not hash {image_path}: {e}")
+            groups.append([image_path])
+            continue
+
+        matches = tree.search(hash_value, threshold)
+        if matches:
+            group_index = min(matches)[1]
+            groups[group_index].append(image_path)
+        else:
+            groups.append([image_path])
+            tree.add(hash_value, len(groups) - 1)
+
+    return groups
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python photo_hash.py <image_path> [more_images...]")
+        sys.exit(1)
+
+    for index, group in enumerate(group_near_duplicates(sys.argv[1:]), 1):
+        print(f"Group {index}: {len(group)} photo(s)")
+        for image_path in group:
+            print(f"  {image_path}")
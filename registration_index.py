@@ -0,0 +1,176 @@
+"""
+OCR-tolerant registration matching.
+
+OCR regularly swaps 0/O, 1/I, 5/S and 8/B, so the same vehicle turns up
+under several strings. Registrations are indexed by a canonical form in
+which each confusable pair collapses to one character. To find plates that
+differ by a misread, extra or dropped character, every canonical form is
+also indexed under each variant with up to `max_distance` characters
+deleted (symmetric-delete): two strings within that edit distance always
+share a variant, so a lookup is a handful of dict probes plus a Levenshtein
+check on the few candidates, regardless of how many plates are indexed.
+Candidates are checked against the UK plate formats, which also tells us
+which confusable is meant at each position.
+"""
+
+import re
+from itertools import combinations
+
+# Each confusable letter maps to the digit it is mistaken for
+CONFUSABLE_TO_DIGIT = {'O': '0', 'I': '1', 'S': '5', 'B': '8'}
+CONFUSABLE_TO_LETTER = {digit: letter for letter, digit in CONFUSABLE_TO_DIGIT.items()}
+_CANONICAL = str.maketrans(CONFUSABLE_TO_DIGIT)
+
+# UK formats as (name, pattern of L=letter / N=digit groups)
+UK_PLATE_FORMATS = (
+    ('current', 'LLNNLLL'),    # AB12 CDE (2001 onwards)
+    ('prefix', 'LNLLL'),       # A1 BCD ... A999 BCD (1983-2001)
+    ('prefix', 'LNNLLL'),
+    ('prefix', 'LNNNLLL'),
+    ('suffix', 'LLLNL'),       # ABC 1D ... ABC 123D (1963-1983)
+    ('suffix', 'LLLNNL'),
+    ('suffix', 'LLLNNNL'),
+)
+
+# Letters never issued in these formats, so a misread digit is not "fixed" into them
+FORMAT_UNUSED_LETTERS = {'current': frozenset('IQZ')}
+
+
+def normalize(registration):
+    """Upper-case and strip everything except letters and digits"""
+    return re.sub(r'[^A-Z0-9]', '', (registration or '').upper())
+
+
+def canonicalize(registration):
+    """Collapse OCR-confusable characters so misreads of one plate compare equal"""
+    return normalize(registration).translate(_CANONICAL)
+
+
+def _fit_layout(text, layout, fix, unused_letters=frozenset()):
+    """Return text fitted to a L/N layout (fixing confusables if `fix`), or None"""
+    fitted = []
+    for char, kind in zip(text, layout):
+        if kind == 'N':
+            if fix:
+                char = CONFUSABLE_TO_DIGIT.get(char, char)
+            if not char.isdigit():
+                return None
+        else:
+            if fix and char.isdigit():
+                char = CONFUSABLE_TO_LETTER.get(char, char)
+                if char in unused_letters:
+                    return None
+            if not char.isalpha():
+                return None
+        fitted.append(char)
+    return ''.join(fitted)
+
+
+def correct_registration(registration, formats=None):
+    """Fit a (possibly misread) registration to a UK format.
+
+    A registration that already matches a format is returned unchanged;
+    otherwise confusable characters are fixed to what each position needs.
+    Only text with at least one real digit is corrected, so words such as
+    "VISIBLE" or "CROSSED" are never turned into plates.
+    Returns (corrected, format_name), or (None, None) if no format fits.
+    `formats` limits which format names are tried.
+    """
+    text = normalize(registration)
+    layouts = [(name, layout) for name, layout in UK_PLATE_FORMATS
+               if len(layout) == len(text) and (formats is None or name in formats)]
+    has_digit = any(c.isdigit() for c in text)
+    for fix in (False, True) if has_digit else (False,):
+        for name, layout in layouts:
+            fitted = _fit_layout(text, layout, fix, FORMAT_UNUSED_LETTERS.get(name, frozenset()))
+            if fitted:
+                return fitted, name
+    return None, None
+
+
+def is_valid_plate(registration):
+    """True if the registration matches a UK format exactly (no corrections)"""
+    corrected, _ = correct_registration(registration)
+    return corrected is not None and corrected == normalize(registration)
+
+
+def levenshtein(a, b, max_distance=None):
+    """Edit distance between two short strings (stops early past max_distance)"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def deletion_variants(key, max_deletes):
+    """`key` with every combination of up to `max_deletes` characters removed"""
+    variants = {key}
+    for count in range(1, min(max_deletes, len(key)) + 1):
+        for positions in combinations(range(len(key)), count):
+            variants.add(''.join(c for i, c in enumerate(key) if i not in positions))
+    return variants
+
+
+class RegistrationIndex:
+    """Registrations indexed by canonical form, searchable by edit distance."""
+
+    def __init__(self, registrations=(), max_distance=1):
+        self.max_distance = max_distance
+        self._by_canonical = {}
+        self._by_variant = {}
+        for registration in registrations:
+            self.add(registration)
+
+    def __len__(self):
+        return len(self._by_canonical)
+
+    def add(self, registration):
+        registration = normalize(registration)
+        if not registration:
+            return
+        key = canonicalize(registration)
+        known = self._by_canonical.get(key)
+        if known is not None:
+            known.add(registration)
+            return
+        self._by_canonical[key] = {registration}
+        for variant in deletion_variants(key, self.max_distance):
+            self._by_variant.setdefault(variant, []).append(key)
+
+    def lookup(self, registration, max_distance=None):
+        """Known registrations within `max_distance` edits after canonicalizing.
+
+        `max_distance` defaults to (and cannot exceed) the index's own.
+        Returns [(distance, registration)] sorted closest first; distance 0
+        means the plates only differ by OCR-confusable characters.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        key = canonicalize(registration)
+        if not key:
+            return []
+        if max_distance == 0:
+            return [(0, r) for r in sorted(self._by_canonical.get(key, ()))]
+
+        candidates = set()
+        for variant in deletion_variants(key, max_distance):
+            candidates.update(self._by_variant.get(variant, ()))
+
+        matches = []
+        for candidate in candidates:
+            distance = levenshtein(key, candidate, max_distance)
+            if distance <= max_distance:
+                matches.extend((distance, r) for r in self._by_canonical[candidate])
+        return sorted(matches)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Offline street lookup from GPS coordinates.
+
+An index is built once from an OpenStreetMap extract of the area (.osm XML,
+optionally .gz/.bz2 compressed, e.g. from https://extract.bbbike.org or
+Overpass). Named roads are cut into short segments in local metres and
+bucketed on a square grid; junctions (nodes shared by differently named
+roads) get a grid of their own. Everything is written as flat arrays to one
+binary file that is memory-mapped when loaded, so opening it is instant and
+a lookup only touches the few grid cells around the point: tens of
+microseconds, no network.
+
+Usage:
+    python road_index.py build sheffield.osm.bz2             # writes roads.idx
+    python road_index.py lookup 53.3655 -1.5006
+
+The index path defaults to roads.idx next to this file (NEXTBASE_ROAD_INDEX).
+"""
+
+import argparse
+import bz2
+import gzip
+import math
+import mmap
+import os
+import struct
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.getenv('NEXTBASE_ROAD_INDEX', os.path.join(BASE_DIR, 'roads.idx'))
+
+MAGIC = b'NBROADS1'
+# magic, segments, segment cell entries, junctions, grid width, grid height,
+# cell size (m), origin lat, origin lon, grid min x, grid min y, names length
+HEADER = struct.Struct('<8sIIIIIfddffI')
+
+DEFAULT_CELL_METRES = 100.0
+MAX_MATCH_METRES = 50.0
+JUNCTION_SEARCH_METRES = 200.0
+EARTH_RADIUS = 6371008.8
+
+# Ways that are not roads a car could be parked on
+SKIP_HIGHWAYS = {'footway', 'path', 'cycleway', 'bridleway', 'steps', 'pedestrian', 'corridor',
+                 'proposed', 'construction', 'platform', 'elevator', 'bus_stop', 'raceway'}
+
+
+def _open(path):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_osm(path):
+    """Stream an OSM XML file; returns ({node id: (lat, lon)}, [(name, [node ids])])"""
+    nodes = {}
+    ways = []
+    with _open(path) as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag == 'node':
+                nodes[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elif elem.tag == 'way':
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                name = tags.get('name') or tags.get('ref')
+                if name and tags.get('highway') and tags['highway'] not in SKIP_HIGHWAYS:
+                    ways.append((name, [int(nd.get('ref')) for nd in elem.iter('nd')]))
+            elif elem.tag != 'relation':
+                continue
+            elem.clear()
+    return nodes, ways
+
+
+class Projection:
+    """Equirectangular metres around an origin; accurate to well under a metre across a city"""
+
+    def __init__(self, lat0, lon0):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.ky = math.pi / 180 * EARTH_RADIUS
+        self.kx = self.ky * math.cos(math.radians(lat0))
+
+    def __call__(self, lat, lon):
+        return (lon - self.lon0) * self.kx, (lat - self.lat0) * self.ky
+
+
+def _grid(points_x, points_y, min_x, min_y, cell, width, height):
+    return (np.clip(((points_x - min_x) // cell).astype(np.int64), 0, width - 1),
+            np.clip(((points_y - min_y) // cell).astype(np.int64), 0, height - 1))
+
+
+def _buckets(cells, items, n_cells):
+    """CSR layout: items of cell c are items[offsets[c]:offsets[c + 1]]"""
+    order = np.argsort(cells, kind='stable')
+    offsets = np.zeros(n_cells + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum(np.bincount(cells, minlength=n_cells))
+    return offsets, items[order].astype(np.uint32)
+
+
+def build_index(osm_path, out_path=DEFAULT_INDEX_PATH, cell=DEFAULT_CELL_METRES):
+    """Build the binary index from an OSM extract; returns summary counts"""
+    nodes, ways = read_osm(osm_path)
+    used = [nodes[n] for _, refs in ways for n in refs if n in nodes]
+    if not used:
+        raise ValueError(f"No named roads found in {osm_path}")
+    lats, lons = zip(*used)
+    project = Projection((min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2)
+
+    names = sorted({name for name, _ in ways})
+    name_ids = {name: i for i, name in enumerate(names)}
+
+    segments = []
+    segment_names = []
+    node_names = {}
+    for name, refs in ways:
+        name_id = name_ids[name]
+        points = []
+        for ref in refs:
+            if ref in nodes:
+                points.append(project(*nodes[ref]))
+                node_names.setdefault(ref, set()).add(name_id)
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            # Pieces no longer than a cell, so each one touches at most 2x2 cells
+            pieces = max(1, math.ceil(math.hypot(bx - ax, by - ay) / cell))
+            for i in range(pieces):
+                t0, t1 = i / pieces, (i + 1) / pieces
+                segments.append((ax + (bx - ax) * t0, ay + (by - ay) * t0,
+                                 ax + (bx - ax) * t1, ay + (by - ay) * t1))
+                segment_names.append(name_id)
+
+    junctions = []
+    junction_names = []
+    for ref, ids in node_names.items():
+        ids = sorted(ids)
+        for i, first in enumerate(ids):
+            for second in ids[i + 1:]:
+                junctions.append(project(*nodes[ref]))
+                junction_names.append((first, second))
+
+    segments = np.array(segments, dtype=np.float32).reshape(-1, 4)
+    segment_names = np.array(segment_names, dtype=np.uint32)
+    junctions = np.array(junctions, dtype=np.float32).reshape(-1, 2)
+    junction_names = np.array(junction_names, dtype=np.uint32).reshape(-1, 2)
+
+    min_x = float(min(segments[:, 0].min(), segments[:, 2].min())) - cell
+    min_y = float(min(segments[:, 1].min(), segments[:, 3].min())) - cell
+    width = int((max(segments[:, 0].max(), segments[:, 2].max()) - min_x) // cell) + 2
+    height = int((max(segments[:, 1].max(), segments[:, 3].max()) - min_y) // cell) + 2
+    n_cells = width * height
+
+    # A segment goes in every cell its bounding box touches
+    x0, y0 = _grid(np.minimum(segments[:, 0], segments[:, 2]), np.minimum(segments[:, 1], segments[:, 3]),
+                   min_x, min_y, cell, width, height)
+    x1, y1 = _grid(np.maximum(segments[:, 0], segments[:, 2]), np.maximum(segments[:, 1], segments[:, 3]),
+                   min_x, min_y, cell, width, height)
+    index = np.arange(len(segments))
+    cells, items = [], []
+    for dx in (0, 1):
+        for dy in (0, 1):
+            keep = (x0 + dx <= x1) & (y0 + dy <= y1)
+            cells.append((y0[keep] + dy) * width + x0[keep] + dx)
+            items.append(index[keep])
+    segment_offsets, segment_items = _buckets(np.concatenate(cells), np.concatenate(items), n_cells)
+
+    jx, jy = _grid(junctions[:, 0], junctions[:, 1], min_x, min_y, cell, width, height)
+    junction_offsets, junction_items = _buckets(jy * width + jx, np.arange(len(junctions)), n_cells)
+
+    name_blob = '\n'.join(names).encode('utf-8')
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(segments), len(segment_items), len(junctions), width, height,
+                            cell, project.lat0, project.lon0, min_x, min_y, len(name_blob)))
+        for array in (segments, segment_names, segment_offsets, segment_items,
+                      junctions, junction_names, junction_offsets, junction_items):
+            f.write(b'\0' * (-f.tell() % 8))
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.write(name_blob)
+    os.replace(tmp_path, out_path)
+    return {'roads': len(names), 'segments': len(segments), 'junctions': len(junctions),
+            'grid': f"{width}x{height}", 'bytes': os.path.getsize(out_path)}
+
+
+def _segment_distances(segments, x, y):
+    ax, ay, bx, by = segments[:, 0], segments[:, 1], segments[:, 2], segments[:, 3]
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = np.clip(((x - ax) * dx + (y - ay) * dy) / np.where(length2 > 0, length2, 1), 0, 1)
+    return np.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+
+class RoadIndex:
+    """A memory-mapped index built by build_index()."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, n_segments, n_items, n_junctions, self.width, self.height, self.cell,
+         lat0, lon0, self.min_x, self.min_y, names_length) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a road index")
+        self.project = Projection(lat0, lon0)
+
+        offset = HEADER.size
+        n_cells = self.width * self.height
+
+        def take(dtype, count, shape=None):
+            nonlocal offset
+            offset += -offset % 8
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array.reshape(shape) if shape else array
+
+        self.segments = take(np.float32, n_segments * 4, (-1, 4))
+        self.segment_names = take(np.uint32, n_segments)
+        self.segment_offsets = take(np.uint32, n_cells + 1)
+        self.segment_items = take(np.uint32, n_items)
+        self.junctions = take(np.float32, n_junctions * 2, (-1, 2))
+        self.junction_names = take(np.uint32, n_junctions * 2, (-1, 2))
+        self.junction_offsets = take(np.uint32, n_cells + 1)
+        self.junction_items = take(np.uint32, n_junctions)
+        self.names = bytes(self._mmap[offset:offset + names_length]).decode('utf-8').split('\n')
+        self._street_names = None
+
+    def has_street(self, name):
+        """True if a road of this name (any case) is in the index"""
+        if self._street_names is None:
+            self._street_names = {n.lower() for n in self.names}
+        return name.lower() in self._street_names
+
+    def _cell(self, x, y):
+        return int((x - self.min_x) // self.cell), int((y - self.min_y) // self.cell)
+
+    def _window(self, offsets, items, cx, cy, radius):
+        """Item ids in the square of cells within `radius` cells of (cx, cy)"""
+        x0, x1 = max(0, cx - radius), min(self.width - 1, cx + radius)
+        if x0 > x1:
+            return None
+        found = []
+        # Cells of one grid row are adjacent in the CSR arrays: one slice per row
+        for gy in range(max(0, cy - radius), min(self.height, cy + radius + 1)):
+            start = offsets[gy * self.width + x0]
+            end = offsets[gy * self.width + x1 + 1]
+            if end > start:
+                found.append(items[start:end])
+        if not found:
+            return None
+        return np.concatenate(found) if len(found) > 1 else found[0]
+
+    def nearest_segment(self, x, y, max_distance=MAX_MATCH_METRES):
+        """(segment id, distance in metres) of the closest road, or (None, inf)"""
+        cx, cy = self._cell(x, y)
+        # Anything outside a window of `radius` cells is at least `radius` cells
+        # away, so grow the window until the best match is closer than that
+        best = None
+        for radius in range(1, int(max_distance // self.cell) + 2):
+            candidates = self._window(self.segment_offsets, self.segment_items, cx, cy, radius)
+            if candidates is None:
+                continue
+            distances = _segment_distances(self.segments[candidates], x, y)
+            i = int(distances.argmin())
+            best = int(candidates[i]), float(distances[i])
+            if best[1] <= radius * self.cell:
+                break
+        if best is None or best[1] > max_distance:
+            return None, math.inf
+        return best
+
+    def nearest_junction(self, x, y, name_id, max_distance=JUNCTION_SEARCH_METRES):
+        """(cross street name id, distance) of the closest junction on a street, or (None, inf)"""
+        cx, cy = self._cell(x, y)
+        candidates = self._window(self.junction_offsets, self.junction_items, cx, cy,
+                                  int(max_distance // self.cell) + 1)
+        if candidates is None:
+            return None, math.inf
+        pairs = self.junction_names[candidates]
+        on_street = (pairs[:, 0] == name_id) | (pairs[:, 1] == name_id)
+        if not on_street.any():
+            return None, math.inf
+        candidates, pairs = candidates[on_street], pairs[on_street]
+        points = self.junctions[candidates]
+        distances = np.hypot(points[:, 0] - x, points[:, 1] - y)
+        i = int(distances.argmin())
+        if distances[i] > max_distance:
+            return None, math.inf
+        other = pairs[i, 1] if pairs[i, 0] == name_id else pairs[i, 0]
+        return int(other), float(distances[i])
+
+    def lookup(self, lat, lon, max_distance=MAX_MATCH_METRES):
+        """Nearest named street to a GPS position, or None if none is close enough.
+
+        Returns {'street', 'distance_m', 'junction', 'junction_distance_m'}; the
+        junction is the nearest one along that street (None if none within 200m).
+        """
+        x, y = self.project(lat, lon)
+        segment, distance = self.nearest_segment(x, y, max_distance)
+        if segment is None:
+            return None
+        name_id = int(self.segment_names[segment])
+        cross, junction_distance = self.nearest_junction(x, y, name_id)
+        return {
+            'street': self.names[name_id],
+            'distance_m': round(distance, 1),
+            'junction': self.names[cross] if cross is not None else None,
+            'junction_distance_m': round(junction_distance, 1) if cross is not None else None,
+        }
+
+
+_indexes = {}
+
+
+def get_road_index(path=DEFAULT_INDEX_PATH):
+    """Process-wide index for a file, or None if it has not been built"""
+    if path not in _indexes:
+        _indexes[path] = RoadIndex(path) if os.path.exists(path) else None
+    return _indexes[path]
+
+
+def lookup_street(lat, lon, path=DEFAULT_INDEX_PATH):
+    """Street lookup against the default index; None without an index or a match"""
+    index = get_road_index(path)
+    return index.lookup(lat, lon) if index else None
+
+
+def is_known_street(name, path=DEFAULT_INDEX_PATH):
+    """True if the default index has a road of this name; False without an index"""
+    index = get_road_index(path)
+    return index.has_street(name) if index else False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline street lookup from GPS coordinates")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from an OSM XML extract")
+    build.add_argument("osm_file")
+    build.add_argument("--out", default=DEFAULT_INDEX_PATH, help="Index file (default: roads.idx)")
+    build.add_argument("--cell", type=float, default=DEFAULT_CELL_METRES, help="Grid cell size in metres")
+    lookup = commands.add_parser("lookup", help="Find the street at a position")
+    lookup.add_argument("lat", type=float)
+    lookup.add_argument("lon", type=float)
+    lookup.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        summary = build_index(args.osm_file, args.out, args.cell)
+        print(f"✓ Indexed {summary['roads']} roads ({summary['segments']} segments, "
+              f"{summary['junctions']} junctions, {summary['bytes'] / 1024:.0f} KB) to {args.out}")
+    else:
+        match = lookup_street(args.lat, args.lon, args.index)
+        if match is None:
+            print("No named road within 50m (or no index built)")
+            return
+        print(f"{match['street']} ({match['distance_m']}m away)")
+        if match['junction']:
+            print(f"  Junction with {match['junction']}: {match['junction_distance_m']}m")
+
+
+if __name__ == "__main__":
+    main()
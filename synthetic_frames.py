@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Synthetic dashcam frames for benchmarks and offline experiments.
+
+Each frame has a road-and-sky background with noise, a car in one of the
+form's colours carrying a UK number plate, a burned-in date/time overlay
+along the bottom edge, EXIF DateTimeOriginal, and a Nextbase-style
+timestamped filename. Everything is driven by a seed, so the same call
+always produces the same files.
+
+Usage:
+    python synthetic_frames.py out_dir --per-resolution 3
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080), (2560, 1440))
+
+CAR_COLOURS = {
+    'silver': (180, 182, 188),
+    'white': (235, 235, 232),
+    'black': (25, 25, 28),
+    'red': (170, 20, 25),
+    'blue': (25, 60, 150),
+    'grey': (105, 107, 112),
+}
+
+EXIF_DATETIME = 0x0132
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+# Letters never issued in current-format plates
+_PLATE_LETTERS = [c for c in string.ascii_uppercase if c not in 'IQZ']
+
+
+def random_registration(rng):
+    """A current-format UK registration, e.g. AB12CDE"""
+    letters = lambda n: ''.join(rng.choice(_PLATE_LETTERS) for _ in range(n))
+    return f"{letters(2)}{rng.randint(0, 9)}{rng.randint(0, 9)}{letters(3)}"
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def generate_frame(width, height, timestamp, registration, colour='silver', seed=0):
+    """Render one frame and return it as a PIL image (EXIF is added when saving)"""
+    rng = np.random.default_rng(seed)
+    horizon = int(height * 0.45)
+
+    # Sky gradient over grey road, with sensor-like noise
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[:horizon] = np.linspace(200, 150, horizon)[:, None, None] * np.array([0.8, 0.9, 1.0])
+    pixels[horizon:] = np.linspace(90, 60, height - horizon)[:, None, None]
+    pixels += rng.normal(0, 6, pixels.shape)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+
+    # Car body and windows
+    car_w, car_h = int(width * 0.36), int(height * 0.30)
+    left = int(width * 0.32 + rng.integers(-width // 20, width // 20 + 1))
+    top = int(height * 0.42)
+    draw.rounded_rectangle((left, top, left + car_w, top + car_h), radius=car_h // 8,
+                           fill=CAR_COLOURS[colour])
+    draw.rectangle((left + car_w // 8, top + car_h // 10, left + car_w * 7 // 8, top + car_h * 4 // 10),
+                   fill=(40, 45, 55))
+
+    # Rear plate (yellow) with black characters, 520x111mm proportions
+    plate_w = int(car_w * 0.42)
+    plate_h = int(plate_w * 111 / 520)
+    plate_left = left + (car_w - plate_w) // 2
+    plate_top = top + int(car_h * 0.62)
+    draw.rectangle((plate_left, plate_top, plate_left + plate_w, plate_top + plate_h), fill=(245, 205, 30))
+    plate_font = _font(max(8, int(plate_h * 0.75)))
+    text = f"{registration[:4]} {registration[4:]}"
+    text_w = draw.textlength(text, font=plate_font)
+    draw.text((plate_left + (plate_w - text_w) / 2, plate_top + plate_h * 0.08), text,
+              fill=(10, 10, 10), font=plate_font)
+
+    # Timestamp overlay band along the bottom
+    band_h = max(14, height // 22)
+    draw.rectangle((0, height - band_h, width, height), fill=(0, 0, 0))
+    draw.text((band_h // 2, height - band_h + band_h // 8), timestamp.strftime('%d/%m/%Y %H:%M:%S'),
+              fill=(255, 255, 255), font=_font(int(band_h * 0.7)))
+
+    return image
+
+
+def save_frame(image, path, timestamp, quality=90):
+    """Save as JPEG with EXIF DateTime and DateTimeOriginal"""
+    exif = Image.Exif()
+    stamp = timestamp.strftime('%Y:%m:%d %H:%M:%S')
+    exif[EXIF_DATETIME] = stamp
+    exif.get_ifd(EXIF_IFD)[EXIF_DATETIME_ORIGINAL] = stamp
+    image.save(path, 'JPEG', quality=quality, exif=exif)
+
+
+def write_dataset(out_dir, per_resolution=2, resolutions=RESOLUTIONS, seed=1):
+    """Write frames plus manifest.json (ground truth for each file); returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    start = datetime(2026, 2, 15, 8, 0, 0)
+    manifest = []
+
+    for width, height in resolutions:
+        for _ in range(per_resolution):
+            index = len(manifest)
+            timestamp = start + timedelta(minutes=rng.randint(0, 60 * 24 * 30), seconds=rng.randint(0, 59))
+            registration = random_registration(rng)
+            colour = rng.choice(sorted(CAR_COLOURS))
+            filename = f"{timestamp:%Y%m%d_%H%M%S}_{width}x{height}_{index:03d}.jpg"
+            path = os.path.join(out_dir, filename)
+            save_frame(generate_frame(width, height, timestamp, registration, colour, seed + index),
+                       path, timestamp)
+            manifest.append({
+                'path': path,
+                'width': width,
+                'height': height,
+                'date': timestamp.strftime('%Y-%m-%d'),
+                'time': timestamp.strftime('%H:%M'),
+                'registration': registration,
+                'colour': colour,
+            })
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic dashcam frames")
+    parser.add_argument("out_dir")
+    parser.add_argument("--per-resolution", type=int, default=2, help="Frames per resolution (default: 2)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    manifest = write_dataset(args.out_dir, args.per_resolution, seed=args.seed)
+    print(f"✓ Wrote {len(manifest)} frames and manifest.json to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,12 @@ Telegram Bot for Nextbase Auto
 Allows users to report traffic incidents via Telegram by sending photos.
 """
 
+import asyncio
+import contextlib
 import logging
 import os
+import sys
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
@@ -17,6 +21,24 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
+from update_processor import ChatSerializedUpdateProcessor
+from caption_parser import describe_caption, parse_caption
+from extract_from_image import extract_gps, select_best_frame
+from message_scheduler import MessageScheduler
+from incident_templates import get_template_registry
+from road_index import lookup_street
+from tracing import span, trace_from_argv, traced
+from incident_ledger import DEFAULT_LEDGER_PATH, IncidentLedger, describe_ledger_result
+from bot_metrics import (
+    Counter,
+    Gauge,
+    instrumented,
+    metrics,
+    monitor_event_loop_lag,
+    record_abandoned,
+    record_completed,
+    start_metrics_server,
+)
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +49,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# How long to wait after the last photo of an album before treating it as complete
+ALBUM_COLLECTION_WINDOW = float(os.getenv("BOT_ALBUM_WINDOW_SECONDS", "1.5"))
+
+# Merge the summary into as few messages as possible (harder to copy field by field)
+COALESCE_SUMMARY = os.getenv("BOT_COALESCE_SUMMARY", "").lower() in ("1", "true", "yes")
+
 # Conversation states
 (
     PHOTO,
@@ -50,36 +78,110 @@ logger = logging.getLogger(__name__)
     GENDER,
 ) = range(19)
 
+# Labels for metrics
+STATE_NAMES = {
+    PHOTO: "photo",
+    INCIDENT_TYPE: "incident_type",
+    REGISTRATION: "registration",
+    COLOR: "color",
+    INCIDENT_DATE: "incident_date",
+    INCIDENT_TIME: "incident_time",
+    LOCATION: "location",
+    FIRST_NAME: "first_name",
+    LAST_NAME: "last_name",
+    EMAIL: "email",
+    PHONE: "phone",
+    ADDRESS1: "address1",
+    ADDRESS2: "address2",
+    COUNTY: "county",
+    POSTCODE: "postcode",
+    OCCUPATION: "occupation",
+    DATE_OF_BIRTH: "date_of_birth",
+    PLACE_OF_BIRTH: "place_of_birth",
+    GENDER: "gender",
+}
+
+# Caption fields -> where the conversation keeps them
+CAPTION_FIELDS = {
+    "incident_type": "incident_type",
+    "registration": "registration",
+    "colour": "color",
+    "date": "incident_date",
+    "time": "incident_time",
+    "street": "incident_location",
+}
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the conversation and ask for photo."""
+    # Details from a previous report would otherwise be taken as already answered
+    context.user_data.clear()
     await update.message.reply_text(
         "👋 Welcome to Nextbase Auto Bot!\n\n"
         "I'll help you report bad parking to South Yorkshire Police.\n\n"
         "📸 Please send me a photo of the incident.\n\n"
+        "Tip: add a caption such as \"corner AB12 XYZ silver Hunter House Road 15/02 14:30\" "
+        "and I'll only ask for what's missing.\n\n"
         "You can /cancel at any time to stop."
     )
     return PHOTO
 
 
+def photo_attachment(message):
+    """The largest photo size, or the image sent as a file (which keeps its EXIF/GPS)."""
+    return message.photo[-1] if message.photo else message.document
+
+
+def apply_caption(context: ContextTypes.DEFAULT_TYPE, caption) -> str:
+    """Store the incident details found in a photo caption; returns a confirmation ("" if none)."""
+    found = parse_caption(caption)
+    for field, key in CAPTION_FIELDS.items():
+        if field in found:
+            context.user_data[key] = found[field]
+    if not found:
+        return ""
+    return f"📝 From your caption:\n{describe_caption(found)}\n\n"
+
+
+def details_prompt(context: ContextTypes.DEFAULT_TYPE) -> str:
+    if next_question_state(context.user_data) == FIRST_NAME:
+        return "That's everything about the incident."
+    return "Now I need some details about the incident."
+
+
 async def photo_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Process the uploaded photo."""
+    """Process the uploaded photo, or the first photo of an album."""
+    # Telegram puts an album's caption on its first photo
+    context.user_data["caption_note"] = apply_caption(context, update.message.caption)
+    if update.message.media_group_id:
+        start_album(update, context)
+        # The next question is sent once the whole album has arrived
+        return next_question_state(context.user_data)
+    
     user = update.effective_user
-    photo_file = await update.message.photo[-1].get_file()
+    photo_file = await photo_attachment(update.message).get_file()
     
     # Download photo
     photo_path = f"/tmp/nextbase_bot_{user.id}.jpg"
-    await photo_file.download_to_drive(photo_path)
+    started = time.perf_counter()
+    with span("photo_download"):
+        await photo_file.download_to_drive(photo_path)
+    metrics.observe(metrics.photo_download, value=time.perf_counter() - started)
     
     # Store photo path in context
     context.user_data["photo_path"] = photo_path
+    context.user_data["photo_paths"] = [photo_path]
     
     await update.message.reply_text(
         "✅ Photo received and saved!\n\n"
-        "Now I need some details about the incident."
+        f"{context.user_data.pop('caption_note')}{details_prompt(context)}"
     )
     
-    # Ask for incident type
+    return await ask_next_question(update, context)
+
+
+async def ask_incident_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ask for the incident type."""
     keyboard = [["Corner parking", "Pavement parking"]]
     await update.message.reply_text(
         "⚠️ What type of incident is this?\n\n"
@@ -87,86 +189,237 @@ async def photo_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "• Pavement parking - Vehicle parked on pavement/footway",
         reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True),
     )
-    return INCIDENT_TYPE
 
 
-async def incident_type_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store incident type and ask for registration."""
-    text = update.message.text
-    if "corner" in text.lower():
-        context.user_data["incident_type"] = "corner"
+async def download_album_photo(message, photo_path: str) -> str:
+    """Download one photo of an album and return where it was saved."""
+    photo_file = await photo_attachment(message).get_file()
+    started = time.perf_counter()
+    with span("photo_download"):
+        await photo_file.download_to_drive(photo_path)
+    metrics.observe(metrics.photo_download, value=time.perf_counter() - started)
+    return photo_path
+
+
+def add_album_photo(update: Update, context: ContextTypes.DEFAULT_TYPE, album: dict) -> None:
+    """Start downloading an album photo in the background."""
+    user = update.effective_user
+    photo_path = f"/tmp/nextbase_bot_{user.id}_{len(album['downloads'])}.jpg"
+    album["downloads"].append(
+        asyncio.create_task(download_album_photo(update.message, photo_path))
+    )
+    album["last_seen"] = time.monotonic()
+
+
+def start_album(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Begin collecting a media group and schedule its completion."""
+    album = {
+        "id": update.message.media_group_id,
+        "downloads": [],
+        "last_seen": time.monotonic(),
+    }
+    context.user_data["album"] = album
+    add_album_photo(update, context, album)
+    context.application.create_task(finish_album(update, context, album))
+
+
+async def album_photo_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Attach a further photo of the album currently being collected."""
+    album = context.user_data.get("album")
+    if album and update.message.media_group_id == album["id"]:
+        add_album_photo(update, context, album)
     else:
-        context.user_data["incident_type"] = "pavement"
-    
+        await update.message.reply_text(
+            "Only one photo or album can be attached per report. "
+            "Use /cancel and /start to report another incident."
+        )
+
+
+async def finish_album(update: Update, context: ContextTypes.DEFAULT_TYPE, album: dict) -> None:
+    """Wait for the album to stop growing, then store it and carry on."""
+    try:
+        # Debounce: keep waiting while more photos of the album are arriving
+        while True:
+            remaining = album["last_seen"] + ALBUM_COLLECTION_WINDOW - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        
+        results = await asyncio.gather(*album["downloads"], return_exceptions=True)
+        if context.user_data.get("album") is not album:
+            return  # Conversation was cancelled while collecting
+        del context.user_data["album"]
+        
+        photo_paths = [r for r in results if isinstance(r, str)]
+        for error in results:
+            if isinstance(error, Exception):
+                logger.error(f"Error downloading album photo: {error}")
+        if not photo_paths:
+            await update.message.reply_text(
+                "❌ Could not download your photos. Use /start to try again."
+            )
+            return
+        
+        best_photo = await asyncio.to_thread(select_best_frame, photo_paths)
+        context.user_data["photo_paths"] = photo_paths
+        context.user_data["photo_path"] = best_photo
+        
+        await update.message.reply_text(
+            f"✅ {len(photo_paths)} photos received and saved!\n\n"
+            f"{context.user_data.pop('caption_note', '')}{details_prompt(context)}"
+        )
+        # photo_received already moved the conversation to this question's state
+        await ask_next_question(update, context)
+    except Exception as e:
+        logger.error(f"Error in finish_album: {e}", exc_info=True)
+
+
+async def ask_registration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "🚗 What is the vehicle registration number?\n\n"
         "Example: AB12 XYZ",
         reply_markup=ReplyKeyboardRemove(),
     )
-    return REGISTRATION
 
 
-async def registration_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store registration and ask for color."""
-    context.user_data["registration"] = update.message.text.upper().strip()
-    
-    await update.message.reply_text("🎨 What is the vehicle color?\n\nExample: Silver, Blue, Red")
-    return COLOR
+async def ask_color(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(
+        "🎨 What is the vehicle color?\n\nExample: Silver, Blue, Red",
+        reply_markup=ReplyKeyboardRemove(),
+    )
 
 
-async def color_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store color and ask for incident date."""
-    context.user_data["color"] = update.message.text
-    
+async def ask_incident_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "📅 What date did the incident occur?\n\n"
-        "Format: DD/MM/YYYY (e.g., 15/02/2026)"
+        "Format: DD/MM/YYYY (e.g., 15/02/2026)",
+        reply_markup=ReplyKeyboardRemove(),
     )
-    return INCIDENT_DATE
 
 
-async def incident_date_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store incident date and ask for time."""
-    context.user_data["incident_date"] = update.message.text
-    
+async def ask_incident_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
         "🕐 What time did the incident occur?\n\n"
-        "Format: HH:MM (e.g., 14:30)"
+        "Format: HH:MM (e.g., 14:30)",
+        reply_markup=ReplyKeyboardRemove(),
     )
-    return INCIDENT_TIME
 
 
-async def incident_time_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store incident time and ask for location."""
+def street_from_photos(photo_paths):
+    """Street of the first photo with EXIF GPS, from the offline road index (or None)"""
+    for photo_path in photo_paths:
+        gps = extract_gps(photo_path)
+        if gps:
+            match = lookup_street(*gps)
+            if match:
+                return match["street"]
+    return None
+
+
+async def ask_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ask for the street, offering the one at the photo's GPS position."""
+    photo_paths = context.user_data.get("photo_paths") or []
     try:
-        context.user_data["incident_time"] = update.message.text
-        
+        street = await asyncio.to_thread(street_from_photos, photo_paths)
+    except Exception as e:
+        logger.error(f"Error looking up street from photo GPS: {e}", exc_info=True)
+        street = None
+    if street:
         await update.message.reply_text(
             "📍 What is the street name where the incident occurred?\n\n"
-            "Example: Hunter House Road"
+            f"The photo's GPS position is on {street}: tap it, or type another street.",
+            reply_markup=ReplyKeyboardMarkup([[street]], one_time_keyboard=True, resize_keyboard=True),
+        )
+    else:
+        await update.message.reply_text(
+            "📍 What is the street name where the incident occurred?\n\n"
+            "Example: Hunter House Road",
+            reply_markup=ReplyKeyboardRemove(),
         )
-        return LOCATION
-    except Exception as e:
-        logger.error(f"Error in incident_time_received: {e}", exc_info=True)
-        await update.message.reply_text(f"Error: {e}")
-        return ConversationHandler.END
 
 
-async def location_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Store location and ask for first name."""
-    context.user_data["incident_location"] = update.message.text
-    
+async def ask_first_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(
-        "✅ Location saved.\n\n"
+        "✅ Incident details saved.\n\n"
         "🔒 **Privacy Notice:**\n"
         "I now need to collect your personal information to complete the report. "
         "This data is NOT stored or shared with anyone. It's only used temporarily "
         "to generate your report, then deleted.\n\n"
-        "👤 What is your first name?"
+        "👤 What is your first name?",
+        reply_markup=ReplyKeyboardRemove(),
     )
+
+
+# Incident details in the order they are asked, skipping any already known (e.g. from a caption)
+INCIDENT_QUESTIONS = (
+    ("incident_type", INCIDENT_TYPE, ask_incident_type),
+    ("registration", REGISTRATION, ask_registration),
+    ("color", COLOR, ask_color),
+    ("incident_date", INCIDENT_DATE, ask_incident_date),
+    ("incident_time", INCIDENT_TIME, ask_incident_time),
+    ("incident_location", LOCATION, ask_location),
+)
+
+
+def next_question_state(user_data) -> int:
+    """State of the first incident detail still missing, or FIRST_NAME when all are known."""
+    for key, state, _ask in INCIDENT_QUESTIONS:
+        if key not in user_data:
+            return state
     return FIRST_NAME
 
 
+async def ask_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ask for the first missing incident detail (or the personal details) and return its state."""
+    state = next_question_state(context.user_data)
+    for _key, question_state, ask in INCIDENT_QUESTIONS:
+        if question_state == state:
+            await ask(update, context)
+            return state
+    await ask_first_name(update, context)
+    return FIRST_NAME
+
+
+async def incident_type_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store incident type and ask for the next missing detail."""
+    text = update.message.text
+    if "corner" in text.lower():
+        context.user_data["incident_type"] = "corner"
+    else:
+        context.user_data["incident_type"] = "pavement"
+    return await ask_next_question(update, context)
+
+
+async def registration_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store registration and ask for the next missing detail."""
+    context.user_data["registration"] = update.message.text.upper().strip()
+    return await ask_next_question(update, context)
+
+
+async def color_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store color and ask for the next missing detail."""
+    context.user_data["color"] = update.message.text
+    return await ask_next_question(update, context)
+
+
+async def incident_date_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store incident date and ask for the next missing detail."""
+    context.user_data["incident_date"] = update.message.text
+    return await ask_next_question(update, context)
+
+
+async def incident_time_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store incident time and ask for the next missing detail."""
+    context.user_data["incident_time"] = update.message.text
+    return await ask_next_question(update, context)
+
+
+async def location_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Store location and ask for first name."""
+    context.user_data["incident_location"] = update.message.text
+    return await ask_next_question(update, context)
+
+
 async def first_name_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Store first name and ask for last name."""
     context.user_data["first_name"] = update.message.text
@@ -263,17 +516,20 @@ async def gender_received(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     # Generate summary
     await show_summary(update, context)
+    record_completed()
     
     return ConversationHandler.END
 
 
-async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show complete summary of all collected data in easy-to-copy format."""
-    data = context.user_data
+def build_summary_messages(data, ledger_note=None):
+    """The summary messages for collected incident data, keyed by section.
     
+    Sections, in sending order: intro, personal_info, incident_info,
+    description, final_instructions.
+    """
     # Load incident template
     incident_type = data.get("incident_type", "corner")
-    template = load_incident_template(incident_type)
+    template = load_incident_template(incident_type, data)
     
     # Parse date to get day of week
     try:
@@ -287,14 +543,16 @@ async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     except:
         day_of_week = ""
     
-    await update.message.reply_text(
+    intro = (
         "✅ **All information collected!**\n\n"
         "I'll now send you all the details in easy-to-copy sections.\n\n"
-        "Simply tap each message to copy and paste into the form.",
-        reply_markup=ReplyKeyboardRemove(),
+        "Simply tap each message to copy and paste into the form."
     )
     
-    # Send personal information section
+    if ledger_note:
+        intro += f"\n\n📒 {ledger_note}"
+    
+    # Personal information section
     personal_info = (
         "📋 **PERSONAL INFORMATION**\n"
         "Copy each line below:\n\n"
@@ -311,9 +569,8 @@ async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         f"**Place of Birth:**\n{data.get('place_of_birth')}\n\n"
         f"**Gender:**\n{data.get('gender')}"
     )
-    await update.message.reply_text(personal_info)
     
-    # Send incident details section
+    # Incident details section
     incident_info = (
         "🚗 **INCIDENT DETAILS**\n"
         "Copy each line below:\n\n"
@@ -330,24 +587,24 @@ async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         f"**Vehicle Make:**\ncar\n\n"
         f"**Vehicle Model:**\nNot known"
     )
-    await update.message.reply_text(incident_info)
     
-    # Send incident description (this is the long one)
+    # Incident description (this is the long one)
     description_msg = (
         "📝 **INCIDENT DESCRIPTION**\n"
         "Tap to copy this full description:\n\n"
         f"{template}"
     )
-    await update.message.reply_text(description_msg)
     
-    # Send form link and instructions
+    # Form link and instructions
+    photos = data.get("photo_paths") or [data.get("photo_path")]
+    photo_count = "photo" if len(photos) == 1 else f"{len(photos)} photos"
     final_instructions = (
         "🔗 **READY TO SUBMIT**\n\n"
         "1. Open the form here:\n"
         "https://secureform.nextbase.co.uk/?location=SouthYorkshire\n\n"
         "2. Tap each message above to copy\n"
         "3. Paste into the matching fields\n"
-        "4. Upload your photo\n"
+        f"4. Upload your {photo_count}\n"
         "5. Complete reCAPTCHA\n"
         "6. Submit!\n\n"
         "💡 **Tips:**\n"
@@ -356,51 +613,71 @@ async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "• Switch between apps to paste\n\n"
         "Use /start to report another incident."
     )
-    await update.message.reply_text(final_instructions)
-
-
-def load_incident_template(incident_type):
-    """Load the incident description template."""
-    templates = {
-        "corner": (
-            "I found the above vehicle parked in a manner that failed to meet the rules laid out in the Highway Code, "
-            "creating an unnecessary obstruction of the road and a danger to vulnerable road users.\n\n"
-            "Rule 243 of the highway code states DO NOT STOP or park opposite or within 10m (32 feet) of a junction, "
-            "opposite a traffic island, or on a bend and \"DO NOT stop or park where the kerb has been lowered to help "
-            "wheelchair users and powered mobility vehicles.\"\n\n"
-            "The vehicle was obscuring visibility at a junction causing a danger for vulnerable road users such as "
-            "motorcyclists, cyclists, and pedestrians who are put at more risk as a result of poor junction visibility. "
-            "Rule 242 of the Highway code states \"You MUST NOT leave your vehicle or trailer in a dangerous position "
-            "or where it causes an unnecessary obstruction of the road.\". It was also covering a dropped kerb.\n\n"
-            "Offence code: Leave a motor vehicle in dangerous position RT88508.\n\n"
-            "No notes or badges were displayed in the vehicle. No loading or unloading was taking place."
-        ),
-        "pavement": (
-            "I found the above vehicle parked in a manner that failed to meet the rules laid out in the Highway Code, "
-            "creating an unnecessary obstruction of the road and a danger to vulnerable road users.\n\n"
-            "The car was parked partly on the footway, which constitutes part of 'the road' making it impossible for "
-            "wheelchair users and prams to pass.\n\n"
-            "Rule 145 states \"You MUST NOT drive on or over a pavement, footpath or bridleway except to gain lawful "
-            "access to property, or in the case of an emergency\".\n\n"
-            "Rule 244 states \"You MUST NOT park partially or wholly on the pavement in London, and should not do so "
-            "elsewhere unless signs permit it. Parking on the pavement can obstruct and seriously inconvenience pedestrians, "
-            "people in wheelchairs or with visual impairments and people with prams or pushchairs\"\n\n"
-            "Rule 243 of the highway code states DO NOT STOP or park opposite or within 10m (32 feet) of a junction, "
-            "opposite a traffic island, or on a bend and \"DO NOT stop or park where the kerb has been lowered to help "
-            "wheelchair users and powered mobility vehicles.\"\n\n"
-            "The vehicle was causing a danger for vulnerable road users such as motorcyclists, cyclists, and pedestrians "
-            "who are put at more risk as a result of poor junction visibility.\n\n"
-            "Rule 242 of the Highway code states \"You MUST NOT leave your vehicle or trailer in a dangerous position "
-            "or where it causes an unnecessary obstruction of the road.\"\n\n"
-            "Offence code: Leave a motor vehicle in dangerous position RT88508.\n\n"
-            "No notes or badges were displayed in the vehicle. No loading or unloading was taking place."
-        ),
+    
+    return {
+        "intro": intro,
+        "personal_info": personal_info,
+        "incident_info": incident_info,
+        "description": description_msg,
+        "final_instructions": final_instructions,
     }
-    return templates.get(incident_type, templates["corner"])
+
+
+async def show_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show complete summary of all collected data in easy-to-copy format."""
+    data = context.user_data
+    incident_type = data.get("incident_type", "corner")
+    
+    # Warn about repeat or duplicate reports
+    ledger_note = None
+    ledger = context.bot_data.get("incident_ledger")
+    if ledger:
+        try:
+            ledger_result = await asyncio.to_thread(
+                traced("ledger_record")(ledger.record),
+                data.get("registration"),
+                street=data.get("incident_location"),
+                incident_date=data.get("incident_date"),
+                incident_time=data.get("incident_time"),
+                incident_type=incident_type,
+                image_paths=data.get("photo_paths") or [],
+                source="telegram",
+            )
+            ledger_note = describe_ledger_result(ledger_result)
+        except Exception as e:
+            logger.error(f"Error recording incident in ledger: {e}", exc_info=True)
+    
+    messages = build_summary_messages(data, ledger_note)
+    
+    # Paced through the scheduler so summaries never trip Telegram flood control
+    scheduler = context.bot_data["message_scheduler"]
+    await scheduler.send(
+        update.effective_chat.id,
+        list(messages.values()),
+        coalesce=COALESCE_SUMMARY,
+        reply_markup=ReplyKeyboardRemove(),
+    )
+
+
+def load_incident_template(incident_type, data=None):
+    """Render the incident description template."""
+    templates = get_template_registry()
+    if incident_type not in templates:
+        incident_type = "corner"
+    data = data or {}
+    return templates.render(
+        incident_type,
+        reg=data.get("registration"),
+        street=data.get("incident_location"),
+        date=data.get("incident_date"),
+        time=data.get("incident_time"),
+    )
 
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the conversation."""
+    context.user_data.pop("album", None)
+    record_abandoned(update)
     await update.message.reply_text(
         "❌ Report cancelled. Use /start to begin again.",
         reply_markup=ReplyKeyboardRemove(),
@@ -418,7 +695,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "/cancel - Cancel current report\n\n"
         "**How to use:**\n"
         "1. Send /start\n"
-        "2. Upload a photo of the incident\n"
+        "2. Upload a photo of the incident (a caption like \"corner AB12 XYZ silver "
+        "Hunter House Road 15/02 14:30\" answers the incident questions)\n"
         "3. Answer questions about the incident\n"
         "4. Answer questions about your personal details\n"
         "5. Get a complete summary with incident description\n\n"
@@ -429,49 +707,124 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(help_text)
 
 
-def main() -> None:
-    """Run the bot."""
-    # Get bot token from environment
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    if not token:
-        print("Error: TELEGRAM_BOT_TOKEN not set in environment")
-        print("Please set it in .env file or environment variables")
-        return
+async def start_background_tasks(application: Application) -> None:
+    """Start tasks that run for the lifetime of the bot."""
+    application.bot_data["event_loop_monitor"] = asyncio.create_task(monitor_event_loop_lag())
+
+
+async def stop_background_tasks(application: Application) -> None:
+    """Cancel the tasks started by start_background_tasks."""
+    task = application.bot_data.pop("event_loop_monitor", None)
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def build_application(token: str, request=None, ledger_path=None) -> Application:
+    """Create the bot application with all handlers registered.
     
-    # Create application
-    application = Application.builder().token(token).build()
+    `request` replaces the HTTP layer used to talk to Telegram and
+    `ledger_path` the incident ledger database (both used by the offline
+    load test).
+    """
+    # Updates from different chats run concurrently; each chat stays in order
+    max_concurrent = int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", "64"))
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(ChatSerializedUpdateProcessor(max_concurrent))
+        .post_init(start_background_tasks)
+        .post_shutdown(stop_background_tasks)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
+    
+    def timed(callback):
+        return instrumented(callback.__name__, STATE_NAMES)(traced()(callback))
+    
+    # Photos, or images sent as files (Telegram strips location from compressed photos)
+    photo_filter = filters.PHOTO | filters.Document.IMAGE
     
     # Define conversation handler
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[CommandHandler("start", timed(start))],
         states={
-            PHOTO: [MessageHandler(filters.PHOTO, photo_received)],
-            INCIDENT_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, incident_type_received)],
-            REGISTRATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, registration_received)],
-            COLOR: [MessageHandler(filters.TEXT & ~filters.COMMAND, color_received)],
-            INCIDENT_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, incident_date_received)],
-            INCIDENT_TIME: [MessageHandler(filters.TEXT & ~filters.COMMAND, incident_time_received)],
-            LOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, location_received)],
-            FIRST_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, first_name_received)],
-            LAST_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, last_name_received)],
-            EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, email_received)],
-            PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, phone_received)],
-            ADDRESS1: [MessageHandler(filters.TEXT & ~filters.COMMAND, address1_received)],
-            ADDRESS2: [MessageHandler(filters.TEXT & ~filters.COMMAND, address2_received)],
-            COUNTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, county_received)],
-            POSTCODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, postcode_received)],
-            OCCUPATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, occupation_received)],
-            DATE_OF_BIRTH: [MessageHandler(filters.TEXT & ~filters.COMMAND, dob_received)],
-            PLACE_OF_BIRTH: [MessageHandler(filters.TEXT & ~filters.COMMAND, pob_received)],
-            GENDER: [MessageHandler(filters.TEXT & ~filters.COMMAND, gender_received)],
+            PHOTO: [MessageHandler(photo_filter, timed(photo_received))],
+            INCIDENT_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(incident_type_received))],
+            REGISTRATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(registration_received))],
+            COLOR: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(color_received))],
+            INCIDENT_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(incident_date_received))],
+            INCIDENT_TIME: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(incident_time_received))],
+            LOCATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(location_received))],
+            FIRST_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(first_name_received))],
+            LAST_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(last_name_received))],
+            EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(email_received))],
+            PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(phone_received))],
+            ADDRESS1: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(address1_received))],
+            ADDRESS2: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(address2_received))],
+            COUNTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(county_received))],
+            POSTCODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(postcode_received))],
+            OCCUPATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(occupation_received))],
+            DATE_OF_BIRTH: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(dob_received))],
+            PLACE_OF_BIRTH: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(pob_received))],
+            GENDER: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(gender_received))],
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[
+            CommandHandler("cancel", timed(cancel)),
+            # Later photos of an album can arrive after a caption moved past the first questions
+            MessageHandler(photo_filter, timed(album_photo_received)),
+        ],
     )
     
+    # Load and validate incident templates once, before taking any updates
+    get_template_registry()
+    
+    # Outbound messages for the summary are paced per chat and globally
+    scheduler = MessageScheduler(application.bot)
+    application.bot_data["message_scheduler"] = scheduler
+    
+    # Local record of reported incidents, to flag duplicates and repeat offenders
+    application.bot_data["incident_ledger"] = IncidentLedger(ledger_path or DEFAULT_LEDGER_PATH)
+    
     # Add handlers
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler("help", help_command))
     
+    return application
+
+
+def main() -> None:
+    """Run the bot."""
+    # --trace out.json records handler timings, written when the bot stops
+    trace_from_argv(sys.argv)
+    
+    # Get bot token from environment
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        print("Error: TELEGRAM_BOT_TOKEN not set in environment")
+        print("Please set it in .env file or environment variables")
+        return
+    
+    application = build_application(token)
+    scheduler = application.bot_data["message_scheduler"]
+    
+    # Optional Prometheus metrics endpoint
+    metrics_port = os.getenv("BOT_METRICS_PORT")
+    if metrics_port:
+        metrics.add(Gauge(
+            "nextbase_bot_message_queue_wait_seconds_p95",
+            "95th percentile wait before an outgoing message was sent",
+            callback=lambda: scheduler.stats()["queue_wait_seconds_p95"],
+        ))
+        metrics.add(Counter(
+            "nextbase_bot_message_retries_total",
+            "Outgoing messages retried after Telegram flood control",
+            callback=lambda: scheduler.retries,
+        ))
+        start_metrics_server(int(metrics_port), os.getenv("BOT_METRICS_HOST", "127.0.0.1"))
+    
     # Run the bot
     print("Bot is running... Press Ctrl+C to stop.")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -0,0 +1,150 @@
+"""
+Lightweight span tracing with Chrome trace-event output.
+
+    from tracing import span, traced
+
+    with span('exif', image=image_path):
+        ...
+
+    @traced()
+    def extract_from_exif(image_path): ...
+
+Tracing is off unless enable_tracing() is called (the CLIs do this for
+`--trace out.json`). While off, span() returns one shared no-op object and
+@traced calls straight through after a single global check, so leaving the
+instrumentation in place costs next to nothing. While on, every span is
+recorded as a complete ("X") event; open the file in chrome://tracing or
+https://ui.perfetto.dev to see which stage dominates.
+"""
+
+import asyncio
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+_events = None
+_epoch = 0.0
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _lane():
+    """Track id: the asyncio task when inside one (coroutines interleave on a thread)"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'started')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        event = {
+            'name': self.name,
+            'ph': 'X',
+            'ts': (self.started - _epoch) * 1e6,
+            'dur': (ended - self.started) * 1e6,
+            'pid': os.getpid(),
+            'tid': _lane(),
+        }
+        if self.args or exc_type:
+            args = {k: str(v) for k, v in self.args.items()}
+            if exc_type:
+                args['error'] = exc_type.__name__
+            event['args'] = args
+        if _events is not None:
+            _events.append(event)
+        return False
+
+
+def tracing_enabled():
+    return _events is not None
+
+
+def enable_tracing():
+    """Start recording spans (clears anything recorded before)"""
+    global _events, _epoch
+    _epoch = time.perf_counter()
+    _events = []
+
+
+def span(name, **args):
+    """Context manager timing one stage; `args` are shown in the trace viewer"""
+    if _events is None:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorator recording a span per call (sync or async functions)"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _events is None:
+                    return await func(*args, **kwargs)
+                with _Span(span_name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return func(*args, **kwargs)
+            with _Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_trace(path):
+    """Write recorded spans as a Chrome trace-event JSON file"""
+    events = list(_events or [])
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    print(f"Trace with {len(events)} span(s) written to {path}")
+
+
+def trace_from_argv(argv):
+    """Handle `--trace out.json` in an argument list (removed in place).
+
+    Enables tracing and writes the file when the process exits. Returns the
+    output path, or None if the flag is absent.
+    """
+    if '--trace' not in argv:
+        return None
+    index = argv.index('--trace')
+    if index + 1 >= len(argv):
+        raise SystemExit("--trace needs an output file, e.g. --trace out.json")
+    path = argv[index + 1]
+    del argv[index:index + 2]
+    enable_tracing()
+    atexit.register(write_trace, path)
+    return path
@@ -0,0 +1,111 @@
+"""
+Concurrent update processing for the Telegram bot.
+
+Updates from different chats are handled concurrently, while updates from
+the same chat are processed one at a time in the order they arrived, so a
+user's answers always reach the conversation in sequence.
+"""
+
+import asyncio
+import inspect
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class ChatSerializedUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across chats but sequentially per chat."""
+
+    def __init__(self, max_concurrent_updates: int = 64):
+        super().__init__(max_concurrent_updates)
+        # chat_id -> [lock, number of updates waiting on or holding the lock]
+        self._chat_locks = {}
+
+    @staticmethod
+    def _chat_key(update: object):
+        """Return the key updates are serialized on (None for chat-less updates)."""
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    async def _take_slot(self) -> None:
+        """Acquire a concurrency slot even if cancelled meanwhile (then re-raise)."""
+        cancelled = False
+        while True:
+            try:
+                await self._semaphore.acquire()
+                break
+            except asyncio.CancelledError:
+                cancelled = True
+        if cancelled:
+            raise asyncio.CancelledError
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Run the handler once the chat's earlier updates have finished.
+
+        Called by process_update holding one of the max_concurrent_updates
+        slots. An update that has to wait for its chat gives the slot back
+        while it waits and takes one again when it is next, so a chat
+        sending a burst of messages cannot hold every slot.
+        """
+        key = self._chat_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        lock = entry[0]
+        entry[1] += 1
+        try:
+            if lock.locked():
+                await self._wait_turn(lock)
+            else:
+                await lock.acquire()
+            try:
+                await coroutine
+            finally:
+                lock.release()
+        except asyncio.CancelledError:
+            # Cancelled before the handler ran: don't leave a never-awaited coroutine
+            if inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                coroutine.close()
+            raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def _wait_turn(self, lock: asyncio.Lock) -> None:
+        """Wait for the chat's lock without holding a slot, then take a slot again.
+
+        process_update releases a slot when do_process_update returns, so one
+        is always held again on the way out, even when cancelled.
+        """
+        self._semaphore.release()
+        try:
+            await lock.acquire()
+        except BaseException:
+            await self._take_slot()
+            raise
+        try:
+            await self._take_slot()
+        except BaseException:
+            lock.release()
+            raise
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to tear down."""
+
+    @property
+    def active_chats(self) -> int:
+        """Number of chats with an update queued or in progress."""
+        return len(self._chat_locks)
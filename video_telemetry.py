@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+GPS/speed telemetry from Nextbase (Novatek-based) MP4 clips.
+
+These cameras write one GPS fix per second into small `free` boxes inside
+the MP4, listed by a `gps ` box in `moov` as (offset, size) pairs. The file
+is walked box by box with seeks, reading only box headers, the index and
+the few dozen bytes of each fix, so a multi-gigabyte clip is never loaded.
+Clips without the index are scanned for top-level GPS `free` boxes instead.
+
+GPS block layout (little-endian, offsets from the start of the `free` box):
+    0x08  'GPS '
+    0x10  uint32 hour, minute, second, year (since 2000), month, day  (UTC)
+    0x28  status ('A' = valid fix), 0x29 'N'/'S', 0x2a 'E'/'W'
+    0x2c  float32 latitude, longitude (NMEA DDDMM.MMMM), speed (knots), heading
+
+Fixes become a compact time-indexed array (timestamp, lat, lon, speed) and
+any moment of the clip is resolved to a position by binary search.
+
+Usage:
+    python video_telemetry.py 20260215_143005_NF.MP4
+    python video_telemetry.py 20260215_143005_NF.MP4 --at 12.5
+"""
+
+import argparse
+import os
+import struct
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+from dateutil import tz
+
+from road_index import lookup_street
+
+LOCAL_TIMEZONE = tz.gettz(os.getenv('NEXTBASE_TIMEZONE', 'Europe/London'))
+KNOTS_TO_KMH = 1.852
+KMH_PER_MPH = 1.609344
+GPS_BLOCK = struct.Struct('<6I c c c x 4f')
+GPS_BLOCK_OFFSET = 0x10
+MAX_GPS_BLOCK_BYTES = 64 * 1024
+
+
+def iter_boxes(f, start, end):
+    """(type, offset, size, header size) of each box between two file offsets"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:  # truncated file (e.g. still being copied)
+            return
+        size, kind = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            header_size = 16
+        elif size == 0:  # extends to the end of the file
+            size = end - pos
+        if size < header_size or pos + size > end:
+            return
+        yield kind, pos, size, header_size
+        pos += size
+
+
+def _gps_index(payload, file_size):
+    """(offset, size) pairs from a `gps ` box payload (version, count, then pairs)"""
+    if len(payload) < 8:
+        return []
+    count = struct.unpack_from('>I', payload, 4)[0]
+    count = min(count, (len(payload) - 8) // 8)
+    pairs = struct.unpack_from(f'>{count * 2}I', payload, 8)
+    return [(offset, size) for offset, size in zip(pairs[::2], pairs[1::2])
+            if 0 < size <= MAX_GPS_BLOCK_BYTES and offset + size <= file_size]
+
+
+def _nmea_degrees(value, ref):
+    degrees = int(value / 100)
+    decimal = degrees + (value - degrees * 100) / 60
+    return -decimal if ref in (b'S', b'W') else decimal
+
+
+def decode_gps_block(block):
+    """(unix time, lat, lon, speed km/h) from one GPS `free` box, or None without a fix"""
+    if len(block) < GPS_BLOCK_OFFSET + GPS_BLOCK.size or block[4:8] != b'free' or block[8:12] != b'GPS ':
+        return None
+    (hour, minute, second, year, month, day, status, lat_ref, lon_ref,
+     lat, lon, speed, _heading) = GPS_BLOCK.unpack_from(block, GPS_BLOCK_OFFSET)
+    if status != b'A':
+        return None
+    try:
+        moment = datetime(year + 2000 if year < 100 else year, month, day, hour, minute, second,
+                          tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return moment.timestamp(), _nmea_degrees(lat, lat_ref), _nmea_degrees(lon, lon_ref), speed * KNOTS_TO_KMH
+
+
+class Telemetry:
+    """Time-indexed GPS track of one clip (arrays sorted by time)."""
+
+    def __init__(self, path, timestamps, latitudes, longitudes, speeds):
+        self.path = path
+        self.timestamps = timestamps
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.speeds = speeds
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def start(self):
+        return self.timestamps[0] if len(self) else None
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) else 0.0
+
+    def at(self, seconds):
+        """Position `seconds` into the clip, interpolated between the nearest fixes.
+
+        Returns {'datetime' (local), 'latitude', 'longitude', 'speed_kmh'}, or
+        None for a clip without fixes. Times outside the track are clamped.
+        """
+        if not len(self):
+            return None
+        when = min(max(self.start + seconds, self.timestamps[0]), self.timestamps[-1])
+        i = int(np.searchsorted(self.timestamps, when))
+        if i == 0 or self.timestamps[i] == when:
+            lat, lon, speed = self.latitudes[i], self.longitudes[i], self.speeds[i]
+        else:
+            t0, t1 = self.timestamps[i - 1], self.timestamps[i]
+            w = (when - t0) / (t1 - t0)
+            lat = self.latitudes[i - 1] + w * (self.latitudes[i] - self.latitudes[i - 1])
+            lon = self.longitudes[i - 1] + w * (self.longitudes[i] - self.longitudes[i - 1])
+            speed = self.speeds[i - 1] + w * (self.speeds[i] - self.speeds[i - 1])
+        return {
+            'datetime': datetime.fromtimestamp(when, LOCAL_TIMEZONE),
+            'latitude': float(lat),
+            'longitude': float(lon),
+            'speed_kmh': round(float(speed), 1),
+        }
+
+
+def read_telemetry(path):
+    """Parse a clip's GPS track without loading the video"""
+    timestamps, latitudes, longitudes, speeds = array('d'), array('d'), array('d'), array('f')
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        blocks = []
+        free_boxes = []
+        for kind, offset, size, header_size in iter_boxes(f, 0, file_size):
+            if kind == b'moov':
+                for child, child_offset, child_size, child_header in iter_boxes(f, offset + header_size,
+                                                                                offset + size):
+                    if child == b'gps ':
+                        f.seek(child_offset + child_header)
+                        blocks = _gps_index(f.read(child_size - child_header), file_size)
+            elif kind == b'free' and size <= MAX_GPS_BLOCK_BYTES:
+                free_boxes.append((offset, size))
+
+        for offset, size in blocks or free_boxes:
+            f.seek(offset)
+            fix = decode_gps_block(f.read(size))
+            if fix:
+                timestamps.append(fix[0])
+                latitudes.append(fix[1])
+                longitudes.append(fix[2])
+                speeds.append(fix[3])
+
+    timestamps = np.frombuffer(timestamps, dtype=np.float64)
+    order = np.argsort(timestamps, kind='stable')
+    return Telemetry(
+        path,
+        timestamps[order],
+        np.frombuffer(latitudes, dtype=np.float64)[order],
+        np.frombuffer(longitudes, dtype=np.float64)[order],
+        np.frombuffer(speeds, dtype=np.float32)[order],
+    )
+
+
+def analyze_video(path, seconds=0.0):
+    """Incident fields for a moment of a clip: date, time, position, speed and street.
+
+    Returns None when the clip has no GPS fixes.
+    """
+    telemetry = read_telemetry(path)
+    point = telemetry.at(seconds)
+    if point is None:
+        return None
+    data = {
+        'date': point['datetime'].strftime('%Y-%m-%d'),
+        'time': point['datetime'].strftime('%H:%M'),
+        'day_of_week': point['datetime'].strftime('%A'),
+        'latitude': point['latitude'],
+        'longitude': point['longitude'],
+        'speed_kmh': point['speed_kmh'],
+        'street': None,
+        'sources': {'date': 'GPS', 'time': 'GPS', 'latitude': 'GPS', 'longitude': 'GPS'},
+    }
+    match = lookup_street(point['latitude'], point['longitude'])
+    if match:
+        data.update(street=match['street'], junction=match['junction'],
+                    junction_distance_m=match['junction_distance_m'])
+        data['sources']['street'] = 'GPS'
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the GPS track of a dashcam clip")
+    parser.add_argument("clip")
+    parser.add_argument("--at", type=float, help="Seconds into the clip to locate")
+    args = parser.parse_args()
+
+    telemetry = read_telemetry(args.clip)
+    if not len(telemetry):
+        print(f"No GPS fixes found in {args.clip}")
+        return
+    start = telemetry.at(0)['datetime']
+    print(f"{len(telemetry)} GPS fixes over {telemetry.duration:.0f}s from {start:%d/%m/%Y %H:%M:%S}, "
+          f"top speed {float(telemetry.speeds.max()) / KMH_PER_MPH:.0f} mph")
+
+    if args.at is not None:
+        data = analyze_video(args.clip, args.at)
+        print(f"At {args.at:g}s: {data['date']} {data['time']}  "
+              f"{data['latitude']:.6f}, {data['longitude']:.6f}  {data['speed_kmh'] / KMH_PER_MPH:.0f} mph")
+        print(f"  Street: {data['street'] or 'not found (is roads.idx built?)'}")
+
+
+if __name__ == "__main__":
+    main()
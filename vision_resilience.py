@@ -0,0 +1,288 @@
+"""
+Resilience for OpenAI Vision calls.
+
+A VisionGuard wraps each request with:
+  - a latency budget per image: every attempt's timeout is whatever is left
+  - retries with full-jitter exponential backoff, only for retryable errors
+    (429, 408/409, 5xx, timeouts, connection errors), honouring Retry-After
+  - an optional hedged second request once the first has run longer than the
+    observed p95 latency; whichever answers first wins and the other is
+    cancelled, or, if already running, counted as orphaned until it ends
+  - a circuit breaker that, after repeated failures, sends callers straight
+    to local extraction until the API has had time to recover
+
+Retries, hedges and breaker changes are printed and counted (see stats()).
+
+Configuration (environment):
+    NEXTBASE_VISION_BUDGET_SECONDS   total time per image (default 30)
+    NEXTBASE_VISION_RETRIES          retries after the first attempt (default 3)
+    NEXTBASE_VISION_HEDGE            1 to enable hedged requests (default off)
+    NEXTBASE_VISION_HEDGE_AFTER      hedge delay before enough latencies are known (default 15)
+    NEXTBASE_VISION_BREAKER_FAILURES consecutive failures that open the breaker (default 5)
+    NEXTBASE_VISION_BREAKER_COOLDOWN seconds the breaker stays open (default 60)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = {'APITimeoutError', 'APIConnectionError', 'RateLimitError', 'InternalServerError'}
+
+# Latencies needed before p95 is trusted for hedging
+MIN_LATENCY_SAMPLES = 20
+
+# Threads for hedged requests; a hedge needs two of them free
+HEDGE_WORKERS = 4
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open: the API is treated as down for now."""
+
+
+class BudgetExceededError(TimeoutError):
+    """The image's latency budget ran out before an answer arrived."""
+
+
+def is_retryable(error):
+    """True for errors a later attempt may not hit (rate limits, timeouts, 5xx)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, 'status_code', None)
+    return status in RETRYABLE_STATUS or (status is not None and status >= 500)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, or 0"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures ->
+    half-open after `cooldown` seconds (one trial call) -> closed on success."""
+
+    def __init__(self, failure_threshold=5, cooldown=60.0, on_change=None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.on_change = on_change
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _set(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_change:
+                self.on_change(state)
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._set('half-open')
+            if self.state == 'half-open':
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set('closed')
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == 'half-open' or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set('open')
+
+
+class VisionGuard:
+    """Budget, retries, hedging and circuit breaking around one kind of request."""
+
+    def __init__(self, budget=30.0, retries=3, base_delay=0.5, max_delay=8.0,
+                 hedge=False, hedge_after=15.0, breaker_failures=5, breaker_cooldown=60.0):
+        self.budget = budget
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown, self._breaker_changed)
+        self.latencies = deque(maxlen=200)
+        self.counts = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                       'hedges': 0, 'hedge_wins': 0, 'hedge_orphans': 0,
+                       'short_circuits': 0, 'breaker_opened': 0}
+        self._executor = None
+        self._orphans = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            budget=float(os.getenv('NEXTBASE_VISION_BUDGET_SECONDS', '30')),
+            retries=int(os.getenv('NEXTBASE_VISION_RETRIES', '3')),
+            hedge=os.getenv('NEXTBASE_VISION_HEDGE', '').lower() in ('1', 'true', 'yes'),
+            hedge_after=float(os.getenv('NEXTBASE_VISION_HEDGE_AFTER', '15')),
+            breaker_failures=int(os.getenv('NEXTBASE_VISION_BREAKER_FAILURES', '5')),
+            breaker_cooldown=float(os.getenv('NEXTBASE_VISION_BREAKER_COOLDOWN', '60')),
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _breaker_changed(self, state):
+        if state == 'open':
+            self._count('breaker_opened')
+            print(f"  ⚠️  OpenAI circuit breaker open: using local extraction for "
+                  f"{self.breaker.cooldown:.0f}s")
+        else:
+            print(f"  OpenAI circuit breaker {state}")
+
+    def p95(self):
+        """95th percentile of recent successful latencies, or None if too few"""
+        with self._lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, breaker=self.breaker.state)
+
+    def call(self, request):
+        """Run request(timeout) under the guard and return its result.
+
+        Raises CircuitOpenError without calling when the breaker is open,
+        BudgetExceededError when time runs out, or the last error.
+        """
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuits')
+            raise CircuitOpenError("OpenAI circuit breaker is open")
+
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = self._attempt(request, deadline)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The API answered (e.g. 400/401), so it is not degraded
+                    self.breaker.record_success()
+                attempt += 1
+                delay = max(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)),
+                            retry_after(e))
+                out_of_time = time.monotonic() + delay >= deadline
+                if not retryable or attempt > self.retries or out_of_time or self.breaker.state == 'open':
+                    self._count('failures')
+                    if retryable and out_of_time:
+                        raise BudgetExceededError(f"OpenAI budget of {self.budget:.0f}s used up: {e}") from e
+                    raise
+                self._count('retries')
+                print(f"  ↻ OpenAI {type(e).__name__}; retry {attempt}/{self.retries} in {delay:.1f}s")
+                time.sleep(delay)
+                if not self.breaker.allow():
+                    self._count('failures')
+                    raise CircuitOpenError("OpenAI circuit breaker is open") from e
+                continue
+
+            with self._lock:
+                self.latencies.append(time.monotonic() - started)
+            self.breaker.record_success()
+            self._count('successes')
+            return result
+
+    def _attempt(self, request, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise BudgetExceededError(f"OpenAI budget of {self.budget:.0f}s used up")
+        hedge_after = (self.p95() or self.hedge_after) if self.hedge else None
+        if hedge_after is None or hedge_after >= remaining:
+            return request(remaining)
+
+        with self._lock:
+            if self._orphans > HEDGE_WORKERS - 2:
+                # Abandoned requests still hold the workers; don't queue behind them
+                executor = None
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS,
+                                                        thread_name_prefix='vision-hedge')
+                executor = self._executor
+        if executor is None:
+            return request(remaining)
+
+        first = executor.submit(request, remaining)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        self._count('hedges')
+        print(f"  ⇉ OpenAI request slower than {hedge_after:.1f}s; sending a hedged request")
+        second = executor.submit(request, deadline - time.monotonic())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise BudgetExceededError(f"OpenAI budget of {self.budget:.0f}s used up")
+                for future in done:
+                    if future.exception() is None:
+                        if future is second:
+                            self._count('hedge_wins')
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                self._abandon(future)
+
+    def _abandon(self, future):
+        """Cancel a request nobody is waiting for, or count it until it finishes"""
+        if future.cancel():
+            return
+        with self._lock:
+            self.counts['hedge_orphans'] += 1
+            self._orphans += 1
+        future.add_done_callback(self._orphan_done)
+
+    def _orphan_done(self, future):
+        with self._lock:
+            self._orphans -= 1
+
+
+_guard = None
+
+
+def get_vision_guard():
+    """Process-wide guard (breaker state and latencies are shared by all calls)"""
+    global _guard
+    if _guard is None:
+        _guard = VisionGuard.from_env()
+    return _guard
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Watch a synced folder and turn new dashcam/phone media into incident drafts.
+
+New files are picked up through inotify (via the optional `watchdog`
+package) or, without it, by polling that only re-lists directories whose
+modification time changed. A file is processed once its size and mtime have
+been stable for the debounce period, so half-copied files are left alone.
+Photos that arrive together are split by capture time (EXIF or filename
+timestamp), then grouped by perceptual hash, and each group is analyzed as
+one incident, and videos are dated and located from their embedded GPS
+track; each incident becomes a JSON draft in the drafts folder with the
+extracted fields, a suggested description and the fill_form.py command to
+submit it.
+
+Processed files are appended to a checkpoint file, so a restart never
+reprocesses anything and the work per cycle depends on what is new, not on
+how big the folder is.
+
+Usage:
+    python watch_folder.py ~/Dashcam --drafts drafts/
+    python watch_folder.py ~/Dashcam --once       # process what is there and exit
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+
+from PIL import Image
+
+from extract_from_image import analyze_incident, extract_from_filename
+from incident_templates import get_template_registry
+from photo_hash import group_near_duplicates
+from video_telemetry import analyze_video
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov'}
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+DEFAULT_POLL_SECONDS = 5.0
+# Photos taken further apart than this are never treated as the same incident
+CAPTURE_WINDOW_SECONDS = 120
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+
+def is_media(path):
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    return not name.startswith('.') and ext in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+
+
+def capture_time(path):
+    """When a photo was taken, from EXIF or a YYYYMMDD_HHMMSS filename, or None"""
+    try:
+        with Image.open(path) as image:
+            exif = image._getexif() or {}
+        stamp = exif.get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+        if stamp:
+            return datetime.strptime(stamp.strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except Exception:
+        pass
+    match = re.search(r'(\d{8})_(\d{6})', os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
+        except ValueError:
+            pass
+    return None
+
+
+def split_by_capture_time(images, window=CAPTURE_WINDOW_SECONDS):
+    """Split photos into runs taken within `window` seconds of each other.
+
+    Photos without a timestamp form one run of their own.
+    """
+    timed, untimed = [], []
+    for path in images:
+        taken = capture_time(path)
+        if taken is None:
+            untimed.append(path)
+        else:
+            timed.append((taken, path))
+    timed.sort()
+    runs = []
+    previous = None
+    for taken, path in timed:
+        if previous is None or (taken - previous).total_seconds() > window:
+            runs.append([])
+        runs[-1].append(path)
+        previous = taken
+    if untimed:
+        runs.append(untimed)
+    return runs
+
+
+class Checkpoint:
+    """Append-only record of processed files, keyed by path, size and mtime."""
+
+    def __init__(self, path):
+        self.path = path
+        self._seen = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._seen.add((entry['path'], entry['size'], entry['mtime_ns']))
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def __contains__(self, path):
+        try:
+            return self.key(path) in self._seen
+        except OSError:
+            return False
+
+    def add(self, path, draft=None):
+        abspath, size, mtime_ns = self.key(path)
+        self._seen.add((abspath, size, mtime_ns))
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'path': abspath, 'size': size, 'mtime_ns': mtime_ns,
+                                'draft': draft}) + '\n')
+
+
+class FolderWatcher:
+    """Collects changed files, debounces them and processes them in batches."""
+
+    def __init__(self, folder, drafts_dir, checkpoint_path=None, debounce=DEFAULT_DEBOUNCE_SECONDS,
+                 poll_interval=DEFAULT_POLL_SECONDS, openai_api_key=None, use_inotify=True):
+        self.folder = os.path.abspath(folder)
+        self.drafts_dir = drafts_dir
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.openai_api_key = openai_api_key
+        self.use_inotify = use_inotify and WATCHDOG_AVAILABLE
+        self.checkpoint = Checkpoint(checkpoint_path or os.path.join(drafts_dir, 'checkpoint.jsonl'))
+        self._pending = {}
+        self._dirs = {}  # directory -> (mtime_ns, subdirectories)
+        self._lock = threading.Lock()
+        os.makedirs(drafts_dir, exist_ok=True)
+
+    def notify(self, path):
+        """Record that a file changed (safe to call from any thread)"""
+        if is_media(path):
+            with self._lock:
+                self._pending[os.path.abspath(path)] = time.monotonic()
+
+    def scan(self, full=False):
+        """Queue new files; directories whose mtime is unchanged are skipped unless `full`"""
+        stack = [self.folder]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+                known = self._dirs.get(directory)
+                if not full and known and known[0] == mtime:
+                    # Nothing added or removed here; only look inside subdirectories
+                    stack.extend(known[1])
+                    continue
+                entries = list(os.scandir(directory))
+            except OSError:
+                self._dirs.pop(directory, None)
+                continue
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif is_media(entry.path) and entry.path not in self.checkpoint:
+                    self.notify(entry.path)
+            self._dirs[directory] = (mtime, subdirs)
+            stack.extend(subdirs)
+
+    def ready(self):
+        """Pop files that have not changed for the debounce period"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, changed in list(self._pending.items()):
+                if now - changed < self.debounce:
+                    continue
+                del self._pending[path]
+                if os.path.exists(path) and path not in self.checkpoint:
+                    ready.append(path)
+        # A file still being written will have a newer mtime than the debounce window
+        settled = []
+        for path in ready:
+            try:
+                modified = os.stat(path).st_mtime
+            except OSError:
+                continue
+            if time.time() - modified < self.debounce:
+                self.notify(path)
+            else:
+                settled.append(path)
+        return sorted(settled)
+
+    def process(self, paths):
+        """Analyze a batch of settled files and write one draft per incident.
+
+        Dashcam frames from the same mount look alike, so photos are only
+        grouped by perceptual hash within runs taken close together. A file
+        whose analysis fails is logged and left out of the checkpoint, so it
+        is tried again after a restart; the rest of the batch carries on. (A
+        video without a readable GPS track still gets a draft, dated from its
+        filename.)
+        """
+        images = [p for p in paths if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS]
+        videos = [p for p in paths if os.path.splitext(p)[1].lower() in VIDEO_EXTENSIONS]
+
+        groups = []
+        for run in split_by_capture_time(images):
+            try:
+                groups.extend(group_near_duplicates(run))
+            except Exception as e:
+                print(f"  ✗ Could not group photos ({e}); analyzing each on its own")
+                groups.extend([image] for image in run)
+
+        for group in groups:
+            try:
+                self.process_photos(group)
+            except Exception as e:
+                print(f"  ✗ Could not process {', '.join(group)}: {e}")
+
+        for video in videos:
+            try:
+                self.process_video(video)
+            except Exception as e:
+                print(f"  ✗ Could not process {video}: {e}")
+
+    def process_photos(self, group):
+        # Errors reach process(), so the photos are not checkpointed
+        incident_data = analyze_incident(group, self.openai_api_key)
+        draft = self.write_draft(group, incident_data)
+        for path in group:
+            self.checkpoint.add(path, draft)
+
+    def process_video(self, video):
+        # Date, time and street from the clip's GPS track (its start), else the filename
+        try:
+            incident_data = analyze_video(video)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"  ✗ Could not read GPS track of {video}: {e}")
+            incident_data = None
+        note = ("Video: pick a frame to attach; details are for the start of the clip "
+                "(python video_telemetry.py CLIP --at SECONDS for another moment)")
+        draft = self.write_draft([video], incident_data or extract_from_filename(video), note=note)
+        self.checkpoint.add(video, draft)
+
+    def draft_name(self, path):
+        """Draft filename from the file's path inside the folder, so same-named files don't collide"""
+        relative = os.path.relpath(os.path.abspath(path), self.folder)
+        root, ext = os.path.splitext(relative)
+        return f"{root.replace(os.sep, '__')}{ext.replace('.', '_')}.json"
+
+    def write_draft(self, paths, incident_data, note=None):
+        incident_data = dict(incident_data or {})
+        incident_type = incident_data.get('incident_type')
+        street = incident_data.get('street')
+        description = None
+        templates = get_template_registry()
+        if incident_type in templates:
+            description = templates.render(
+                incident_type,
+                reg=incident_data.get('registration'),
+                street=street,
+                date=incident_data.get('date'),
+                time=incident_data.get('time'),
+            )
+
+        draft_path = os.path.join(self.drafts_dir, self.draft_name(paths[0]))
+        quoted = ' '.join(f"'{p}'" for p in paths)
+        draft = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'status': 'draft',
+            'files': paths,
+            'date': incident_data.get('date'),
+            'time': incident_data.get('time'),
+            'registration': incident_data.get('registration'),
+            'colour': incident_data.get('colour'),
+            'incident_type': incident_type,
+            'street': street,
+            'junction': incident_data.get('junction'),
+            'junction_distance_m': incident_data.get('junction_distance_m'),
+            'sources': incident_data.get('sources', {}),
+            'unconfirmed': incident_data.get('unconfirmed', {}),
+            'description': description,
+            'note': note,
+            'command': (f"python fill_form.py '{street or '<street>'}' {incident_type or 'auto'} "
+                        f"{incident_data.get('registration') or 'auto'} "
+                        f"{incident_data.get('colour') or 'auto'} {quoted}"),
+        }
+        with open(draft_path, 'w') as f:
+            json.dump(draft, f, indent=2)
+        print(f"✓ Draft written: {draft_path}")
+        return draft_path
+
+    def run_once(self):
+        """Process everything not yet checkpointed, ignoring the debounce"""
+        self.scan(full=True)
+        with self._lock:
+            paths = sorted(p for p in self._pending if p not in self.checkpoint)
+            self._pending.clear()
+        if paths:
+            self.process(paths)
+        return len(paths)
+
+    def run(self):
+        observer = None
+        self.scan(full=True)  # catch up on anything added while we were stopped
+        if self.use_inotify:
+            watcher = self
+
+            class Handler(FileSystemEventHandler):
+                def on_created(self, event):
+                    if not event.is_directory:
+                        watcher.notify(event.src_path)
+
+                on_modified = on_created
+
+                def on_moved(self, event):
+                    if not event.is_directory:
+                        watcher.notify(event.dest_path)
+
+            observer = Observer()
+            observer.schedule(Handler(), self.folder, recursive=True)
+            observer.start()
+            print(f"Watching {self.folder} (inotify)... Press Ctrl+C to stop.")
+        else:
+            print(f"Watching {self.folder} (polling every {self.poll_interval:.0f}s)... Press Ctrl+C to stop.")
+
+        last_poll = time.monotonic()
+        try:
+            while True:
+                if observer is None and time.monotonic() - last_poll >= self.poll_interval:
+                    self.scan()
+                    last_poll = time.monotonic()
+                paths = self.ready()
+                if paths:
+                    print(f"\n{len(paths)} new file(s)")
+                    self.process(paths)
+                time.sleep(min(0.5, self.debounce))
+        except KeyboardInterrupt:
+            print("\nStopping watcher")
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn new dashcam photos into incident drafts")
+    parser.add_argument("folder", help="Folder the SD card / phone camera syncs to")
+    parser.add_argument("--drafts", default="drafts", help="Where drafts are written (default: drafts/)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <drafts>/checkpoint.jsonl)")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_SECONDS,
+                        help="Seconds a file must be unchanged before it is processed (default: 2)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="Polling interval without inotify (default: 5)")
+    parser.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed")
+    parser.add_argument("--once", action="store_true", help="Process existing files and exit")
+    args = parser.parse_args()
+
+    watcher = FolderWatcher(
+        args.folder, args.drafts, args.checkpoint, args.debounce, args.poll_interval,
+        openai_api_key=os.getenv('OPENAI_API_KEY'), use_inotify=not args.poll,
+    )
+    if args.once:
+        count = watcher.run_once()
+        print(f"✓ Processed {count} file(s)")
+    else:
+        watcher.run()
+
+
+if __name__ == "__main__":
+    main()